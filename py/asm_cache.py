@@ -0,0 +1,218 @@
+#===========================================
+# Script: asm_cache.py
+# Description:
+#    Caché en disco de programas ensamblados, opcional: mips_to_bin.py la usa
+#    con --cache (y assemble_cached siempre). La clave es un hash SHA-256 del
+#    texto fuente junto con la versión del ensamblador (y las opciones que
+#    cambian el resultado), así que un .asm sin cambios devuelve directamente
+#    las palabras de 32 bits y los errores que produjo la vez anterior.
+#    Cada entrada es un archivo <clave>.asmc:
+#      - encabezado: b"ASMC", cantidad de palabras, bytes de errores (>4sII)
+#      - palabras de 32 bits big-endian
+#      - errores en UTF-8 separados por "\n"
+#    El tamaño total está acotado: al superar max_bytes se borran las entradas
+#    usadas hace más tiempo (LRU por fecha de modificación, que se actualiza en
+#    cada acierto). El tamaño se lleva en memoria y el directorio solo se
+#    recorre la primera vez y al desalojar.
+#    stats.json acumula aciertos, fallos y bytes entre ejecuciones; los
+#    contadores se suman en memoria y se escriben una vez con flush() (la caché
+#    de default_cache() lo hace al terminar el proceso).
+#===========================================
+import atexit
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mips_fpga", "asm")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_MAGIC = b"ASMC"
+_ENCABEZADO = struct.Struct(">4sII")
+_EXTENSION = ".asmc"
+_STATS = "stats.json"
+_STATS_INICIALES = {"hits": 0, "misses": 0, "bytes_read": 0, "bytes_written": 0, "evictions": 0}
+
+
+class AsmCache:
+    """
+    Caché de (palabras, errores) por contenido. Si el directorio no se puede
+    usar (permisos, disco lleno) se comporta como una caché siempre vacía.
+    El directorio por defecto se puede cambiar con la variable MIPS_ASM_CACHE.
+    """
+
+    def __init__(self, directorio=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directorio = directorio or os.environ.get("MIPS_ASM_CACHE", DEFAULT_DIR)
+        self.max_bytes = max_bytes
+        self.pending = dict.fromkeys(_STATS_INICIALES, 0)  # Contadores aún no escritos
+        self._total = None  # Bytes en disco; se calcula en el primer put
+
+    @staticmethod
+    def key(source, *partes):
+        """Hash del texto fuente y de las partes que afectan al resultado (versión, opciones)."""
+        h = hashlib.sha256()
+        for parte in partes:
+            h.update(str(parte).encode("utf-8"))
+            h.update(b"\0")
+        h.update(source.encode("utf-8"))
+        return h.hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave + _EXTENSION)
+
+    def get(self, clave):
+        """Devuelve (palabras, errores) si la clave está en la caché, o None."""
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "rb") as f:
+                data = f.read()
+            magic, cantidad, largo_errores = _ENCABEZADO.unpack_from(data)
+            if magic != _MAGIC or len(data) != _ENCABEZADO.size + 4 * cantidad + largo_errores:
+                raise ValueError("entrada de caché corrupta")
+            palabras = list(struct.unpack_from(">{}I".format(cantidad), data, _ENCABEZADO.size))
+            texto = data[_ENCABEZADO.size + 4 * cantidad:].decode("utf-8")
+            errores = texto.split("\n") if texto else []
+            os.utime(ruta)  # Usada recién: pasa al final del orden LRU
+        except FileNotFoundError:
+            self._contar(misses=1)
+            return None
+        except (OSError, ValueError, struct.error):
+            self._borrar(ruta)
+            self._contar(misses=1)
+            return None
+        self._contar(hits=1, bytes_read=len(data))
+        return palabras, errores
+
+    def put(self, clave, palabras, errores):
+        """Guarda el resultado de ensamblar y aplica el límite de tamaño."""
+        texto = "\n".join(errores).encode("utf-8")
+        data = (_ENCABEZADO.pack(_MAGIC, len(palabras), len(texto))
+                + struct.pack(">{}I".format(len(palabras)), *palabras) + texto)
+        if len(data) > self.max_bytes:
+            return
+        ruta = self._ruta(clave)
+        if self._total is None:
+            self._total = sum(tamano for _, tamano, _ in self._entradas())
+        try:
+            anterior = os.path.getsize(ruta)  # Otro proceso pudo guardar la misma clave
+        except OSError:
+            anterior = 0
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._escribir_atomico(ruta, data)
+        except OSError:
+            return
+        self._contar(bytes_written=len(data))
+        # Las entradas de otros procesos no se suman acá: el recorrido de _desalojar corrige el total
+        self._total += len(data) - anterior
+        if self._total > self.max_bytes:
+            self._desalojar()
+
+    def stats(self):
+        """Contadores acumulados (incluidos los pendientes) más el tamaño y la cantidad de entradas."""
+        stats = self._leer_stats()
+        for nombre, valor in self.pending.items():
+            stats[nombre] += valor
+        entradas = self._entradas()
+        stats["entries"] = len(entradas)
+        stats["size_bytes"] = sum(tamano for _, tamano, _ in entradas)
+        return stats
+
+    def clear(self):
+        for _, _, ruta in self._entradas():
+            self._borrar(ruta)
+        self._borrar(os.path.join(self.directorio, _STATS))
+        self.pending = dict.fromkeys(_STATS_INICIALES, 0)
+        self._total = 0
+
+    def take_counters(self):
+        """Devuelve los contadores pendientes y los pone en cero (para sumarlos en otro proceso)."""
+        contadores, self.pending = self.pending, dict.fromkeys(_STATS_INICIALES, 0)
+        return contadores
+
+    def add_counters(self, contadores):
+        self._contar(**contadores)
+
+    def flush(self):
+        """Suma los contadores pendientes a stats.json (una lectura y una escritura)."""
+        if not any(self.pending.values()):
+            return
+        # Con varios procesos a la vez algún incremento se puede perder, pero el
+        # archivo nunca queda a medio escribir.
+        stats = self._leer_stats()
+        for nombre, valor in self.take_counters().items():
+            stats[nombre] += valor
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._escribir_atomico(os.path.join(self.directorio, _STATS),
+                                   json.dumps(stats).encode("utf-8"))
+        except OSError:
+            pass
+
+    def _entradas(self):
+        """Lista de (última vez usada, tamaño, ruta) de las entradas en disco."""
+        try:
+            with os.scandir(self.directorio) as it:
+                return [(e.stat().st_mtime, e.stat().st_size, e.path)
+                        for e in it if e.name.endswith(_EXTENSION)]
+        except OSError:
+            return []
+
+    def _desalojar(self):
+        entradas = self._entradas()
+        total = sum(tamano for _, tamano, _ in entradas)
+        desalojadas = 0
+        for _, tamano, ruta in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            self._borrar(ruta)
+            total -= tamano
+            desalojadas += 1
+        self._total = total
+        self._contar(evictions=desalojadas)
+
+    def _leer_stats(self):
+        stats = dict(_STATS_INICIALES)
+        try:
+            with open(os.path.join(self.directorio, _STATS), "r") as f:
+                stats.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return stats
+
+    def _contar(self, **incrementos):
+        for nombre, valor in incrementos.items():
+            self.pending[nombre] += valor
+
+    def _escribir_atomico(self, ruta, data):
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temporal, ruta)
+        except OSError:
+            self._borrar(temporal)
+            raise
+
+    @staticmethod
+    def _borrar(ruta):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+_default = None
+
+
+def default_cache():
+    """
+    Caché del directorio por defecto, una por proceso: así los contadores se
+    acumulan en memoria y stats.json se escribe una sola vez, al salir.
+    """
+    global _default
+    if _default is None:
+        _default = AsmCache()
+        atexit.register(_default.flush)
+    return _default
@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+#===========================================
+# Script: benchmarks.py
+# Description:
+#    Microbenchmarks de las herramientas del lado host. Cada benchmark compara
+#    la implementación anterior (reproducida aquí) con la actual; los de
+#    comunicación usan MockSerial, de modo que no hace falta la placa.
+# Uso:
+#    python3 benchmarks.py            -> corre todos
+#    python3 benchmarks.py lectura    -> corre solo el indicado
+#===========================================
+import contextlib
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from debug_link import (BAUDRATE, CMD_RUN, CMD_STEP, FRAME_BYTES, EXPECTED_RESPONSE_BYTES, PIPELINE_BYTES,
+                        FrameReader, cargar_programa, hasta_pc, run_until, step_n, tiempo_caracter)
+from frame_layout import decode_frame
+import mips_to_bin
+from asm_cache import AsmCache
+from mockserial import MockSerial
+from trace_file import HEADER_BYTES, RECORD_BYTES, TraceReader, TraceWriter
+
+
+class _MockSerialTroceado(MockSerial):
+    """MockSerial que entrega como máximo 'chunk' bytes por lectura, como una UART lenta."""
+
+    def __init__(self, chunk):
+        super().__init__(verbose=False)
+        self.chunk = chunk
+
+    def read(self, size):
+        return super().read(min(size, self.chunk))
+
+    def readinto(self, b):
+        return super().readinto(memoryview(b)[:self.chunk])
+
+
+def _leer_respuesta_concatenando(ser, total_bytes):
+    """Lectura original de fpga.py / run_debug.py (recibido += chunk)."""
+    recibido = b''
+    while len(recibido) < total_bytes:
+        chunk = ser.read(total_bytes - len(recibido))
+        if not chunk:
+            break
+        recibido += chunk
+    return recibido
+
+
+def _reporte(nombre, segundos, repeticiones):
+    print("  {:<34} {:>10.2f} us/trama".format(nombre, segundos / repeticiones * 1e6))
+
+
+def _reporte_lineas(nombre, segundos, lineas):
+    print("  {:<34} {:>10.2f} us/línea  ({:.0f} líneas/s)".format(
+        nombre, segundos / lineas * 1e6, lineas / segundos))
+
+
+def bench_lectura(repeticiones=20000):
+    """
+    Lectura de la respuesta de STEP (303 bytes) con concatenación vs
+    FrameReader. Con lecturas de pocos bytes manda el costo de cada llamada,
+    que es el mismo en los dos: la diferencia está en las copias.
+    """
+    trama = bytes(range(256)) + bytes(PIPELINE_BYTES)
+    print("Lectura de tramas de {} bytes:".format(FRAME_BYTES))
+    for chunk in (FRAME_BYTES, 16, 1):
+        ser = _MockSerialTroceado(chunk)
+        lector = FrameReader(ser)
+
+        def anterior():
+            ser.response_buffer[:] = trama
+            _leer_respuesta_concatenando(ser, EXPECTED_RESPONSE_BYTES)
+            _leer_respuesta_concatenando(ser, PIPELINE_BYTES)
+
+        def actual():
+            ser.response_buffer[:] = trama
+            lector.read_frame()
+
+        n = max(repeticiones // FRAME_BYTES * chunk, 200)
+        # recibido += chunk vuelve a copiar todo lo acumulado en cada lectura
+        copiados = sum(min(total, k + chunk)
+                       for total in (EXPECTED_RESPONSE_BYTES, PIPELINE_BYTES)
+                       for k in range(0, total, chunk))
+        print(" lecturas de hasta {} bytes ({} vs {} bytes copiados por trama):".format(
+            chunk, copiados, FRAME_BYTES))
+        _reporte("recibido += chunk", timeit.timeit(anterior, number=n), n)
+        _reporte("FrameReader (leer_en)", timeit.timeit(actual, number=n), n)
+
+
+def _decodificar_con_from_bytes(data, regs):
+    """Decodificación original (fpga.py / GUI) con int.from_bytes sobre cada campo."""
+    registros = [int.from_bytes(data[i*4:(i+1)*4], byteorder='big') for i in range(32)]
+    offset = 32 * 4
+    memoria = [int.from_bytes(data[offset + i*4 : offset + (i+1)*4], byteorder='big') for i in range(32)]
+    if_id = regs[0:8]
+    id_ex = regs[8:26]
+    ex_m = regs[26:37]
+    m_wb = regs[37:47]
+    pipeline = (
+        int.from_bytes(if_id[0:4], byteorder='big'),
+        int.from_bytes(if_id[4:8], byteorder='big'),
+        int.from_bytes(id_ex[0:4], byteorder='big'),
+        int.from_bytes(id_ex[4:8], byteorder='big'),
+        int.from_bytes(id_ex[8:12], byteorder='big'),
+        id_ex[12] & 0x3F,
+        id_ex[13] & 0x1F,
+        id_ex[14] & 0x1F,
+        id_ex[15] & 0x1F,
+        int.from_bytes(id_ex[16:18], byteorder='big'),
+        int.from_bytes(ex_m[0:4], byteorder='big'),
+        int.from_bytes(ex_m[4:8], byteorder='big'),
+        ex_m[8] & 0x1F,
+        int.from_bytes(ex_m[9:11], byteorder='big') & 0x1FF,
+        int.from_bytes(m_wb[0:4], byteorder='big'),
+        int.from_bytes(m_wb[4:8], byteorder='big'),
+        m_wb[8] & 0x1F,
+        m_wb[9] & 0xF,
+    )
+    return registros, memoria, pipeline
+
+
+def bench_decodificacion(repeticiones=50000):
+    """Decodificación de una trama de 303 bytes con int.from_bytes vs frame_layout."""
+    trama = bytes((i * 37) & 0xFF for i in range(FRAME_BYTES))
+    data, regs = trama[:EXPECTED_RESPONSE_BYTES], trama[EXPECTED_RESPONSE_BYTES:]
+    frame = decode_frame(trama)
+    anterior = _decodificar_con_from_bytes(data, regs)
+    assert (list(frame.registers), list(frame.memory), frame.pipeline) == anterior
+
+    print("Decodificación de una trama de {} bytes:".format(FRAME_BYTES))
+    _reporte("int.from_bytes por campo",
+             timeit.timeit(lambda: _decodificar_con_from_bytes(data, regs), number=repeticiones),
+             repeticiones)
+    _reporte("frame_layout.decode_frame",
+             timeit.timeit(lambda: decode_frame(trama), number=repeticiones), repeticiones)
+
+
+# Campos en binario como los tenía mips_to_bin.py antes de la tabla de codificación
+_FUNCT = {op: format(f, '06b') for op, f in mips_to_bin.opcode_map.items()}
+_OPCODES = {op: format(o, '06b')
+            for op, o in {**mips_to_bin.opcode_immediate, **mips_to_bin.opcode_jump}.items()}
+
+
+def _reg_a_bin(reg):
+    if reg.startswith("$") and reg[1:].isdigit() and 0 <= int(reg[1:]) <= 31:
+        return format(int(reg[1:]), '05b')
+    raise ValueError(f"Registro no válido: {reg}")
+
+
+def _imm_a_bin(imm):
+    try:
+        if -32768 <= int(imm) <= 32767:
+            return format(int(imm) & 0xFFFF, '016b')
+    except ValueError:
+        pass
+    raise ValueError(f"Valor inmediato no válido: {imm}")
+
+
+def _process_instruction_concatenando(instr):
+    """process_instruction original de mips_to_bin.py: concatena cadenas de bits."""
+    instr = instr.split("#")[0].strip()
+    parts = instr.replace(",", "").split()
+    if not parts:
+        return None
+    op = parts[0]
+    if op == "HALT":
+        return "00000000000000000000000000111111"
+    esperados = {"JR": (2, 3), "JALR": (2, 3), "LUI": (3,), "J": (2,), "JAL": (2,)}.get(op, (4,))
+    if op not in _FUNCT and op not in _OPCODES:
+        raise ValueError(f"Instrucción no reconocida: {op}")
+    if len(parts) not in esperados:
+        raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
+    if op in _FUNCT:
+        funct = _FUNCT[op]
+        if op == "JR":
+            return "000000" + _reg_a_bin(parts[1]) + "00000" + "00000" + "00000" + funct
+        if op == "JALR":
+            return "000000" + _reg_a_bin(parts[1]) + "00000" + _reg_a_bin(parts[2]) + "00000" + funct
+        if op in ("SLL", "SRL", "SRA"):
+            return ("000000" + "00000" + _reg_a_bin(parts[2]) + _reg_a_bin(parts[1])
+                    + format(int(parts[3]), '05b') + funct)
+        return ("000000" + _reg_a_bin(parts[2]) + _reg_a_bin(parts[3]) + _reg_a_bin(parts[1])
+                + "00000" + funct)
+    opcode = _OPCODES[op]
+    if op in ("J", "JAL"):
+        if 0 <= int(parts[1]) <= 0x3FFFFFF:
+            return opcode + format(int(parts[1]), '026b')
+        raise ValueError(f"Índice de salto no válido: {parts[1]}")
+    if op == "LUI":
+        return opcode + "00000" + _reg_a_bin(parts[1]) + _imm_a_bin(parts[2])
+    return opcode + _reg_a_bin(parts[2]) + _reg_a_bin(parts[1]) + _imm_a_bin(parts[3])
+
+
+
+def _convertir_concatenando(input_file, output_file):
+    """convert_asm_to_coe original: una cadena por instrucción, escrita línea a línea."""
+    with open(input_file, "r") as asm_file:
+        instructions = asm_file.readlines()
+    binary_instructions = []
+    start_processing = False
+    for line_num, instr in enumerate(instructions, start=1):
+        instr = instr.strip()
+        if mips_to_bin.FIN_EJEMPLO in instr:
+            start_processing = True
+            continue
+        if not start_processing or not instr or instr.startswith("#"):
+            continue
+        try:
+            binary_instr = _process_instruction_concatenando(instr)
+            if binary_instr:
+                binary_instructions.append(binary_instr)
+        except ValueError as e:
+            print(f"Error en la línea {line_num}: {e}")
+    with open(output_file, "w") as coe_file:
+        for i, bin_instr in enumerate(binary_instructions):
+            coe_file.write(bin_instr + (",\n" if i < len(binary_instructions) - 1 else ";\n"))
+
+
+def _programa_aleatorio(lineas, semilla=0):
+    """Genera 'lineas' instrucciones válidas con todos los mnemónicos y operandos al azar."""
+    rnd = random.Random(semilla)
+    reg = lambda: "${}".format(rnd.randrange(32))
+    plantillas = {
+        "R":     lambda op: "{} {}, {}, {}".format(op, reg(), reg(), reg()),
+        "SHIFT": lambda op: "{} {}, {}, {}".format(op, reg(), reg(), rnd.randrange(32)),
+        "JR":    lambda op: "JR {}".format(reg()),
+        "JALR":  lambda op: "JALR {}, {}".format(reg(), reg()),
+        "HALT":  lambda op: "HALT",
+        "I":     lambda op: "{} {}, {}, {}".format(op, reg(), reg(), rnd.randint(-32768, 32767)),
+        "LUI":   lambda op: "LUI {}, {}".format(reg(), rnd.randrange(32768)),
+        "J":     lambda op: "{} {}".format(op, rnd.randrange(1 << 26)),
+    }
+    mnemonicos = list(mips_to_bin.TABLA_INSTRUCCIONES)
+    programa = []
+    for _ in range(lineas):
+        op = rnd.choice(mnemonicos)
+        programa.append(plantillas[mips_to_bin._formato(op)](op))
+    return "\n".join(programa) + "\n"
+
+
+def bench_ensamblador(lineas=100000, repeticiones=3):
+    """Ensamblado de un programa generado con concatenación de cadenas vs la tabla de mips_to_bin."""
+    fuente = _programa_aleatorio(lineas)
+    anterior = [int(_process_instruction_concatenando(l), 2) for l in fuente.splitlines()]
+    palabras, errores = mips_to_bin.assemble(fuente, skip_header=False)
+    assert palabras == anterior and not errores
+
+    print("Ensamblado de {} líneas generadas:".format(lineas))
+    print(" texto -> palabras de 32 bits:")
+    t_anterior = min(timeit.repeat(
+        lambda: [int(_process_instruction_concatenando(l), 2) for l in fuente.splitlines()],
+        number=1, repeat=repeticiones))
+    t_actual = min(timeit.repeat(lambda: mips_to_bin.assemble(fuente, skip_header=False),
+                                 number=1, repeat=repeticiones))
+    _reporte_lineas("cadenas + int(bits, 2)", t_anterior, lineas)
+    _reporte_lineas("mips_to_bin.assemble", t_actual, lineas)
+    print("  {:<34} {:>10.1f}x".format("aceleración", t_anterior / t_actual))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asm = os.path.join(tmp, "programa.asm")
+        with open(asm, "w") as f:
+            f.write(mips_to_bin.FIN_EJEMPLO + "\n" + fuente)
+        coe_anterior, coe_actual = os.path.join(tmp, "anterior.coe"), os.path.join(tmp, "actual.coe")
+        print(" .asm -> .coe:")
+        t_anterior = min(timeit.repeat(lambda: _convertir_concatenando(asm, coe_anterior),
+                                       number=1, repeat=repeticiones))
+        t_actual = min(timeit.repeat(lambda: mips_to_bin.convert_asm_to_coe(asm, coe_actual),
+                                     number=1, repeat=repeticiones))
+        with open(coe_anterior) as a, open(coe_actual) as b:
+            assert a.read() == b.read()
+        _reporte_lineas("convert_asm_to_coe anterior", t_anterior, lineas)
+        _reporte_lineas("convert_asm_to_coe actual", t_actual, lineas)
+        print("  {:<34} {:>10.1f}x".format("aceleración", t_anterior / t_actual))
+
+
+def _pico_memoria(funcion):
+    """Ejecuta funcion() y devuelve (segundos, pico de memoria asignada en bytes)."""
+    tracemalloc.start()
+    inicio = timeit.default_timer()
+    funcion()
+    segundos = timeit.default_timer() - inicio
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return segundos, pico
+
+
+def bench_streaming(lineas=100000):
+    """Memoria pico de convert_asm_to_coe cargando todo vs en streaming (--stream)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        asm = os.path.join(tmp, "programa.asm")
+        with open(asm, "w") as f:
+            f.write(mips_to_bin.FIN_EJEMPLO + "\n" + _programa_aleatorio(lineas))
+        coe_completo, coe_stream = os.path.join(tmp, "completo.coe"), os.path.join(tmp, "stream.coe")
+
+        print("Ensamblado de {} líneas a .coe (tiempo con tracemalloc activo):".format(lineas))
+        for nombre, funcion in (
+                ("en memoria", lambda: mips_to_bin.convert_asm_to_coe(asm, coe_completo)),
+                ("streaming", lambda: mips_to_bin.convert_asm_to_coe(asm, coe_stream, stream=True))):
+            segundos, pico = _pico_memoria(funcion)
+            print("  {:<34} {:>10.2f} s   pico {:>8.1f} KiB".format(nombre, segundos, pico / 1024))
+        with open(coe_completo) as a, open(coe_stream) as b:
+            assert a.read() == b.read()
+
+
+def bench_lote(archivos=40, lineas=2000):
+    """
+    Un 'python mips_to_bin.py' por archivo vs mips_to_bin.assemble_batch (pool
+    de procesos). Los dos sin caché: si no, la primera pasada llena la caché
+    y la segunda solo lee resultados guardados.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mips_to_bin.py")
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(archivos):
+            with open(os.path.join(tmp, "prog{}.asm".format(i)), "w") as f:
+                f.write(mips_to_bin.FIN_EJEMPLO + "\n" + _programa_aleatorio(lineas, semilla=i))
+        entradas = sorted(os.path.join(tmp, nombre) for nombre in os.listdir(tmp))
+
+        def un_proceso_por_archivo():
+            for entrada in entradas:
+                subprocess.run([sys.executable, script, entrada, entrada[:-4] + ".coe"],
+                               check=True, stdout=subprocess.DEVNULL)
+
+        def por_lotes():
+            with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+                mips_to_bin.assemble_batch([tmp], cache=False)
+
+        print("Ensamblado de {} archivos de {} líneas ({} CPUs):".format(archivos, lineas, os.cpu_count()))
+        _reporte_lineas("un intérprete por archivo", timeit.timeit(un_proceso_por_archivo, number=1),
+                        archivos * lineas)
+        _reporte_lineas("assemble_batch", timeit.timeit(por_lotes, number=1), archivos * lineas)
+
+
+def bench_cache(lineas=100000, repeticiones=3):
+    """Reensamblar un programa sin cambios vs leerlo de la caché en disco (asm_cache)."""
+    fuente = _programa_aleatorio(lineas)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AsmCache(tmp)
+        esperado = mips_to_bin.assemble(fuente, skip_header=False)
+        assert mips_to_bin.assemble_cached(fuente, False, cache) == esperado   # fallo: ensambla y guarda
+        assert mips_to_bin.assemble_cached(fuente, False, cache) == esperado   # acierto
+
+        print("Programa de {} líneas sin cambios:".format(lineas))
+        _reporte_lineas("assemble", min(timeit.repeat(
+            lambda: mips_to_bin.assemble(fuente, skip_header=False), number=1, repeat=repeticiones)), lineas)
+        _reporte_lineas("assemble_cached (acierto)", min(timeit.repeat(
+            lambda: mips_to_bin.assemble_cached(fuente, False, cache), number=1, repeat=repeticiones)), lineas)
+        stats = cache.stats()
+        print("  caché: {} aciertos, {} fallos, {} bytes leídos, {} bytes en disco".format(
+            stats["hits"], stats["misses"], stats["bytes_read"], stats["size_bytes"]))
+
+
+def bench_incremental(lineas=20000, repeticiones=5):
+    """Reconversión en la GUI tras editar una línea: assemble completo vs IncrementalAssembler."""
+    programa = _programa_aleatorio(lineas).splitlines()
+    ensamblador = mips_to_bin.IncrementalAssembler()
+    ensamblador.update("\n".join(programa))
+    ediciones = []
+    for i in range(repeticiones):
+        programa[(i * 7919) % lineas] = "ADDI ${}, $0, {}".format(i % 32, i)
+        ediciones.append("\n".join(programa))
+
+    def incremental():
+        for fuente in ediciones:
+            ensamblador.update(fuente)
+
+    def completo():
+        for fuente in ediciones:
+            mips_to_bin.assemble(fuente, skip_header=False)
+
+    assert ensamblador.update(ediciones[-1]) == mips_to_bin._assemble_dos_pasadas(
+        ediciones[-1].splitlines(), False)
+    print("Reconversión de {} líneas tras editar una línea:".format(lineas))
+    print("  {:<34} {:>10.2f} ms".format("assemble", timeit.timeit(completo, number=1) / repeticiones * 1e3))
+    ensamblador.update("\n".join(_programa_aleatorio(lineas).splitlines()))
+    print("  {:<34} {:>10.2f} ms".format("IncrementalAssembler.update",
+                                         timeit.timeit(incremental, number=1) / repeticiones * 1e3))
+
+
+# Bucle anidado con aritmética, memoria, desplazamientos y saltos; ejecuta
+# unas 7 * externas * internas instrucciones antes de HALT
+_PROGRAMA_BUCLE = """
+        ADDI $5, $0, {externas}
+externo: ADDI $2, $0, {internas}
+interno: ADDU $3, $3, $2
+        XOR $4, $3, $5
+        SW $4, $0, 12
+        LW $6, $0, 12
+        SLL $7, $6, 3
+        ADDI $2, $2, -1
+        BNE $2, $0, interno
+        ADDI $5, $5, -1
+        BNE $5, $0, externo
+        HALT
+"""
+
+
+def _programa_bucle(externas, internas=5000):
+    palabras, errores = mips_to_bin.assemble(
+        _PROGRAMA_BUCLE.format(externas=externas, internas=internas), skip_header=False)
+    assert not errores, errores
+    return palabras
+
+
+def _reporte_mips(nombre, segundos, pasos, unidad="MIPS"):
+    print("  {:<34} {:>10.2f} {}  ({} pasos en {:.2f} s)".format(
+        nombre, pasos / segundos / 1e6, unidad, pasos, segundos))
+
+
+def bench_simulador(externas=100):
+    """RUN de un programa de millones de instrucciones en MockSerial con cada modelo."""
+    print("RUN en MockSerial:")
+    for modelo, unidad, divisor in (("bloques", "MIPS", 1), ("funcional", "MIPS", 1),
+                                    ("pipeline", "Mciclos/s", 10)):
+        ser = MockSerial(verbose=False, modelo=modelo)
+        cargar_programa(ser, _programa_bucle(max(externas // divisor, 1)))
+        inicio = time.perf_counter()
+        ser.write(bytes([CMD_RUN]))
+        segundos = time.perf_counter() - inicio
+        assert FrameReader(ser).read_frame()
+        _reporte_mips("{} ({})".format(type(ser.cpu).__name__, modelo), segundos,
+                      ser.last_executed, unidad)
+
+
+def bench_predecodificacion(externas=40):
+    """RUN en MockSerial (modelo funcional) decodificando cada instrucción vs con la caché de predecode."""
+    programa = _programa_bucle(externas)
+    print("RUN en MockSerial, modelo funcional:")
+    for decode_cache, nombre in ((False, "decodificando en cada instrucción"),
+                                 (True, "predecodificado al cargar")):
+        ser = MockSerial(verbose=False, modelo="funcional")
+        ser.cpu.decode_cache = decode_cache
+        cargar_programa(ser, programa)
+        inicio = time.perf_counter()
+        ser.write(bytes([CMD_RUN]))
+        segundos = time.perf_counter() - inicio
+        assert FrameReader(ser).read_frame()
+        _reporte_mips(nombre, segundos, ser.last_executed)
+
+
+def bench_enlace(baudrate=BAUDRATE):
+    """Tiempos del enlace con MockSerial en modo temporizado, comparados con la línea 8N1 ideal."""
+    caracter = tiempo_caracter(baudrate)
+    print("MockSerial temporizado a {} bauds ({:.0f} bytes/s de línea):".format(
+        baudrate, baudrate / 10))
+    ser = MockSerial(verbose=False, ack=False, baudrate=baudrate)
+    lector = FrameReader(ser)
+    programa = [0x20210001] * 126 + [0x3F]  # ADDI $1, $1, 1 ... HALT
+    carga = cargar_programa(ser, programa, baudrate)
+    print("  {:<34} {:>8.1f} ms  (línea: {:.1f} ms)".format(
+        "LOAD de {} palabras".format(carga.instrucciones), carga.segundos * 1e3,
+        carga.bytes * caracter * 1e3))
+    for nombre, cmd in (("STEP", CMD_STEP), ("RUN", CMD_RUN)):
+        inicio = time.perf_counter()
+        ser.write(bytes([cmd]))
+        lector.read_frame()
+        segundos = time.perf_counter() - inicio
+        print("  {:<34} {:>8.1f} ms  (línea: {:.1f} ms, {} pasos)".format(
+            "{} hasta recibir la trama".format(nombre), segundos * 1e3,
+            (1 + FRAME_BYTES) * caracter * 1e3, ser.last_executed))
+
+
+def bench_pasos(ciclos=5000, ciclos_temporizado=20, baudrate=BAUDRATE):
+    """Avanzar N ciclos con un STEP decodificado por ciclo vs step_n / run_until, en MockSerial."""
+    programa = [0x20210001] * 126 + [0x3F]
+
+    def preparar(**kwargs):
+        ser = MockSerial(verbose=False, ack=False, **kwargs)
+        cargar_programa(ser, programa, kwargs.get("baudrate", BAUDRATE))
+        return ser
+
+    ser = preparar()
+    lector = FrameReader(ser)
+    inicio = time.perf_counter()
+    for _ in range(ciclos):
+        ser.write(bytes([CMD_STEP]))
+        lector.read_frame()
+        decode_frame(lector.frame)
+    segundos = time.perf_counter() - inicio
+    print("  {:<34} {:>12.0f} ciclos/s".format("STEP + decodificación por ciclo", ciclos / segundos))
+    pasos = step_n(preparar(), ciclos)
+    print("  {:<34} {:>12.0f} ciclos/s".format("step_n({})".format(ciclos), pasos.ciclos_por_seg))
+    # ADDI en 0x1F0 (la última antes de HALT): se llega tras 124 instrucciones
+    pasos = run_until(preparar(), hasta_pc(0x1F0), max_ciclos=ciclos)
+    print("  {:<34} {:>12.0f} ciclos/s  ({} ciclos)".format(
+        "run_until(pc=0x1F0)", pasos.ciclos_por_seg, pasos.ciclos))
+    pasos = step_n(preparar(baudrate=baudrate), ciclos_temporizado)
+    print("  {:<34} {:>12.1f} ciclos/s  (línea: {:.1f})".format(
+        "step_n({}) a {} bauds".format(ciclos_temporizado, baudrate), pasos.ciclos_por_seg,
+        1 / (FRAME_BYTES * tiempo_caracter(baudrate))))
+
+
+def bench_traza(tramas=100000, consultas=2000):
+    """Grabación de tramas en trace_file y acceso al ciclo N: lectura secuencial hasta N vs TraceReader."""
+    trama = (bytes(range(256)) * 2)[:FRAME_BYTES]
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "sesion.mtr")
+        inicio = time.perf_counter()
+        with TraceWriter(ruta) as traza:
+            for _ in range(tramas):
+                traza.append(trama)
+        segundos = time.perf_counter() - inicio
+        print("  {:<34} {:>10.0f} tramas/s ({:.1f} MB)".format(
+            "TraceWriter.append", tramas / segundos, os.path.getsize(ruta) / 1e6))
+        ciclos = random.Random(0).sample(range(1, tramas + 1), consultas)
+
+        def secuencial():
+            # Sin posición fija por ciclo: leer registro por registro hasta encontrarlo
+            with open(ruta, "rb") as f:
+                for ciclo in ciclos[:consultas // 100]:
+                    f.seek(HEADER_BYTES)
+                    while int.from_bytes(f.read(RECORD_BYTES)[:8], "big") != ciclo:
+                        pass
+        segundos = timeit.timeit(secuencial, number=1)
+        print("  {:<34} {:>10.1f} us por consulta".format(
+            "lectura secuencial hasta el ciclo", segundos / (consultas // 100) * 1e6))
+        with TraceReader(ruta) as traza:
+            segundos = timeit.timeit(lambda: [traza.decode(traza.index_of(c)) for c in ciclos], number=1)
+        print("  {:<34} {:>10.1f} us por consulta".format(
+            "TraceReader.index_of + decode", segundos / consultas * 1e6))
+
+
+BENCHMARKS = {
+    "lectura": bench_lectura,
+    "decodificacion": bench_decodificacion,
+    "ensamblador": bench_ensamblador,
+    "streaming": bench_streaming,
+    "lote": bench_lote,
+    "cache": bench_cache,
+    "incremental": bench_incremental,
+    "simulador": bench_simulador,
+    "predecodificacion": bench_predecodificacion,
+    "enlace": bench_enlace,
+    "pasos": bench_pasos,
+    "traza": bench_traza,
+}
+
+
+if __name__ == "__main__":
+    nombres = sys.argv[1:] or list(BENCHMARKS)
+    for nombre in nombres:
+        if nombre not in BENCHMARKS:
+            print("Benchmark desconocido: {} (opciones: {})".format(nombre, ", ".join(BENCHMARKS)))
+            sys.exit(1)
+        BENCHMARKS[nombre]()
@@ -0,0 +1,241 @@
+#===========================================
+# Script: block_sim.py
+# Description:
+#    Modelo funcional que ejecuta por bloques básicos traducidos a Python.
+#    Un bloque es la secuencia de instrucciones desde un PC hasta el primer
+#    branch, salto o HALT (o hasta MAX_INSTRUCCIONES_BLOQUE). La primera vez
+#    que se llega a ese PC se genera el código fuente de una función que hace
+#    exactamente lo que harían esas instrucciones, con registros, inmediatos y
+#    direcciones ya resueltos, se compila con compile() y se guarda en una
+#    caché por PC de inicio. run() encadena bloques hasta HALT.
+#    Dentro de un bloque los registros usados viven en variables locales y se
+#    escriben de vuelta en registers al salir.
+#    El resultado es el mismo que el de mips_sim.MipsSimulator: los casos que
+#    no encajan en un bloque (PC no alineado, límite de instrucciones en medio
+#    de un bloque, STEP) se ejecutan con su intérprete.
+#    La caché se borra cuando LOAD_PROGRAM cambia alguna palabra.
+#===========================================
+from mips_sim import (
+    MipsSimulator, escribir_palabra, leer_palabra,
+    _ADDI, _ADDU, _BNE, _BEQ, _LW, _SW, _SLL, _SUBU,
+    _AND, _OR, _XOR, _NOR, _SLT, _SLTU, _SRL, _SRA,
+    _SLLV, _SRLV, _SRAV, _ANDI, _ORI, _XORI, _SLTI, _SLTIU,
+    _CONSTANTE, _LB, _LH, _LBU, _LHU, _SB, _SH, _J,
+    _JAL, _JR, _JALR, _HALT, _HALT_LINK, _NOP, _MASCARA, _SIGNO)
+
+MAX_INSTRUCCIONES_BLOQUE = 64
+MAX_BLOQUES = 4096  # Al superarlo se vacía la caché (JR puede saltar a cualquier PC)
+
+_FIN_DE_BLOQUE = frozenset((_BNE, _BEQ, _J, _JAL, _JR, _JALR, _HALT, _HALT_LINK))
+_GLOBALES = {"leer_palabra": leer_palabra, "escribir_palabra": escribir_palabra}
+
+# Operaciones sin control de flujo: manejador -> plantilla con {a}, {b}, {c} ya como
+# nombres de registro locales (rN) o constantes
+_OPERACIONES = {
+    _ADDI: "{b} = ({a} + {c}) & 0xFFFFFFFF",
+    _ADDU: "{c} = ({a} + {b}) & 0xFFFFFFFF",
+    _SUBU: "{c} = ({a} - {b}) & 0xFFFFFFFF",
+    _AND: "{c} = {a} & {b}",
+    _OR: "{c} = {a} | {b}",
+    _XOR: "{c} = {a} ^ {b}",
+    _NOR: "{c} = ~({a} | {b}) & 0xFFFFFFFF",
+    _SLT: "{c} = int(({a} ^ 0x80000000) < ({b} ^ 0x80000000))",
+    _SLTU: "{c} = int({a} < {b})",
+    _SLL: "{b} = ({a} << {c}) & 0xFFFFFFFF",
+    _SRL: "{b} = {a} >> {c}",
+    _SRA: "{b} = (({a} - 0x100000000 if {a} & 0x80000000 else {a}) >> {c}) & 0xFFFFFFFF",
+    _SLLV: "{c} = ({b} << {a}) & 0xFFFFFFFF if {a} < 32 else 0",
+    _SRLV: "{c} = {b} >> {a}",
+    _SRAV: "{c} = (({b} - 0x100000000 if {b} & 0x80000000 else {b}) >> {a}) & 0xFFFFFFFF",
+    _ANDI: "{b} = {a} & {c}",
+    _ORI: "{b} = {a} | {c}",
+    _XORI: "{b} = {a} ^ {c}",
+    _SLTI: "{b} = int(({a} ^ 0x80000000) < {cs})",
+    _SLTIU: "{b} = int({a} < {c})",
+    _LW: "d = ({a} + {c}) & 127\n"
+         "{b} = int.from_bytes(mem[d:d + 4], 'big') if d <= 124 else leer_palabra(mem, d)",
+    _LB: "x = mem[({a} + {c3}) & 127]\n"
+         "{b} = x | 0xFFFFFF00 if x & 0x80 else x",
+    _LH: "d = ({a} + {c}) & 127\n"
+         "x = (mem[(d + 2) & 127] << 8) | mem[(d + 3) & 127]\n"
+         "{b} = x | 0xFFFF0000 if x & 0x8000 else x",
+    _LBU: "{b} = mem[({a} + {c3}) & 127]",
+    _LHU: "d = ({a} + {c}) & 127\n"
+          "{b} = (mem[(d + 2) & 127] << 8) | mem[(d + 3) & 127]",
+}
+# Operaciones de tipo R que leen a y b y escriben c; el resto lee a y escribe b
+_LEE_A_B = frozenset((_ADDU, _SUBU, _AND, _OR, _XOR, _NOR, _SLT, _SLTU, _SLLV, _SRLV, _SRAV))
+
+
+class _Traductor:
+    """Genera el código de un bloque llevando la cuenta de los registros usados."""
+
+    def __init__(self):
+        self.lineas = []
+        self.leidos = []       # Registros que hay que cargar al entrar (en orden)
+        self.escritos = []     # Registros que hay que guardar al salir (en orden)
+        self._definidos = set()
+
+    def leer(self, n):
+        if n not in self._definidos:
+            self._definidos.add(n)
+            self.leidos.append(n)
+        return "r{}".format(n)
+
+    def escribir(self, n):
+        self._definidos.add(n)
+        if n not in self.escritos:
+            self.escritos.append(n)
+        return "r{}".format(n)
+
+    def emitir(self, codigo):
+        self.lineas.extend(codigo.split("\n"))
+
+    def salida(self, *lineas):
+        """Guarda los registros escritos y agrega las líneas que devuelven el PC siguiente."""
+        self.lineas.extend("r[{0}] = r{0}".format(n) for n in self.escritos)
+        self.lineas.extend(lineas)
+
+    def fuente(self, nombre):
+        cuerpo = ["r{0} = r[{0}]".format(n) for n in self.leidos] + self.lineas
+        return "def {}(r, mem):\n{}\n".format(nombre, "\n".join("    " + linea for linea in cuerpo))
+
+
+def traducir_bloque(decodificadas, pc):
+    """
+    Traduce el bloque que empieza en pc (alineado). Devuelve
+    (fuente, nombre, instrucciones, termina_en_halt); la función generada
+    recibe (registros, memoria) y devuelve el PC con el que sigue.
+    """
+    t = _Traductor()
+    nombre = "bloque_{:08x}".format(pc)
+    instrucciones = 0
+    halt = False
+    while True:
+        k, a, b, c = decodificadas[(pc >> 2) & 127]
+        instrucciones += 1
+        siguiente = (pc + 4) & _MASCARA
+        if k in _FIN_DE_BLOQUE:
+            if k == _BEQ or k == _BNE:
+                ra, rb = t.leer(a), t.leer(b)
+                t.salida("return {} if {} {} {} else {}".format(
+                    (siguiente + c) & _MASCARA, ra, "==" if k == _BEQ else "!=", rb, siguiente))
+            elif k == _J or k == _JAL:
+                if k == _JAL:
+                    t.emitir("{} = {}".format(t.escribir(31), (siguiente + 4) & _MASCARA))
+                t.salida("return {}".format((siguiente & 0xF0000000) | c))
+            elif k == _JR or k == _JALR:
+                # JALR lee rs antes de escribir rd
+                t.emitir("destino = {}".format(t.leer(a)))
+                if k == _JALR:
+                    t.emitir("{} = {}".format(t.escribir(c), (siguiente + 4) & _MASCARA))
+                t.salida("return destino")
+            else:
+                if k == _HALT_LINK:
+                    t.emitir("{} = {}".format(t.escribir(c), (siguiente + 4) & _MASCARA))
+                t.salida("return {}".format(pc))  # El PC queda en el HALT
+                halt = True
+            break
+        if k == _CONSTANTE:
+            t.emitir("{} = {}".format(t.escribir(b), c))
+        elif k in (_SW, _SB, _SH):
+            ra, rb = t.leer(a), t.leer(b)
+            dato = rb if k == _SW else "({} & {})".format(rb, 0xFF if k == _SB else 0xFFFF)
+            t.emitir("d = ({} + {}) & 127\n"
+                     "if d <= 124:\n"
+                     "    mem[d:d + 4] = {}.to_bytes(4, 'big')\n"
+                     "else:\n"
+                     "    escribir_palabra(mem, d, {})".format(ra, c, dato, dato))
+        elif k != _NOP:
+            # Los operandos se leen antes de nombrar el destino, que puede ser el mismo registro
+            if k in _LEE_A_B:
+                campos = {"a": t.leer(a), "b": t.leer(b)}
+                campos["c"] = t.escribir(c)
+            elif k in (_SLL, _SRL, _SRA):
+                campos = {"a": t.leer(a), "c": c}
+                campos["b"] = t.escribir(b)
+            else:
+                campos = {"a": t.leer(a), "c": c, "c3": c + 3, "cs": c ^ _SIGNO}
+                campos["b"] = t.escribir(b)
+            t.emitir(_OPERACIONES[k].format(**campos))
+        pc = siguiente
+        if instrucciones == MAX_INSTRUCCIONES_BLOQUE:
+            t.salida("return {}".format(pc))
+            break
+    return t.fuente(nombre), nombre, instrucciones, halt
+
+
+class BlockSimulator(MipsSimulator):
+    """
+    MipsSimulator que en RUN ejecuta bloques traducidos. blocks guarda, por PC
+    de inicio, (función, instrucciones, termina_en_halt).
+    """
+
+    def reset(self):
+        super().reset()
+        self.blocks = {}
+
+    def load_program(self, palabras):
+        """Como MipsSimulator.load_program; si alguna palabra cambia se descartan los bloques traducidos."""
+        cambia = any(self.instructions[i] != (palabra & _MASCARA)
+                     for i, palabra in enumerate(palabras[:len(self.instructions)]))
+        super().load_program(palabras)
+        if cambia:
+            self.blocks.clear()
+
+    def block_source(self, pc):
+        """Código Python que se genera para el bloque que empieza en pc (para depurar)."""
+        return traducir_bloque(self.decoded, pc)[0]
+
+    def run(self, max_instrucciones=None):
+        if self.halted:
+            return 0
+        if max_instrucciones is None:
+            limite = -1
+        elif max_instrucciones < MAX_INSTRUCCIONES_BLOQUE:
+            # Un STEP o una ráfaga corta no justifican traducir
+            return super().run(max_instrucciones)
+        else:
+            limite = max_instrucciones
+        n = self._run_bloques(limite)
+        self.executed += n
+        return n
+
+    def _traducir(self, pc):
+        fuente, nombre, instrucciones, halt = traducir_bloque(self.decoded, pc)
+        espacio = dict(_GLOBALES)
+        exec(compile(fuente, "<{}>".format(nombre), "exec"), espacio)
+        if len(self.blocks) >= MAX_BLOQUES:
+            self.blocks.clear()
+        bloque = self.blocks[pc] = (espacio[nombre], instrucciones, halt)
+        return bloque
+
+    def _run_bloques(self, limite):
+        r = self.registers
+        mem = self.memory
+        bloques = self.blocks
+        pc = self.pc
+        n = 0
+        while True:
+            if pc & 3:
+                # JR a una dirección no alineada: esa instrucción la ejecuta el intérprete
+                if n == limite:
+                    break
+                self.pc = pc
+                n += self._run_predecodificado(1)
+                pc = self.pc
+                if self.halted:
+                    return n
+                continue
+            bloque = bloques.get(pc) or self._traducir(pc)
+            if limite >= 0 and n + bloque[1] > limite:
+                # El límite cae dentro del bloque: el resto, instrucción por instrucción
+                self.pc = pc
+                return n + self._run_predecodificado(limite - n)
+            pc = bloque[0](r, mem)
+            n += bloque[1]
+            if bloque[2]:
+                self.halted = True
+                break
+        self.pc = pc
+        return n
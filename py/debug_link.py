@@ -0,0 +1,370 @@
+#===========================================
+# Script: debug_link.py
+# Description:
+#    Funciones compartidas del lado host para hablar con la debug_unit por UART.
+#    Las usan fpga.py, run_debug.py y la GUI (mips_fpga_gui_visual.py), y
+#    funcionan con cualquier objeto tipo puerto serie (serial.Serial, MockSerial
+#    o un socket de pyserial), por eso este módulo no importa pyserial.
+# Key Features:
+#    - Carga del programa en una única ráfaga (LOAD_PROGRAM)
+#    - Handshake de preparación en lugar de una espera fija
+#    - Medición de la tasa efectiva de transferencia (bytes/s)
+#    - Lectura de la respuesta de STEP/RUN sin copias (readinto + memoryview)
+#    - Lectura de programas .coe (parse_coe)
+#    - STEP de N ciclos y "correr hasta" una condición (step_n, run_until):
+#      las tramas intermedias se leen en el mismo buffer y no se decodifican
+#===========================================
+import struct
+import time
+from collections import namedtuple
+
+# Parámetros de comunicación
+BAUDRATE = 19200
+# Bits por carácter en el enlace 8N1 (start + 8 datos + stop)
+BITS_POR_CARACTER = 10
+
+# Comandos definidos (en byte)
+CMD_LOAD  = 0x04  # LOAD_PROGRAM
+CMD_RUN   = 0x03  # RUN
+CMD_STEP  = 0x05  # STEP
+CMD_RESET = 0x0C  # RESET
+
+# Valor de HALT en 32 bits
+HALT_INSTR = 0x0000003F
+
+# Número total de bytes de registros y memoria (32 x 32 bits + 32 x 32 bits)
+EXPECTED_RESPONSE_BYTES = 256
+# Número de bytes de los registros de pipeline (IF_ID + ID_EX + EX_M + M_WB)
+PIPELINE_BYTES = 47
+# Respuesta completa de STEP/RUN
+FRAME_BYTES = EXPECTED_RESPONSE_BYTES + PIPELINE_BYTES
+
+# Byte de confirmación que envían algunos destinos (p. ej. MockSerial) tras LOAD_PROGRAM
+ACK = 0x01
+
+# STEP que step_n envía sin esperar su respuesta. Cada uno ocupa un byte de la
+# FIFO de RX de la debug_unit (32 bytes) mientras la FSM envía la trama anterior
+VENTANA_STEP = 16
+# Ciclos máximos de run_until: tras HALT el procesador se reinicia (con ambas
+# memorias borradas) y sigue avanzando, así que una condición que no se cumple
+# no termina sola
+MAX_CICLOS_HASTA = 100_000
+
+# Segundos que step_n y run_until esperan por defecto cada trama si el puerto
+# deja de entregar datos (una trama tarda 0,16 s a 19200 bauds)
+TIMEOUT_TRAMA = 5.0
+
+# Posición en la trama de los registros, la memoria y el pc+4 de IF_ID
+_OFFSET_MEMORIA = 128
+_OFFSET_PC4 = EXPECTED_RESPONSE_BYTES + 4
+
+ResultadoCarga = namedtuple(
+    "ResultadoCarga",
+    ["instrucciones", "bytes", "segundos", "bytes_por_seg", "tasa_linea"],
+)
+
+ResultadoPasos = namedtuple(
+    "ResultadoPasos",
+    ["ciclos", "segundos", "ciclos_por_seg", "cumplida"],
+)
+
+
+def tiempo_caracter(baudrate=BAUDRATE):
+    """Segundos que tarda en viajar un carácter 8N1 a la velocidad indicada."""
+    return BITS_POR_CARACTER / baudrate
+
+
+def empaquetar_programa(instrucciones):
+    """
+    Empaqueta las instrucciones en un único buffer de palabras de 32 bits big-endian.
+    Se incluye todo hasta la instrucción HALT inclusive (la debug_unit deja de
+    escribir memoria de instrucciones al recibirla); lo que siga se descarta.
+    """
+    try:
+        fin = instrucciones.index(HALT_INSTR) + 1
+    except ValueError:
+        fin = len(instrucciones)
+    return struct.pack(">{}I".format(fin), *instrucciones[:fin])
+
+
+def parse_coe(filename):
+    """
+    Lee un archivo .coe donde cada línea contiene al menos 32 dígitos (bits) en formato binario.
+    Se ignora cualquier cosa que siga después del primer espacio.
+    Solo se toman los primeros 32 caracteres de cada línea.
+    Si se encuentra la instrucción HALT (00000000000000000000000000111111) se detiene la lectura.
+    """
+    instrucciones = []
+    with open(filename, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue  # Salta líneas vacías
+            token = line.split()[0]
+            if len(token) < 32:
+                print(f"Línea ignorada (menos de 32 bits): {line}")
+                continue
+            bits = token[:32]
+            if not all(c in '01' for c in bits):
+                print(f"Línea ignorada (no es una cadena binaria válida): {line}")
+                continue
+            try:
+                instr = int(bits, 2)
+            except ValueError:
+                print(f"Error al convertir la línea a entero: {line}")
+                continue
+            instrucciones.append(instr)
+            if instr == HALT_INSTR:
+                break
+    return instrucciones
+
+
+def esperar_listo(ser, baudrate=BAUDRATE, timeout=None):
+    """
+    Handshake de preparación tras enviar un byte de comando.
+    Primero se vacía el buffer de salida (flush espera a que el byte salga
+    físicamente por la UART); la FSM de la debug_unit pasa de START al estado
+    del comando pocos ciclos de reloj después. Luego se espera como máximo
+    'timeout' segundos (por defecto dos tiempos de carácter) a un ACK opcional:
+    el hardware no envía ninguno, pero MockSerial sí, y si no se consumiera
+    quedaría mezclado con la siguiente respuesta.
+    Devuelve True si se recibió un ACK.
+    """
+    ser.flush()
+    if timeout is None:
+        timeout = 2 * tiempo_caracter(baudrate)
+    limite = time.monotonic() + timeout
+    while True:
+        if getattr(ser, "in_waiting", 0):
+            return ser.read(1) == bytes([ACK])
+        if time.monotonic() >= limite:
+            return False
+        time.sleep(timeout / 10)
+
+
+def cargar_programa(ser, instrucciones, baudrate=BAUDRATE):
+    """
+    Envía LOAD_PROGRAM (0x04) y luego el programa completo (hasta HALT) en una
+    sola escritura con un único flush, en lugar de una escritura + flush por
+    instrucción. Devuelve un ResultadoCarga con la tasa efectiva en bytes/s y
+    la tasa de línea teórica (baudrate / 10 para 8N1) para compararlas.
+    """
+    payload = empaquetar_programa(instrucciones)
+    ser.write(bytes([CMD_LOAD]))
+    esperar_listo(ser, baudrate)
+
+    inicio = time.perf_counter()
+    ser.write(payload)
+    ser.flush()
+    segundos = time.perf_counter() - inicio
+
+    bytes_por_seg = len(payload) / segundos if segundos > 0 else float("inf")
+    return ResultadoCarga(len(payload) // 4, len(payload), segundos,
+                          bytes_por_seg, baudrate / BITS_POR_CARACTER)
+
+
+def leer_en(ser, view):
+    """
+    Llena 'view' (memoryview o bytearray) con datos del puerto serie sin
+    concatenar bytes. La primera lectura usa ser.readinto si existe
+    (pyserial, MockSerial) y escribe directo en el buffer; si la trama llega
+    en pedazos, el resto se pide con ser.read y cada pedazo se copia en el
+    hueco que falta. Devuelve la cantidad de bytes leídos, que es menor que
+    len(view) solo si el puerto dejó de entregar datos.
+    """
+    if not isinstance(view, memoryview):
+        view = memoryview(view)
+    total_bytes = len(view)
+    readinto = getattr(ser, "readinto", None)
+    recibido = 0
+    if readinto is not None:
+        # Lo habitual es que la primera lectura llene la trama, directo en el buffer
+        recibido = readinto(view) or 0
+        if not recibido:
+            return 0  # Timeout sin datos: no esperar otro timeout con read
+    # Con lecturas cortas el costo está en cada llamada, no en la copia: read
+    # es más barato que readinto sobre una vista recortada, y cada pedazo se
+    # copia una sola vez en su lugar (no se concatena)
+    read = ser.read
+    while recibido < total_bytes:
+        chunk = read(total_bytes - recibido)
+        n = len(chunk)
+        if not n:
+            break
+        view[recibido:recibido + n] = chunk
+        recibido += n
+    return recibido
+
+
+class Cancelado(Exception):
+    """Se pidió detener (threading.Event) mientras se esperaba una trama."""
+
+
+class FrameReader:
+    """
+    Lector reutilizable de la respuesta de STEP/RUN (256 + 47 bytes).
+    Preasigna un único bytearray y lo llena con readinto a través de un
+    memoryview; dump y pipeline son vistas sobre ese mismo buffer, de modo
+    que los decodificadores reciben los datos sin copias. Las vistas se
+    sobrescriben en la siguiente lectura: quien necesite conservar una
+    trama debe copiarla (bytes(reader.frame)).
+    """
+
+    def __init__(self, ser, frame_bytes=FRAME_BYTES):
+        self.ser = ser
+        self.buffer = bytearray(frame_bytes)
+        self.view = memoryview(self.buffer)
+        self.received = 0
+
+    def read_frame(self, limite=None, cancelar=None):
+        """
+        Lee una trama completa. Devuelve True si llegaron todos los bytes.
+        Sin limite, una lectura que vuelve incompleta (timeout del puerto)
+        termina la trama; con limite (un instante de time.monotonic()) se
+        sigue leyendo hasta ese instante, y cancelar (threading.Event) corta
+        la espera. Así un puerto con timeout corto no bloquea a quien lo usa.
+        """
+        total = len(self.buffer)
+        self.received = leer_en(self.ser, self.view)
+        while self.received < total and limite is not None and time.monotonic() < limite:
+            if cancelar is not None and cancelar.is_set():
+                break
+            n = leer_en(self.ser, self.view[self.received:])
+            if not n:
+                time.sleep(0.001)  # Puerto sin timeout propio: no girar en vacío
+            self.received += n
+        return self.received == total
+
+    @property
+    def frame(self):
+        return self.view[:self.received]
+
+    @property
+    def dump(self):
+        """Registros y memoria (primeros 256 bytes)."""
+        return self.view[:min(self.received, EXPECTED_RESPONSE_BYTES)]
+
+    @property
+    def pipeline(self):
+        """Registros de pipeline (últimos 47 bytes)."""
+        return self.view[EXPECTED_RESPONSE_BYTES:max(self.received, EXPECTED_RESPONSE_BYTES)]
+
+
+def hasta_pc(pc):
+    """Condición de run_until: la instrucción de la dirección pc llegó a IF_ID."""
+    objetivo = ((pc + 4) & 0xFFFFFFFF).to_bytes(4, "big")
+    return lambda trama: trama[_OFFSET_PC4:_OFFSET_PC4 + 4] == objetivo
+
+
+def _hasta_cambio(offset, trama_inicial):
+    anterior = [None if trama_inicial is None else bytes(trama_inicial[offset:offset + 4])]
+
+    def condicion(trama):
+        valor = trama[offset:offset + 4]
+        if anterior[0] is None:
+            anterior[0] = bytes(valor)  # Sin trama inicial, la primera es la referencia
+            return False
+        return valor != anterior[0]
+    return condicion
+
+
+def hasta_cambio_registro(n, trama_inicial=None):
+    """
+    Condición de run_until: el registro n cambia respecto de trama_inicial
+    (la última trama conocida; si es None, respecto de la primera que llegue).
+    """
+    if not 0 <= n < 32:
+        raise ValueError("Registro fuera de rango: {}".format(n))
+    return _hasta_cambio(4 * n, trama_inicial)
+
+
+def hasta_cambio_memoria(palabra, trama_inicial=None):
+    """Condición de run_until: la palabra de memoria de datos cambia (ver hasta_cambio_registro)."""
+    if not 0 <= palabra < 32:
+        raise ValueError("Palabra de memoria fuera de rango: {}".format(palabra))
+    return _hasta_cambio(_OFFSET_MEMORIA + 4 * palabra, trama_inicial)
+
+
+def parse_condicion(texto, trama_inicial=None):
+    """
+    Convierte el texto de una condición de parada en la función que espera
+    run_until. Formatos: "pc=0x40" (o decimal), "r5" / "$5" (cambia el
+    registro 5), "mem3" (cambia la palabra 3 de la memoria de datos).
+    """
+    texto = texto.strip().lower().replace(" ", "")
+    try:
+        if texto.startswith("pc="):
+            return hasta_pc(int(texto[3:], 0))
+        if texto.startswith("mem"):
+            return hasta_cambio_memoria(int(texto[3:]), trama_inicial)
+        if texto[:1] in ("r", "$"):
+            return hasta_cambio_registro(int(texto[1:]), trama_inicial)
+    except ValueError as e:
+        raise ValueError("Condición inválida '{}': {}".format(texto, e))
+    raise ValueError("Condición inválida '{}' (use pc=0x40, r5 o mem3)".format(texto))
+
+
+def _pasos(ser, lector, ciclos, ventana, condicion, detener, grabador, timeout):
+    """
+    Envía STEP de a 'ventana' sin esperar cada respuesta y lee las tramas en el
+    buffer de lector sin decodificarlas (y las agrega a grabador, un
+    trace_file.TraceWriter, si lo hay). Devuelve ResultadoPasos; la última
+    trama leída queda en lector. Si detener se activa entre ventanas se
+    devuelve lo hecho; si se activa esperando una trama se lanza Cancelado
+    (las respuestas que faltaban de la ventana siguen llegando al puerto).
+    """
+    paso = bytes([CMD_STEP])
+    hechos = 0
+    cumplida = False
+    inicio = time.perf_counter()
+    while hechos < ciclos and not cumplida:
+        if detener is not None and detener.is_set():
+            break
+        k = min(ventana, ciclos - hechos)
+        ser.write(paso * k)
+        for _ in range(k):
+            if not lector.read_frame(time.monotonic() + timeout, detener):
+                if detener is not None and detener.is_set():
+                    raise Cancelado("cancelado tras {} ciclos".format(hechos))
+                raise TimeoutError("trama incompleta ({} bytes) en el ciclo {}".format(
+                    lector.received, hechos + 1))
+            hechos += 1
+            if grabador is not None:
+                grabador.append(lector.view)
+            if condicion is not None and condicion(lector.view):
+                cumplida = True
+    segundos = time.perf_counter() - inicio
+    if condicion is None:
+        cumplida = hechos == ciclos
+    return ResultadoPasos(hechos, segundos, hechos / segundos if segundos > 0 else float("inf"), cumplida)
+
+
+def step_n(ser, n, lector=None, detener=None, grabador=None, timeout=TIMEOUT_TRAMA):
+    """
+    Avanza n ciclos, lo mismo que n comandos STEP (si el programa llega a HALT
+    el procesador se reinicia, como con cualquier STEP). Los STEP se envían
+    de a VENTANA_STEP para no esperar la vuelta de cada uno, y de las tramas
+    intermedias solo se lee lo necesario para mantener el protocolo: la última
+    queda en lector (un FrameReader; si es None se crea uno). detener es un
+    threading.Event opcional: entre ventanas corta y devuelve lo hecho, y
+    mientras se espera una trama lanza Cancelado. timeout son los segundos
+    que se espera cada trama (TimeoutError). Con grabador (un
+    trace_file.TraceWriter) se graban también las tramas intermedias.
+    """
+    if n < 0:
+        raise ValueError("Cantidad de ciclos negativa: {}".format(n))
+    return _pasos(ser, lector or FrameReader(ser), n, VENTANA_STEP, None, detener, grabador, timeout)
+
+
+def run_until(ser, condicion, max_ciclos=MAX_CICLOS_HASTA, lector=None, detener=None, grabador=None,
+              timeout=TIMEOUT_TRAMA):
+    """
+    Avanza de a un STEP hasta que condicion(trama) sea verdadera o se cumplan
+    max_ciclos. La condición recibe los bytes crudos de cada trama (ver
+    hasta_pc, hasta_cambio_registro, hasta_cambio_memoria y parse_condicion);
+    acá no se puede adelantar STEP porque el procesador se pasaría del ciclo
+    buscado. Devuelve ResultadoPasos con cumplida en True si se detuvo por la
+    condición; la trama de ese ciclo queda en lector. detener, grabador y
+    timeout: ver step_n.
+    """
+    return _pasos(ser, lector or FrameReader(ser), max_ciclos, 1, condicion, detener, grabador, timeout)
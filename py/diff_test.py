@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+#===========================================
+# Script: diff_test.py
+# Description:
+#    Pruebas diferenciales contra un modelo de referencia. Cada programa
+#    (.asm o .coe) se ejecuta en pipeline_sim (ciclo a ciclo, el "golden") y
+#    en uno o más destinos que hablan el protocolo de la debug_unit, y se
+#    comparan los 32 registros y las 32 palabras de la memoria de datos:
+#      - STEP a STEP hasta que el programa llega a HALT; ante la primera
+#        diferencia se informa el ciclo y las dos tramas de pipeline decodificadas
+#      - después de RUN, el volcado final
+#    Destinos:
+#      - mock, mock:funcional, mock:bloques: MockSerial en este proceso (con los
+#        modelos funcionales STEP avanza una instrucción, así que conviene --solo-run)
+#      - socket://host:puerto (emulator_server.py) o un puerto serie
+#        (/dev/ttyUSB0, COM3); estos necesitan pyserial
+#    Cada destino trabaja en su propio hilo (un puerto atiende un comando a la
+#    vez) y recorre todos los programas; al final se imprime una tabla resumen.
+#    El código de salida es 1 si algún destino difiere del modelo.
+# Uso:
+#    python3 diff_test.py prueba.asm 1.coe --target mock --target socket://localhost:5000
+#===========================================
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from debug_link import (BAUDRATE, CMD_RESET, CMD_RUN, CMD_STEP, EXPECTED_RESPONSE_BYTES,
+                        HALT_INSTR, FrameReader, cargar_programa, esperar_listo, parse_coe)
+from frame_layout import decode_frame, pipeline_stages
+from mips_to_bin import FIN_EJEMPLO, assemble
+from mockserial import MockSerial
+from pipeline_sim import PipelineSimulator
+
+# Un programa sin HALT en este límite de ciclos no se prueba con RUN (colgaría a la placa)
+MAX_CICLOS = 10_000
+
+Resultado = namedtuple("Resultado", ["programa", "destino", "ciclos", "step", "run", "detalle", "segundos", "error"])
+
+
+def cargar_archivo(ruta):
+    """Palabras del programa en ruta (.coe o .asm), terminadas en HALT."""
+    if ruta.lower().endswith(".coe"):
+        palabras = parse_coe(ruta)
+    else:
+        with open(ruta, "r") as f:
+            source = f.read()
+        palabras, errores = assemble(source, FIN_EJEMPLO in source)
+        if errores:
+            raise ValueError("{}: {}".format(ruta, "; ".join(errores)))
+    if HALT_INSTR in palabras:
+        palabras = palabras[:palabras.index(HALT_INSTR) + 1]
+    else:
+        palabras = palabras + [HALT_INSTR]  # La debug_unit carga hasta recibir HALT
+    return palabras
+
+
+class GoldenTrace:
+    """
+    Respuestas del modelo de referencia para un programa: la trama de cada
+    STEP hasta HALT (como la debug_unit, tras HALT el procesador se reinicia)
+    y la de RUN.
+    """
+
+    def __init__(self, palabras, max_ciclos=MAX_CICLOS):
+        cpu = PipelineSimulator()
+        cpu.load_program(palabras)
+        self.steps = []
+        self.halted = False
+        while len(self.steps) < max_ciclos and not self.halted:
+            cpu.step()
+            self.steps.append(cpu.dump() + cpu.pipeline_data())
+            self.halted = cpu.halted
+        self.run = None
+        if self.halted:
+            cpu.reset()
+            cpu.load_program(palabras)
+            cpu.run()
+            self.run = cpu.dump() + cpu.pipeline_data()
+
+
+def abrir_destino(nombre, baudrate=BAUDRATE, timeout=2):
+    if nombre == "mock" or nombre.startswith("mock:"):
+        return MockSerial(verbose=False, modelo=nombre.partition(":")[2] or "pipeline")
+    import serial  # pyserial solo hace falta para destinos reales
+
+    return serial.serial_for_url(nombre, baudrate=baudrate, timeout=timeout)
+
+
+def _hex(valor):
+    return "0x{:08X}".format(valor)
+
+
+def describir_divergencia(esperada, obtenida, pipeline=True):
+    """
+    Líneas que muestran en qué difieren dos tramas: registros, memoria y (con
+    pipeline) los registros de pipeline por etapa.
+    """
+    ref = decode_frame(esperada)
+    des = decode_frame(obtenida)
+    lineas = []
+    for nombre, a, b in (("R", ref.registers, des.registers), ("MEM", ref.memory, des.memory)):
+        for i, (x, y) in enumerate(zip(a, b)):
+            if x != y:
+                lineas.append("  {}{:<3} referencia {}  destino {}".format(nombre, i, _hex(x), _hex(y)))
+    if not pipeline:
+        return lineas
+    lineas.append("  {:<24} {:>12} {:>12}".format("pipeline", "referencia", "destino"))
+    for (etapa, campos_ref), (_, campos_des) in zip(pipeline_stages(ref.pipeline), pipeline_stages(des.pipeline)):
+        for (etiqueta, x, _), (_, y, _) in zip(campos_ref, campos_des):
+            lineas.append("  {:<24} {:>12} {:>12}{}".format(
+                etapa + "." + etiqueta, _hex(x), _hex(y), "  <--" if x != y else ""))
+    return lineas
+
+
+class TargetSession:
+    """Comandos de la debug_unit sobre un puerto ya abierto."""
+
+    def __init__(self, ser, baudrate):
+        self.ser = ser
+        self.baudrate = baudrate
+        self.lector = FrameReader(ser)
+
+    def cargar(self, palabras):
+        self.ser.write(bytes([CMD_RESET]))
+        esperar_listo(self.ser, self.baudrate)
+        cargar_programa(self.ser, palabras, self.baudrate)
+
+    def trama(self, cmd):
+        self.ser.write(bytes([cmd]))
+        self.ser.flush()
+        if not self.lector.read_frame():
+            raise TimeoutError("trama incompleta ({} bytes)".format(self.lector.received))
+        return bytes(self.lector.frame)
+
+
+def compare_program(sesion, nombre, destino, palabras, golden, solo_run):
+    """Prueba un programa en un destino. Devuelve un Resultado."""
+    inicio = time.perf_counter()
+    ciclos = len(golden.steps)
+    step = run = None
+    error = False
+    detalle = []
+    fase = "STEP"
+    try:
+        if not solo_run:
+            sesion.cargar(palabras)
+            step = True
+            for ciclo, esperada in enumerate(golden.steps, 1):
+                obtenida = sesion.trama(CMD_STEP)
+                if obtenida[:EXPECTED_RESPONSE_BYTES] != esperada[:EXPECTED_RESPONSE_BYTES]:
+                    step = False
+                    ciclos = ciclo
+                    detalle = ["{} en {}: primera diferencia en el ciclo {}".format(nombre, destino, ciclo)]
+                    detalle += describir_divergencia(esperada, obtenida)
+                    break
+        fase = "RUN"
+        if golden.run is not None:
+            sesion.cargar(palabras)
+            obtenida = sesion.trama(CMD_RUN)
+            run = obtenida[:EXPECTED_RESPONSE_BYTES] == golden.run[:EXPECTED_RESPONSE_BYTES]
+            if not run:
+                detalle.append("{} en {}: volcado distinto después de RUN".format(nombre, destino))
+                detalle += describir_divergencia(golden.run, obtenida)
+    except (OSError, TimeoutError, ValueError) as e:
+        detalle.append("{} en {} ({}): {}".format(nombre, destino, fase, e))
+        error = True
+        if fase == "STEP":
+            step = False
+        else:
+            run = False
+    return Resultado(nombre, destino, ciclos, step, run, detalle, time.perf_counter() - inicio, error)
+
+
+def _probar_destino(destino, programas, goldens, baudrate, solo_run):
+    try:
+        ser = abrir_destino(destino, baudrate)
+    except Exception as e:
+        return [Resultado(nombre, destino, 0, None, None, ["{}: no se pudo abrir: {}".format(destino, e)], 0.0, True)
+                for nombre, _ in programas]
+    sesion = TargetSession(ser, baudrate)
+    try:
+        return [compare_program(sesion, nombre, destino, palabras, goldens[nombre], solo_run)
+                for nombre, palabras in programas]
+    finally:
+        ser.close()
+
+
+def differential_test(rutas, destinos, baudrate=BAUDRATE, max_ciclos=MAX_CICLOS, solo_run=False):
+    """
+    Prueba cada programa en cada destino (un hilo por destino) contra el
+    modelo de referencia. Devuelve la lista de Resultado, por programa y destino.
+    """
+    programas = [(os.path.basename(ruta), cargar_archivo(ruta)) for ruta in rutas]
+    goldens = {nombre: GoldenTrace(palabras, max_ciclos) for nombre, palabras in programas}
+    with ThreadPoolExecutor(max_workers=max(len(destinos), 1)) as pool:
+        por_destino = list(pool.map(
+            lambda destino: _probar_destino(destino, programas, goldens, baudrate, solo_run), destinos))
+    return [resultado for resultados in zip(*por_destino) for resultado in resultados]
+
+
+def _estado(valor, texto_ok):
+    if valor is None:
+        return "-"
+    return texto_ok if valor else "DIFIERE"
+
+
+def print_summary(resultados):
+    ancho_programa = max([len("Programa")] + [len(r.programa) for r in resultados])
+    ancho_destino = max([len("Destino")] + [len(r.destino) for r in resultados])
+    formato = "{:<%d}  {:<%d}  {:<22}  {:<8}  {:>8}" % (ancho_programa, ancho_destino)
+    print(formato.format("Programa", "Destino", "STEP", "RUN", "Tiempo"))
+    for r in resultados:
+        if r.error and r.step is not False:
+            step = "ERROR"
+        elif r.step is False:
+            step = "DIFIERE (ciclo {})".format(r.ciclos)
+        else:
+            step = _estado(r.step, "OK ({} ciclos)".format(r.ciclos))
+        print(formato.format(r.programa, r.destino, step, _estado(r.run, "OK"),
+                             "{:.2f} s".format(r.segundos)))
+    fallidos = [r for r in resultados if r.error or r.step is False or r.run is False]
+    print("{} pruebas, {} con diferencias".format(len(resultados), len(fallidos)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pruebas diferenciales de la placa (o un emulador) contra el modelo")
+    parser.add_argument("programas", nargs="+", help="archivos .asm o .coe")
+    parser.add_argument("--target", action="append", dest="destinos",
+                        help="mock[:modelo], socket://host:puerto o puerto serie (se puede repetir)")
+    parser.add_argument("--baudrate", type=int, default=BAUDRATE)
+    parser.add_argument("--max-ciclos", type=int, default=MAX_CICLOS,
+                        help="ciclos máximos de STEP por programa")
+    parser.add_argument("--solo-run", action="store_true", help="comparar solo el volcado después de RUN")
+    args = parser.parse_args()
+
+    try:
+        resultados = differential_test(args.programas, args.destinos or ["mock"], args.baudrate,
+                                       args.max_ciclos, args.solo_run)
+    except (OSError, ValueError) as e:
+        print("Error: {}".format(e))
+        sys.exit(1)
+    for r in resultados:
+        for linea in r.detalle:
+            print(linea)
+    if any(r.detalle for r in resultados):
+        print("")
+    print_summary(resultados)
+    sys.exit(1 if any(r.error or r.step is False or r.run is False for r in resultados) else 0)
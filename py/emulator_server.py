@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+#===========================================
+# Script: emulator_server.py
+# Description:
+#    Servidor que se hace pasar por la placa: habla el mismo protocolo de
+#    bytes que debug_unit.v sobre TCP y, opcionalmente, sobre una
+#    pseudo-terminal, así fpga.py, run_debug.py y la GUI pueden trabajar sin
+#    FPGA (por ejemplo en CI):
+#      - 0x04 LOAD_PROGRAM: palabras de 32 bits big-endian hasta HALT
+#      - 0x03 RUN / 0x05 STEP: responden 256 bytes de registros y memoria
+#        más 47 bytes de pipeline
+#      - 0x0C RESET
+#    Como la placa, no envía ACK. Cada conexión TCP es una placa emulada
+#    independiente (MockSerial con ack=False) y todas se atienden a la vez con
+#    asyncio; los RUN largos se ejecutan en un hilo para no frenar al resto.
+#    La pseudo-terminal es una sola placa que dura lo que el servidor.
+#    Con --baudrate las respuestas salen al ritmo de la UART real (modo
+#    temporizado de MockSerial) en lugar de todas juntas.
+# Uso:
+#    python3 emulator_server.py [--host H] [--port 5000] [--pty [--pty-link RUTA]]
+#                               [--modelo pipeline|funcional|bloques] [--baudrate 19200]
+#    y desde el cliente: socket://localhost:5000 o el /dev/pts/N que se imprime
+#===========================================
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from mockserial import MAX_INSTRUCCIONES, MODELOS, MockSerial
+
+DEFAULT_HOST = "localhost"
+DEFAULT_PORT = 5000
+_BLOQUE_LECTURA = 4096
+
+
+class EmulatedBoard:
+    """Una placa emulada: recibe bytes del cliente y devuelve los que respondería la debug_unit."""
+
+    def __init__(self, nombre, modelo="pipeline", max_instrucciones=MAX_INSTRUCCIONES, baudrate=None):
+        self.nombre = nombre
+        self.ser = MockSerial(verbose=False, max_instrucciones=max_instrucciones,
+                              modelo=modelo, ack=False, baudrate=baudrate)
+
+    def procesar(self, datos):
+        """
+        Ejecuta los comandos contenidos en datos (puede cortar en cualquier
+        byte). Devuelve la respuesta como [(instante, bytes)]; ver
+        MockSerial.pending_response.
+        """
+        ser = self.ser
+        ser.write(datos)
+        ser.buffer.clear()  # El servidor no necesita el historial de lo enviado
+        return ser.pending_response()
+
+
+async def _esperar_instante(instante):
+    demora = instante - time.monotonic()
+    if demora > 0:
+        await asyncio.sleep(demora)
+
+
+class EmulatorServer:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, modelo="pipeline",
+                 max_instrucciones=MAX_INSTRUCCIONES, baudrate=None, verbose=True):
+        if modelo not in MODELOS:
+            raise ValueError("Modelo desconocido: {} (opciones: {})".format(modelo, ", ".join(MODELOS)))
+        self.host = host
+        self.port = port
+        self.modelo = modelo
+        self.max_instrucciones = max_instrucciones
+        self.baudrate = baudrate
+        self.verbose = verbose
+        self.sessions = 0          # Conexiones TCP abiertas
+        self.pty_path = None
+        self._servidor = None
+        self._pty = None           # (maestro, esclavo) de la pseudo-terminal
+        self._contador = 0
+
+    def _log(self, mensaje):
+        if self.verbose:
+            print(mensaje)
+
+    def _placa(self, nombre):
+        return EmulatedBoard(nombre, self.modelo, self.max_instrucciones, self.baudrate)
+
+    async def start(self):
+        """Empieza a escuchar en TCP. Con port=0 el sistema elige uno libre (queda en self.port)."""
+        self._servidor = await asyncio.start_server(self._atender_tcp, self.host, self.port)
+        self.port = self._servidor.sockets[0].getsockname()[1]
+        self._log("Emulador de la debug_unit ({}) en socket://{}:{}".format(self.modelo, self.host, self.port))
+
+    async def serve_forever(self):
+        if self._servidor is None:
+            await self.start()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    def close(self):
+        if self._servidor is not None:
+            self._servidor.close()
+        if self._pty is not None:
+            maestro, esclavo = self._pty
+            asyncio.get_running_loop().remove_reader(maestro)
+            os.close(maestro)
+            os.close(esclavo)
+            self._pty = None
+
+    async def _atender_tcp(self, reader, writer):
+        self._contador += 1
+        placa = self._placa("tcp-{}".format(self._contador))
+        cliente = writer.get_extra_info("peername")
+        self.sessions += 1
+        self._log("{}: conexión de {}".format(placa.nombre, cliente))
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                datos = await reader.read(_BLOQUE_LECTURA)
+                if not datos:
+                    break
+                for instante, tramo in await loop.run_in_executor(None, placa.procesar, datos):
+                    await _esperar_instante(instante)
+                    writer.write(tramo)
+                    await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            # ValueError: programa que no entra en la memoria de instrucciones
+            self._log("{}: conexión cerrada por error: {}".format(placa.nombre, e))
+        finally:
+            self.sessions -= 1
+            writer.close()
+            self._log("{}: desconectado".format(placa.nombre))
+
+    def open_pty(self, enlace=None):
+        """
+        Crea la pseudo-terminal (solo POSIX) y devuelve la ruta del esclavo.
+        Con enlace se crea además un symlink con un nombre fijo hacia ella.
+        """
+        import tty
+
+        maestro, esclavo = os.openpty()
+        tty.setraw(esclavo)  # Sin eco ni traducción de bytes de control
+        os.set_blocking(maestro, False)
+        self._pty = (maestro, esclavo)
+        self.pty_path = os.ttyname(esclavo)
+        if enlace:
+            if os.path.islink(enlace):
+                os.remove(enlace)
+            os.symlink(self.pty_path, enlace)
+            self._log("Emulador de la debug_unit en {} ({})".format(enlace, self.pty_path))
+        else:
+            self._log("Emulador de la debug_unit en {}".format(self.pty_path))
+        pendientes = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        loop.add_reader(maestro, self._leer_pty, maestro, pendientes)
+        loop.create_task(self._atender_pty(maestro, pendientes))
+        return self.pty_path
+
+    @staticmethod
+    def _leer_pty(maestro, pendientes):
+        try:
+            datos = os.read(maestro, _BLOQUE_LECTURA)
+        except (BlockingIOError, OSError):
+            return
+        if datos:
+            pendientes.put_nowait(datos)
+
+    async def _atender_pty(self, maestro, pendientes):
+        # Los bytes se procesan en orden aunque lleguen mientras corre un RUN
+        placa = self._placa("pty")
+        loop = asyncio.get_running_loop()
+        while True:
+            datos = await pendientes.get()
+            try:
+                respuesta = await loop.run_in_executor(None, placa.procesar, datos)
+            except ValueError as e:
+                self._log("pty: comando descartado: {}".format(e))
+                continue
+            for instante, tramo in respuesta:
+                await _esperar_instante(instante)
+                while tramo:
+                    try:
+                        escritos = os.write(maestro, tramo)
+                    except BlockingIOError:
+                        await asyncio.sleep(0.001)  # Buffer de la terminal lleno
+                        continue
+                    tramo = tramo[escritos:]
+
+
+async def _principal(args):
+    servidor = EmulatorServer(args.host, args.port, args.modelo, args.max_instrucciones, args.baudrate)
+    await servidor.start()
+    if args.pty:
+        servidor.open_pty(args.pty_link)
+    try:
+        await servidor.serve_forever()
+    finally:
+        servidor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Emulador de la debug_unit del MIPS por TCP y pseudo-terminal")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--pty", action="store_true",
+                        help="atender también en una pseudo-terminal (solo Linux/macOS)")
+    parser.add_argument("--pty-link", default=None,
+                        help="symlink con nombre fijo hacia la pseudo-terminal (p. ej. /tmp/mips_fpga)")
+    parser.add_argument("--modelo", default="pipeline", choices=tuple(MODELOS),
+                        help="modelo que ejecuta el programa (ver mockserial.py)")
+    parser.add_argument("--max-instrucciones", type=int, default=MAX_INSTRUCCIONES,
+                        help="pasos máximos de un RUN que no llega a HALT")
+    parser.add_argument("--baudrate", type=int, default=None,
+                        help="enviar las respuestas al ritmo de una UART 8N1 a esta velocidad (p. ej. 19200)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_principal(args))
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,137 @@
+#===========================================
+# Script: frame_layout.py
+# Description:
+#    Describe una única vez la trama de 303 bytes que envía la debug_unit tras
+#    STEP/RUN y la compila en objetos struct.Struct:
+#      - 32 registros de 32 bits + 32 palabras de memoria de 32 bits (256 bytes)
+#      - IF_ID, ID_EX, EX_M y M_WB (47 bytes), en el orden de i_reg_int
+#    Los campos de pipeline siguen los assign o_IF_ID/o_ID_EX/o_EX_M/o_M_WB de
+#    pipeline.v; los bits de relleno de cada byte se descartan con una máscara.
+#    decode_frame devuelve un DebugFrame compacto (__slots__) que usan fpga.py,
+#    run_debug.py y la GUI.
+#===========================================
+import struct
+
+# Formato struct de cada ancho de campo en la trama (big-endian)
+_FORMATOS = {4: "I", 2: "H", 1: "B"}
+
+# Registros de pipeline en el orden en que se transmiten.
+# Cada campo: (atributo, etiqueta, bytes en la trama, bits significativos)
+PIPELINE_LAYOUT = (
+    ("IF_ID", (
+        ("if_id_inst",      "inst",       4, 32),
+        ("if_id_pc",        "pc+4",       4, 32),
+    )),
+    ("ID_EX", (
+        ("id_ex_rs_data",   "rs_data",    4, 32),
+        ("id_ex_rt_data",   "rt_data",    4, 32),
+        ("id_ex_immediate", "immediate",  4, 32),
+        ("id_ex_op_code",   "op_code",    1, 6),
+        ("id_ex_rs_addr",   "rs_addr",    1, 5),
+        ("id_ex_rt_addr",   "rt_addr",    1, 5),
+        ("id_ex_rd_addr",   "rd_addr",    1, 5),
+        ("id_ex_controlU",  "controlU",   2, 16),
+    )),
+    ("EX_M", (
+        ("ex_m_alu_result", "alu_result", 4, 32),
+        ("ex_m_wr_data",    "wr_data",    4, 32),
+        ("ex_m_addr_rd",    "addr_rd",    1, 5),
+        ("ex_m_controlU",   "controlU",   2, 9),
+    )),
+    ("M_WB", (
+        ("m_wb_read_data",  "read_data",  4, 32),
+        ("m_wb_alu_result", "alu_result", 4, 32),
+        ("m_wb_addr_rd",    "addr_rd",    1, 5),
+        ("m_wb_controlU",   "controlU",   1, 4),
+    )),
+)
+
+PIPELINE_FIELDS = tuple(campo for _, campos in PIPELINE_LAYOUT for campo in campos)
+PIPELINE_FIELD_NAMES = tuple(campo[0] for campo in PIPELINE_FIELDS)
+
+NUM_REGISTERS = 32
+NUM_MEMORY_WORDS = 32
+
+DUMP_FORMAT = ">{}I{}I".format(NUM_REGISTERS, NUM_MEMORY_WORDS)
+PIPELINE_FORMAT = ">" + "".join(_FORMATOS[nbytes] for _, _, nbytes, _ in PIPELINE_FIELDS)
+
+DUMP_STRUCT = struct.Struct(DUMP_FORMAT)
+PIPELINE_STRUCT = struct.Struct(PIPELINE_FORMAT)
+FRAME_STRUCT = struct.Struct(DUMP_FORMAT + PIPELINE_FORMAT[1:])
+
+DUMP_BYTES = DUMP_STRUCT.size          # 256
+PIPELINE_BYTES = PIPELINE_STRUCT.size  # 47
+FRAME_BYTES = FRAME_STRUCT.size        # 303
+
+# Campos con bits de relleno: (posición en la tupla de pipeline, máscara)
+_MASKS = tuple((i, (1 << bits) - 1)
+               for i, (_, _, nbytes, bits) in enumerate(PIPELINE_FIELDS)
+               if bits < nbytes * 8)
+
+
+class DebugFrame:
+    """
+    Instantánea decodificada de una respuesta STEP/RUN.
+    registers y memory son tuplas de 32 enteros; pipeline es la tupla de
+    campos en el orden de PIPELINE_FIELDS, accesibles también por nombre
+    (frame.if_id_inst, frame.m_wb_controlU, ...).
+    """
+    __slots__ = ("registers", "memory", "pipeline")
+
+    def __init__(self, registers, memory, pipeline):
+        self.registers = registers
+        self.memory = memory
+        self.pipeline = pipeline
+
+    def stages(self):
+        return pipeline_stages(self.pipeline)
+
+
+def pipeline_stages(pipeline):
+    """
+    Recorre una tupla de campos de pipeline por etapa para mostrarla:
+    genera (etapa, [(etiqueta, valor, bits), ...]).
+    """
+    valores = iter(pipeline)
+    for etapa, campos in PIPELINE_LAYOUT:
+        yield etapa, [(etiqueta, next(valores), bits) for _, etiqueta, _, bits in campos]
+
+
+def _campo(indice):
+    return property(lambda self: self.pipeline[indice])
+
+
+for _indice, _nombre in enumerate(PIPELINE_FIELD_NAMES):
+    setattr(DebugFrame, _nombre, _campo(_indice))
+
+
+def _enmascarar(campos):
+    for i, mascara in _MASKS:
+        campos[i] &= mascara
+    return tuple(campos)
+
+
+def decode_dump(data, offset=0):
+    """Decodifica los 256 bytes de registros y memoria. Devuelve (registros, memoria)."""
+    valores = DUMP_STRUCT.unpack_from(data, offset)
+    return valores[:NUM_REGISTERS], valores[NUM_REGISTERS:]
+
+
+def decode_pipeline(data, offset=0):
+    """Decodifica los 47 bytes de registros de pipeline en una tupla de campos."""
+    return _enmascarar(list(PIPELINE_STRUCT.unpack_from(data, offset)))
+
+
+def decode_frame(data, offset=0):
+    """Decodifica una trama completa de 303 bytes en un DebugFrame."""
+    valores = FRAME_STRUCT.unpack_from(data, offset)
+    fin_memoria = NUM_REGISTERS + NUM_MEMORY_WORDS
+    return DebugFrame(valores[:NUM_REGISTERS],
+                      valores[NUM_REGISTERS:fin_memoria],
+                      _enmascarar(list(valores[fin_memoria:])))
+
+
+def decode_parts(dump, pipeline):
+    """Decodifica una trama recibida en dos partes (256 + 47 bytes) en un DebugFrame."""
+    registros, memoria = decode_dump(dump)
+    return DebugFrame(registros, memoria, decode_pipeline(pipeline))
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+#===========================================
+# Script: fuzz.py
+# Description:
+#    Fuzzing del pipeline con programas aleatorios.
+#    El generador arma programas válidos a partir de las tablas del
+#    ensamblador (opcode_map, opcode_immediate): aritmética R e I, shifts,
+#    loads/stores sobre la memoria de datos de 128 bytes y branches/saltos
+#    solo hacia adelante, así que todo programa termina en su HALT. La
+#    densidad controla qué tan seguido un operando lee un registro escrito
+#    por una de las 3 instrucciones anteriores (dependencias RAW, que son las
+#    que ejercitan forwarding y stalls).
+#    La campaña ejecuta miles de programas en procesos en paralelo: cada uno
+#    se corre en el modelo ISA de referencia (mips_sim) y con RUN en el
+#    destino (MockSerial con pipeline_sim, emulator_server o la placa), y se
+#    comparan registros y memoria. Cada programa que falla se reduce (quitando
+#    instrucciones mientras siga fallando) y se guarda como .asm, listo para
+#    analizarlo ciclo a ciclo con diff_test.py.
+# Uso:
+#    python3 fuzz.py --programas 2000 [--target mock] [--jobs N] [--densidad 0.6]
+#                    [--largo 40] [--semilla 1] [--salida fuzz_fallos]
+#===========================================
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from debug_link import BAUDRATE, CMD_RUN, EXPECTED_RESPONSE_BYTES
+from diff_test import TargetSession, abrir_destino, describir_divergencia
+from mips_sim import MipsSimulator
+from mips_to_bin import assemble, opcode_immediate, opcode_jump, opcode_map
+
+DENSIDAD = 0.5
+LARGO = 40
+VENTANA_RAW = 3               # Instrucciones anteriores cuyos destinos cuentan como dependencia
+REGISTROS = tuple(range(1, 8))  # $1..$7: pocos registros, más colisiones
+# $0 solo se usa como fuente: el register file lo deja escribir, pero el
+# forwarding y la detección de hazards lo ignoran (rd != 0), así que escribirlo
+# y leerlo enseguida difiere del modelo ISA en casi todos los programas
+PROB_R0 = 0.05
+
+# Categorías armadas desde las tablas del ensamblador
+_SHIFTS = ("SLL", "SRL", "SRA")
+_TIPO_R = tuple(op for op in opcode_map if op not in _SHIFTS + ("JR", "JALR", "HALT"))
+_INMEDIATAS = tuple(op for op, codigo in opcode_immediate.items() if codigo >> 3 == 0b001)
+_LOADS = tuple(op for op, codigo in opcode_immediate.items() if codigo >> 3 == 0b100)
+_STORES = tuple(op for op, codigo in opcode_immediate.items() if codigo >> 3 == 0b101)
+_BRANCHES = tuple(op for op, codigo in opcode_immediate.items() if codigo >> 3 == 0)
+_SALTOS = tuple(opcode_jump)
+
+# (categoría, peso)
+_CATEGORIAS = (("R", 30), ("SHIFT", 8), ("I", 25), ("LOAD", 15), ("STORE", 10),
+               ("BRANCH", 10), ("SALTO", 2))
+
+
+class _Registros:
+    """Elige registros fuente favoreciendo los escritos recién, según la densidad."""
+
+    def __init__(self, rnd, densidad):
+        self.rnd = rnd
+        self.densidad = densidad
+        self.recientes = []
+
+    def fuente(self):
+        if self.recientes and self.rnd.random() < self.densidad:
+            return self.rnd.choice(self.recientes)
+        return 0 if self.rnd.random() < PROB_R0 else self.rnd.choice(REGISTROS)
+
+    def destino(self):
+        n = self.rnd.choice(REGISTROS)
+        self.recientes = (self.recientes + [n])[-VENTANA_RAW:]
+        return n
+
+
+def generate_program(rnd, largo=LARGO, densidad=DENSIDAD):
+    """
+    Programa aleatorio como lista de [etiquetas, texto] terminada en HALT.
+    Los destinos de branches y saltos son etiquetas "L<n>" de instrucciones
+    posteriores; program_source lo convierte en texto para el ensamblador.
+    """
+    largo = min(largo, 126)
+    regs = _Registros(rnd, densidad)
+    categorias = [c for c, _ in _CATEGORIAS]
+    pesos = [p for _, p in _CATEGORIAS]
+    lineas = [[[], ""] for _ in range(largo)] + [[[], "HALT"]]
+    for i in range(largo):
+        categoria = rnd.choices(categorias, pesos)[0]
+        if categoria in ("BRANCH", "SALTO"):
+            destino = rnd.randint(i + 1, largo)
+            etiqueta = "L{}".format(destino)
+            if etiqueta not in lineas[destino][0]:
+                lineas[destino][0].append(etiqueta)
+            if categoria == "BRANCH":
+                texto = "{} ${}, ${}, {}".format(rnd.choice(_BRANCHES), regs.fuente(), regs.fuente(), etiqueta)
+            else:
+                op = rnd.choice(_SALTOS)
+                if op == "JAL":
+                    regs.recientes = (regs.recientes + [31])[-VENTANA_RAW:]
+                texto = "{} {}".format(op, etiqueta)
+        elif categoria == "R":
+            rs, rt = regs.fuente(), regs.fuente()
+            texto = "{} ${}, ${}, ${}".format(rnd.choice(_TIPO_R), regs.destino(), rs, rt)
+        elif categoria == "SHIFT":
+            rt = regs.fuente()
+            texto = "{} ${}, ${}, {}".format(rnd.choice(_SHIFTS), regs.destino(), rt, rnd.randrange(32))
+        elif categoria == "I":
+            op = rnd.choice(_INMEDIATAS)
+            inmediato = rnd.choice((rnd.randint(-32768, 32767), rnd.randint(-16, 16)))
+            if op == "LUI":
+                texto = "LUI ${}, {}".format(regs.destino(), inmediato)
+            else:
+                rs = regs.fuente()
+                texto = "{} ${}, ${}, {}".format(op, regs.destino(), rs, inmediato)
+        else:
+            # Dirección = (base + inmediato)[6:0]: cualquier base es válida
+            base = regs.fuente() if rnd.random() < 0.5 else 0
+            inmediato = rnd.randint(-128, 127)
+            if categoria == "LOAD":
+                texto = "{} ${}, ${}, {}".format(rnd.choice(_LOADS), regs.destino(), base, inmediato)
+            else:
+                texto = "{} ${}, ${}, {}".format(rnd.choice(_STORES), regs.fuente(), base, inmediato)
+        lineas[i][1] = texto
+    return lineas
+
+
+def program_source(lineas):
+    """Texto .asm del programa (una instrucción por línea, con sus etiquetas)."""
+    return "\n".join("".join(e + ": " for e in etiquetas) + texto for etiquetas, texto in lineas) + "\n"
+
+
+def assemble_program(lineas):
+    palabras, errores = assemble(program_source(lineas), skip_header=False)
+    if errores:
+        raise ValueError("Programa generado inválido: " + "; ".join(errores))
+    return palabras
+
+
+def check_program(sesion, palabras):
+    """
+    Ejecuta el programa en el modelo ISA y con RUN en el destino. Devuelve
+    None si coinciden registros y memoria, o las líneas que describen la diferencia.
+    """
+    ref = MipsSimulator()
+    ref.load_program(palabras)
+    ref.run(len(palabras))  # Solo hay saltos hacia adelante
+    esperada = ref.dump() + ref.pipeline_data()
+    try:
+        sesion.cargar(palabras)
+        obtenida = sesion.trama(CMD_RUN)
+    except (OSError, TimeoutError) as e:
+        return ["error del destino: {}".format(e)]
+    if obtenida[:EXPECTED_RESPONSE_BYTES] == esperada[:EXPECTED_RESPONSE_BYTES]:
+        return None
+    return describir_divergencia(esperada, obtenida, pipeline=False)
+
+
+def _quitar(lineas, inicio, fin):
+    """Copia del programa sin las instrucciones [inicio, fin); sus etiquetas pasan a la siguiente."""
+    nuevas = [[list(etiquetas), texto] for etiquetas, texto in lineas[:inicio]]
+    movidas = [e for etiquetas, _ in lineas[inicio:fin] for e in etiquetas]
+    resto = [[list(etiquetas), texto] for etiquetas, texto in lineas[fin:]]
+    resto[0][0] = movidas + resto[0][0]
+    return nuevas + resto
+
+
+def shrink_program(lineas, falla):
+    """
+    Reduce un programa que falla (falla(lineas) -> bool) quitando bloques de
+    instrucciones cada vez más chicos mientras siga fallando (ddmin).
+    El HALT final no se quita.
+    """
+    partes = 2
+    while len(lineas) > 1:
+        cuerpo = len(lineas) - 1
+        tamano = max(cuerpo // partes, 1)
+        for inicio in range(0, cuerpo, tamano):
+            candidato = _quitar(lineas, inicio, min(inicio + tamano, cuerpo))
+            if falla(candidato):
+                lineas = candidato
+                partes = max(partes - 1, 2)
+                break
+        else:
+            if tamano == 1:
+                break
+            partes = min(partes * 2, cuerpo)
+    return lineas
+
+
+# Estado de cada proceso de la campaña: una conexión al destino por proceso
+_SESION = None
+_PARAMETROS = None
+
+
+def _iniciar_worker(destino, baudrate, largo, densidad):
+    global _SESION, _PARAMETROS
+    _SESION = TargetSession(abrir_destino(destino, baudrate), baudrate)
+    _PARAMETROS = (largo, densidad)
+
+
+def _probar_semilla(semilla):
+    largo, densidad = _PARAMETROS
+    lineas = generate_program(random.Random(semilla), largo, densidad)
+    return semilla, check_program(_SESION, assemble_program(lineas))
+
+
+def _es_local(destino):
+    return destino == "mock" or destino.startswith("mock:") or destino.startswith("socket://")
+
+
+def run_campaign(programas, destino="mock", jobs=None, semilla=1, largo=LARGO, densidad=DENSIDAD,
+                 baudrate=BAUDRATE, salida=None):
+    """
+    Corre la campaña y reduce cada fallo. Un puerto serie real solo admite un
+    proceso. Devuelve la lista de (semilla, líneas reducidas, detalle).
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if not _es_local(destino):
+        jobs = 1
+    semillas = range(semilla, semilla + programas)
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_iniciar_worker,
+                             initargs=(destino, baudrate, largo, densidad)) as pool:
+        fallos = [(s, detalle) for s, detalle in
+                  pool.map(_probar_semilla, semillas, chunksize=max(programas // (jobs * 8), 1))
+                  if detalle]
+    segundos = time.perf_counter() - inicio
+    print("{} programas en {:.1f} s ({:.0f} programas/s, {} procesos), {} fallos".format(
+        programas, segundos, programas / segundos, jobs, len(fallos)))
+
+    resultados = []
+    if not fallos:
+        return resultados
+    sesion = TargetSession(abrir_destino(destino, baudrate), baudrate)
+    for s, _ in fallos:
+        original = generate_program(random.Random(s), largo, densidad)
+        reducido = shrink_program(original, lambda lineas: check_program(sesion, assemble_program(lineas)))
+        detalle = check_program(sesion, assemble_program(reducido))
+        resultados.append((s, reducido, detalle))
+        print("\nSemilla {}: {} -> {} instrucciones".format(s, len(original), len(reducido)))
+        print(program_source(reducido), end="")
+        for linea in detalle:
+            print(linea)
+        if salida:
+            os.makedirs(salida, exist_ok=True)
+            ruta = os.path.join(salida, "fuzz_{}.asm".format(s))
+            with open(ruta, "w") as f:
+                f.write("# Semilla {}, destino {}\n".format(s, destino))
+                f.write(program_source(reducido))
+            print("Guardado en {}".format(ruta))
+    sesion.ser.close()
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fuzzing del pipeline con programas aleatorios")
+    parser.add_argument("--programas", type=int, default=1000)
+    parser.add_argument("--target", default="mock",
+                        help="mock[:modelo], socket://host:puerto o puerto serie")
+    parser.add_argument("--jobs", type=int, default=None, help="procesos (por defecto, uno por CPU)")
+    parser.add_argument("--semilla", type=int, default=1, help="semilla del primer programa")
+    parser.add_argument("--largo", type=int, default=LARGO, help="instrucciones por programa (máx. 126)")
+    parser.add_argument("--densidad", type=float, default=DENSIDAD,
+                        help="probabilidad de que un operando dependa de una instrucción reciente (0-1)")
+    parser.add_argument("--baudrate", type=int, default=BAUDRATE)
+    parser.add_argument("--salida", default=None, help="directorio donde guardar los .asm reducidos")
+    args = parser.parse_args()
+    fallos = run_campaign(args.programas, args.target, args.jobs, args.semilla, args.largo,
+                          args.densidad, args.baudrate, args.salida)
+    sys.exit(1 if fallos else 0)
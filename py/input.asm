@@ -4,6 +4,8 @@ Ejemplo de ejecución:
 # - Registros: Usar números decimales (por ejemplo, $5, $10).
 # - Valores inmediatos: Usar números decimales (por ejemplo, 20, 255).
 # - Saltos: Usar números decimales (por ejemplo, 1024).
+# - Etiquetas: 'nombre:' al comienzo de la línea; BEQ/BNE y J/JAL aceptan una etiqueta como destino.
+# - Constantes: .equ NOMBRE, valor (se pueden usar donde va un número).
 
 # Ejemplos válidos:
 # ADDI $5, $10, 20     # Suma inmediata
@@ -11,6 +13,9 @@ Ejemplo de ejecución:
 # LUI $7, 255          # Cargar valor inmediato en la mitad superior
 # J 1024               # Salto incondicional
 # BEQ $5, $10, 8       # Salto condicional si igual
+# .equ N, 10           # Constante
+# bucle: ADDI $5, $5, -1
+# BNE $5, $0, bucle    # Salto a una etiqueta (offset calculado respecto de PC+4)
 
 --------fin del ejemplo-----
 
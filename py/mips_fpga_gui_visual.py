@@ -1,290 +1,146 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext, filedialog, messagebox
+from tkinter import ttk, scrolledtext, filedialog, messagebox, simpledialog
 import serial
 import serial.tools.list_ports
 import time
 import sys
-import threading
 import os
 from tkinter.font import Font
 import re
+from array import array
+from collections import deque
 
-# Diccionarios con opcodes y funct para instrucciones tipo R
-opcode_map = {
-    "SLL":  ("000000", "000000"),
-    "SRL":  ("000000", "000010"),
-    "SRA":  ("000000", "000011"),
-    "SLLV": ("000000", "000100"),
-    "SRLV": ("000000", "000110"),
-    "SRAV": ("000000", "000111"),
-    "ADDU": ("000000", "100001"),
-    "SUBU": ("000000", "100011"),
-    "AND":  ("000000", "100100"),
-    "OR":   ("000000", "100101"),
-    "XOR":  ("000000", "100110"),
-    "NOR":  ("000000", "100111"),
-    "SLT":  ("000000", "101010"),
-    "SLTU": ("000000", "101011"),
-    "JR":   ("000000", "001000"),
-    "JALR": ("000000", "001001"),
-    "HALT": ("000000", "111111")  # HALT como una instrucción especial
-}
+from debug_link import BAUDRATE, CMD_RUN, CMD_STEP, HALT_INSTR, parse_coe, parse_condicion
+from frame_layout import PIPELINE_LAYOUT, DebugFrame
+from mips_to_bin import IncrementalAssembler, format_coe, write_coe
+from serial_worker import (SerialWorker, TrabajoCancelado, comando, comando_carga, comando_reset,
+                           comando_run_until, comando_step_n, comando_trama)
+from trace_file import TraceReader, TraceWriter, is_trace_file
 
-# Instrucciones tipo I y J con sus opcodes
-opcode_immediate = {
-    "LB":    "100000",
-    "LH":    "100001",
-    "LW":    "100011",
-    "LWU":   "100111",
-    "LBU":   "100100",
-    "LHU":   "100101",
-    "SB":    "101000",
-    "SH":    "101001",
-    "SW":    "101011",
-    "ADDI":  "001000",
-    "ADDIU": "001001",
-    "ANDI":  "001100",
-    "ORI":   "001101",
-    "XORI":  "001110",
-    "LUI":   "001111",
-    "SLTI":  "001010",
-    "SLTIU": "001011",
-    "BEQ":   "000100",
-    "BNE":   "000101"
-}
-
-opcode_jump = {
-    "J":   "000010",
-    "JAL": "000011"
-}
-
-# Parámetros de comunicación
-BAUDRATE = 19200
+# Parámetros de comunicación (la velocidad y los comandos están en debug_link)
 BYTESIZE = serial.EIGHTBITS
 STOPBITS = serial.STOPBITS_ONE
 PARITY   = serial.PARITY_NONE
 
-# Comandos definidos (en byte)
-CMD_LOAD  = 0x04  # LOAD_PROGRAM
-CMD_RUN   = 0x03  # RUN
-CMD_STEP  = 0x05  # STEP
-CMD_RESET = 0x0C  # RESET
-
-# Valor de HALT en 32 bits
-HALT_INSTR = 0x0000003F
-
-# Número total de bytes que se esperan como respuesta
-EXPECTED_RESPONSE_BYTES = 256
-# Número de bytes de los registros de pipeline
-PIPELINE_BYTES = 47
-
-# Funciones del script mips_to_bin.py
-def is_valid_register(reg):
-    if reg.startswith("$") and reg[1:].isdigit():
-        reg_num = int(reg[1:])
-        return 0 <= reg_num <= 31
-    return False
-
-def is_valid_immediate(imm):
-    try:
-        imm_num = int(imm)
-        return -32768 <= imm_num <= 32767
-    except ValueError:
-        return False
-
-def is_valid_instr_index(index):
-    try:
-        index_num = int(index)
-        return 0 <= index_num <= 0x3FFFFFF
-    except ValueError:
-        return False
-
-def reg_to_bin(reg):
-    if is_valid_register(reg):
-        reg_num = int(reg[1:])
-        return format(reg_num, '05b')
-    else:
-        raise ValueError(f"Registro no válido: {reg}")
-
-def imm_to_bin(imm):
-    if is_valid_immediate(imm):
-        return format(int(imm) & 0xFFFF, '016b')
-    else:
-        raise ValueError(f"Valor inmediato no válido: {imm}")
-
-def instr_index_to_bin(index):
-    if is_valid_instr_index(index):
-        return format(int(index) & 0x3FFFFFF, '026b')
-    else:
-        raise ValueError(f"Índice de salto no válido: {index}")
-
-def process_instruction(instr):
-    # Eliminar comentarios de la línea
-    instr = instr.split("#")[0].strip()
-    if not instr:
-        return None
-
-    parts = instr.replace(",", "").split()
-    if not parts:
-        return None
-
-    op = parts[0]
-
-    # Caso especial para HALT
-    if op == "HALT":
-        if len(parts) != 1:
-            raise ValueError(f"Instrucción mal formateada: {instr} (HALT no requiere operandos)")
-        return "00000000000000000000000000111111"
-
-    # Validar que la instrucción tenga el número correcto de operandos
-    if op in opcode_map:
-        # Instrucciones tipo R
-        if op in ["JR", "JALR"]:
-            if len(parts) != 2 and len(parts) != 3:
-                raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-        elif op in ["SLL", "SRL", "SRA"]:
-            if len(parts) != 4:
-                raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-        else:
-            if len(parts) != 4:
-                raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-    elif op in opcode_immediate:
-        # Instrucciones tipo I
-        if op == "LUI":
-            if len(parts) != 3:
-                raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-        else:
-            if len(parts) != 4:
-                raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-    elif op in opcode_jump:
-        # Instrucciones tipo J
-        if len(parts) != 2:
-            raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-    else:
-        raise ValueError(f"Instrucción no reconocida: {op}")
-
-    # Instrucciones tipo R
-    if op in opcode_map:
-        opcode, funct = opcode_map[op]
-
-        if op == "JR":
-            rs = reg_to_bin(parts[1])
-            return opcode + rs + "00000" + "00000" + "00000" + funct
-
-        elif op == "JALR":
-            rs = reg_to_bin(parts[1])
-            rd = reg_to_bin(parts[2])
-            return opcode + rs + "00000" + rd + "00000" + funct
-
-        elif op in ["SLL", "SRL", "SRA"]:
-            rd = reg_to_bin(parts[1])
-            rt = reg_to_bin(parts[2])
-            sa = format(int(parts[3]), '05b')
-            return opcode + "00000" + rt + rd + sa + funct
-
-        else:
-            rd = reg_to_bin(parts[1])
-            rs = reg_to_bin(parts[2])
-            rt = reg_to_bin(parts[3])
-            return opcode + rs + rt + rd + "00000" + funct
-
-    # Instrucciones tipo I
-    elif op in opcode_immediate:
-        opcode = opcode_immediate[op]
-
-        if op == "LUI":
-            rt = reg_to_bin(parts[1])
-            imm = imm_to_bin(parts[2])
-            return opcode + "00000" + rt + imm
-
-        else:
-            rt = reg_to_bin(parts[1])
-            rs = reg_to_bin(parts[2])
-            imm = imm_to_bin(parts[3])
-            return opcode + rs + rt + imm
-
-    # Instrucciones tipo J
-    elif op in opcode_jump:
-        opcode = opcode_jump[op]
-        instr_index = instr_index_to_bin(parts[1])
-        return opcode + instr_index
-
-    return None
-
-def convert_asm_to_coe(input_text, output_file=None):
-    instructions = input_text.splitlines()
-    binary_instructions = []
-    start_processing = True  # En la GUI procesamos todo el texto
-    errors = []
+# Nombre de cada registro de pipeline de la trama en el visualizador
+PIPELINE_TITLES = {"IF_ID": "IF/ID", "ID_EX": "ID/EX", "EX_M": "EX/MEM", "M_WB": "MEM/WB"}
+# (registro en el visualizador, campo, bits) de cada posición de DebugFrame.pipeline
+PIPELINE_GUI_FIELDS = tuple((PIPELINE_TITLES[etapa], etiqueta, bits)
+                            for etapa, campos in PIPELINE_LAYOUT for _, etiqueta, _, bits in campos)
+# Lo que muestran las tablas recién creadas o después de clear_values
+EMPTY_FRAME = DebugFrame((0,) * 32, (0,) * 32, (0,) * len(PIPELINE_GUI_FIELDS))
+# Duración y color del resaltado de un valor que cambió
+HIGHLIGHT_MS = 1500
+HIGHLIGHT_COLOR = "#e6f2ff"
+# Líneas que conserva la consola de log (las más viejas se descartan)
+LOG_MAX_LINES = 5000
+# Cada cuánto el loop de Tk recoge los resultados del hilo de E/S serie
+WORKER_POLL_MS = 50
 
-    for line_num, instr in enumerate(instructions, start=1):
-        instr = instr.strip()
+# Resaltado de sintaxis del editor: una sola expresión por línea; cada token
+# queda en el grupo de su etiqueta (el comentario se come el resto de la línea)
+SYNTAX_TAGS = ("instruction", "register", "number", "comment")
+ASM_TOKEN_PATTERN = re.compile(
+    r'(?P<comment>#.*)'
+    r'|(?P<register>\$\d+)'
+    r'|(?P<instruction>\b(?:SLL|SRL|SRA|SLLV|SRLV|SRAV|ADDU|SUBU|AND|OR|XOR|NOR|SLT|SLTU|JR|JALR|LB|LH|LW|LWU|LBU|LHU|SB|SH|SW|ADDI|ADDIU|ANDI|ORI|XORI|LUI|SLTI|SLTIU|BEQ|BNE|J|JAL)\b)'
+    r'|(?P<number>\b\d+\b)',
+    re.IGNORECASE)
+# Espera tras la última tecla o desplazamiento antes de resaltar, y líneas
+# resaltadas por encima y por debajo de la zona visible
+HIGHLIGHT_DEBOUNCE_MS = 150
+HIGHLIGHT_MARGIN_LINES = 20
 
-        # Ignorar comentarios y líneas vacías
-        if not instr or instr.startswith("#"):
-            continue
+def changed_indices(anterior, actual):
+    """Posiciones en las que difieren dos tuplas de valores de la trama."""
+    return [i for i, (a, b) in enumerate(zip(anterior, actual)) if a != b]
 
-        try:
-            binary_instr = process_instruction(instr)
-            if binary_instr:
-                binary_instructions.append(binary_instr)
-        except ValueError as e:
-            errors.append(f"Error en la línea {line_num}: {e}")
-
-    # Si se proporciona un archivo de salida, escribir en él
-    if output_file:
-        with open(output_file, "w") as coe_file:
-            for i, bin_instr in enumerate(binary_instructions):
-                coe_file.write(bin_instr + (",\n" if i < len(binary_instructions) - 1 else ";\n"))
+# Resaltado temporal con un único temporizador para todas las tablas
+class HighlightFader:
+    def __init__(self, widget, duration_ms=HIGHLIGHT_MS, color=HIGHLIGHT_COLOR):
+        self.widget = widget          # Widget cuyo after() se usa
+        self.duration = duration_ms / 1000
+        self.color = color
+        self.pending = {}             # clave -> (vencimiento, widgets, color original, on_restore)
+        self._timer = None
     
-    return binary_instructions, errors
-
-# Funciones del script fpga.py
-def parse_coe(filename):
-    instrucciones = []
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            token = line.split()[0]
-            if len(token) < 32:
-                print(f"Línea ignorada (menos de 32 bits): {line}")
-                continue
-            bits = token[:32]
-            if not all(c in '01' for c in bits):
-                print(f"Línea ignorada (no es una cadena binaria válida): {line}")
-                continue
-            try:
-                instr = int(bits, 2)
-            except ValueError:
-                print(f"Error al convertir la línea a entero: {line}")
-                continue
-            instrucciones.append(instr)
-            if instr == HALT_INSTR:
-                break
-    return instrucciones
-
-def enviar_datos(ser, data_bytes):
-    ser.write(data_bytes)
-    ser.flush()
-
-def leer_respuesta(ser, total_bytes):
-    recibido = b''
-    while len(recibido) < total_bytes:
-        chunk = ser.read(total_bytes - len(recibido))
-        if not chunk:
-            break
-        recibido += chunk
-    return recibido
+    def mark(self, key, widgets, orig_bg, on_restore=None):
+        # Una fila ya resaltada solo extiende su plazo, sin volver a pintarse.
+        # on_restore(key) se llama al vencer (para vistas que repintan ellas mismas)
+        if key not in self.pending:
+            for widget in widgets:
+                widget.config(bg=self.color)
+        self.pending[key] = (time.monotonic() + self.duration, widgets, orig_bg, on_restore)
+        if self._timer is None:
+            self._timer = self.widget.after(int(self.duration * 1000), self._restore_expired)
+    
+    def _restore_expired(self):
+        self._timer = None
+        ahora = time.monotonic()
+        for key in [k for k, (vence, _, _, _) in self.pending.items() if vence <= ahora]:
+            _, widgets, orig_bg, on_restore = self.pending.pop(key)
+            for widget in widgets:
+                widget.config(bg=orig_bg)
+            if on_restore is not None:
+                on_restore(key)
+        if self.pending:
+            proximo = min(vence for vence, _, _, _ in self.pending.values())
+            self._timer = self.widget.after(int((proximo - ahora) * 1000) + 1, self._restore_expired)
 
-def print_field(label, value, bits):
-    hex_width = bits // 4
-    bin_width = bits
-    hex_str = format(value, '0{}X'.format(hex_width))
-    bin_str = format(value, '0{}b'.format(bin_width))
-    hex_field = f"0x{hex_str}"
-    return f"{label:<12}: {hex_field:<10}   {bin_str:>{bin_width}}"
+# Consola de log acotada: los mensajes se juntan y se insertan una vez por vuelta del loop de Tk
+class LogConsole:
+    def __init__(self, text_widget, max_lines=LOG_MAX_LINES):
+        self.text = text_widget
+        self.max_lines = max_lines
+        self.history = deque(maxlen=max_lines)  # (mensaje, tag) de las últimas max_lines líneas
+        self.spill_file = None        # Archivo que recibe todas las líneas (spill_to)
+        self._pending = []            # Mensajes que todavía no se insertaron
+        self._scheduled = False
+    
+    def write(self, message, tag=None):
+        self._pending.append((message, tag))
+        if not self._scheduled:
+            self._scheduled = True
+            self.text.after_idle(self.flush)
+    
+    def flush(self):
+        self._scheduled = False
+        if not self._pending:
+            return
+        pendientes, self._pending = self._pending, []
+        if self.spill_file is not None:
+            self.spill_file.write("".join(message + "\n" for message, _ in pendientes))
+            self.spill_file.flush()
+        # De un lote más largo que la consola solo se muestra el final
+        pendientes = pendientes[-self.max_lines:]
+        self.history.extend(pendientes)
+        # Un solo insert con pares (texto, tag), un recorte y un see por lote
+        argumentos = []
+        for message, tag in pendientes:
+            argumentos.extend((message + "\n", tag or ()))
+        self.text.insert(tk.END, *argumentos)
+        lineas = int(self.text.index("end-1c").split(".")[0]) - 1
+        if lineas > self.max_lines:
+            self.text.delete("1.0", f"{lineas - self.max_lines + 1}.0")
+        self.text.see(tk.END)
+    
+    def clear(self):
+        self._pending.clear()
+        self.history.clear()
+        self.text.delete("1.0", tk.END)
+    
+    def spill_to(self, path):
+        # Guarda las líneas que siguen en memoria y, desde ahora, todas las nuevas
+        self.flush()
+        self.stop_spill()
+        self.spill_file = open(path, "w", encoding="utf-8")
+        self.spill_file.write("".join(message + "\n" for message, _ in self.history))
+        self.spill_file.flush()
+    
+    def stop_spill(self):
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
 
 # Clase para el editor de texto con resaltado de sintaxis
 class SyntaxHighlightingText(scrolledtext.ScrolledText):
@@ -298,50 +154,72 @@ class SyntaxHighlightingText(scrolledtext.ScrolledText):
         self.tag_configure("number", foreground="#009900")
         self.tag_configure("comment", foreground="#999999", font=('Consolas', 11, 'italic'))
         
-        # Patrones para resaltado
-        self.instruction_pattern = r'\b(SLL|SRL|SRA|SLLV|SRLV|SRAV|ADDU|SUBU|AND|OR|XOR|NOR|SLT|SLTU|JR|JALR|LB|LH|LW|LWU|LBU|LHU|SB|SH|SW|ADDI|ADDIU|ANDI|ORI|XORI|LUI|SLTI|SLTIU|BEQ|BNE|J|JAL)\b'
-        self.register_pattern = r'\$\d+'
-        self.number_pattern = r'\b\d+\b'
-        self.comment_pattern = r'#.*$'
-        
-        # Vincular eventos
-        self.bind('<KeyRelease>', self.highlight_syntax)
+        # Estado del resaltado incremental: texto de cada línea en la última
+        # pasada y si esa línea ya está resaltada (las que no se vieron todavía no)
+        self._line_text = [""]
+        self._line_done = [True]
+        self._pending_pass = None
         
+        # Cualquier modificación (teclado, pegar, insert del programa) y el desplazamiento
+        # programan una pasada; ráfagas de eventos se juntan en una sola
+        self.bind('<<Modified>>', self._on_modified)
+        self.configure(yscrollcommand=self._on_scroll)
+    
+    def _on_modified(self, event=None):
+        if self.edit_modified():
+            self.edit_modified(False)
+            self._schedule_highlight()
+    
+    def _on_scroll(self, first, last):
+        self.vbar.set(first, last)
+        self._schedule_highlight()
+    
+    def _schedule_highlight(self):
+        if self._pending_pass is not None:
+            self.after_cancel(self._pending_pass)
+        self._pending_pass = self.after(HIGHLIGHT_DEBOUNCE_MS, self.highlight_syntax)
+    
     def highlight_syntax(self, event=None):
-        # Eliminar resaltado existente
-        for tag in ["instruction", "register", "number", "comment"]:
-            self.tag_remove(tag, "1.0", "end")
-        
-        # Aplicar resaltado
-        content = self.get("1.0", "end-1c")
-        lines = content.split('\n')
-        
-        for i, line in enumerate(lines):
+        self._pending_pass = None
+        lines = self.get("1.0", "end-1c").split("\n")
+        
+        # Líneas editadas: lo que queda entre el prefijo y el sufijo comunes con
+        # la pasada anterior (las etiquetas de Tk se mueven con el texto, así que
+        # las líneas que solo cambiaron de posición conservan su resaltado)
+        previous = self._line_text
+        limit = min(len(lines), len(previous))
+        prefix = 0
+        while prefix < limit and lines[prefix] == previous[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and lines[-1 - suffix] == previous[-1 - suffix]:
+            suffix += 1
+        edited = len(lines) - prefix - suffix
+        if edited or len(lines) != len(previous):
+            self._line_done = (self._line_done[:prefix] + [False] * edited
+                               + self._line_done[len(previous) - suffix:])
+            self._line_text = lines
+        
+        # Resaltar solo las líneas pendientes dentro de la zona visible
+        first = int(self.index("@0,0").split(".")[0]) - 1
+        last = int(self.index(f"@0,{self.winfo_height()}").split(".")[0])
+        first = max(first - HIGHLIGHT_MARGIN_LINES, 0)
+        last = min(last + HIGHLIGHT_MARGIN_LINES, len(lines))
+        ranges = {tag: [] for tag in SYNTAX_TAGS}
+        for i in range(first, last):
+            if self._line_done[i]:
+                continue
+            self._line_done[i] = True
             line_num = i + 1
-            
-            # Resaltar instrucciones
-            for match in re.finditer(self.instruction_pattern, line, re.IGNORECASE):
-                start = f"{line_num}.{match.start()}"
-                end = f"{line_num}.{match.end()}"
-                self.tag_add("instruction", start, end)
-            
-            # Resaltar registros
-            for match in re.finditer(self.register_pattern, line):
-                start = f"{line_num}.{match.start()}"
-                end = f"{line_num}.{match.end()}"
-                self.tag_add("register", start, end)
-            
-            # Resaltar números
-            for match in re.finditer(self.number_pattern, line):
-                start = f"{line_num}.{match.start()}"
-                end = f"{line_num}.{match.end()}"
-                self.tag_add("number", start, end)
-            
-            # Resaltar comentarios
-            for match in re.finditer(self.comment_pattern, line):
-                start = f"{line_num}.{match.start()}"
-                end = f"{line_num}.{match.end()}"
-                self.tag_add("comment", start, end)
+            for tag in SYNTAX_TAGS:
+                self.tag_remove(tag, f"{line_num}.0", f"{line_num}.end")
+            for match in ASM_TOKEN_PATTERN.finditer(lines[i]):
+                ranges[match.lastgroup].extend((f"{line_num}.{match.start()}", f"{line_num}.{match.end()}"))
+        
+        # Un tag_add por etiqueta con todos sus rangos
+        for tag, indices in ranges.items():
+            if indices:
+                self.tag_add(tag, *indices)
 
 # Clase para el botón personalizado con hover effect
 class HoverButton(tk.Canvas):
@@ -474,230 +352,263 @@ class InfoPanel(tk.Frame):
         label_widget.config(text=value)
 
 # Clase para visualizar registros en formato de tabla
-class RegistersTable(tk.Frame):
-    def __init__(self, master=None, **kwargs):
+# Tabla virtualizada: los valores viven en un array('I') y solo existen
+# widgets para las filas visibles, que se reutilizan al desplazarse
+class VirtualTable(tk.Frame):
+    ROW_COLORS = ("#ffffff", "#f5f5f5")
+    
+    def __init__(self, master=None, first_header="", rows=32, fader=None, **kwargs):
         super().__init__(master, **kwargs)
         self.configure(bg="#ffffff")
-        
-        # Crear tabla de registros
-        self.create_table()
-        
-        # Inicializar valores
-        self.clear_values()
+        self.fader = fader or HighlightFader(self)
+        self.values = array('I', bytes(4 * rows))
+        self.first_row = 0        # Fila de datos que se muestra arriba
+        self.highlighted = set()  # Filas resaltadas (el color sigue al dato, no al widget)
+        self.row_widgets = []     # [(frame, nombre, hex, bin)] de las filas visibles
+        self.row_height = 1
+        
+        self.create_toolbar()
+        self.create_table(first_header)
     
-    def create_table(self):
+    def row_name(self, row):
+        return str(row)
+    
+    def create_toolbar(self):
+        toolbar = tk.Frame(self, bg="#ffffff")
+        toolbar.pack(fill="x", pady=(0, 5))
+        
+        tk.Label(toolbar, text="Ir a:", font=('Segoe UI', 10), bg="#ffffff").pack(side="left", padx=(2, 2))
+        self.goto_entry = ttk.Entry(toolbar, width=10)
+        self.goto_entry.pack(side="left", padx=(0, 10))
+        self.goto_entry.bind("<Return>", lambda e: self.goto(self.goto_entry.get()))
+        
+        tk.Label(toolbar, text="Buscar valor:", font=('Segoe UI', 10), bg="#ffffff").pack(side="left", padx=(2, 2))
+        self.search_entry = ttk.Entry(toolbar, width=12)
+        self.search_entry.pack(side="left", padx=(0, 5))
+        self.search_entry.bind("<Return>", lambda e: self.search(self.search_entry.get()))
+        
+        self.status_label = tk.Label(toolbar, text="", font=('Segoe UI', 9), bg="#ffffff", fg="#666666")
+        self.status_label.pack(side="left", padx=5)
+    
+    def create_table(self, first_header):
         # Crear encabezados
         header_frame = tk.Frame(self, bg="#4a86e8")
         header_frame.pack(fill="x")
         
-        headers = ["Registro", "Valor (Hex)", "Valor (Bin)"]
+        headers = [first_header, "Valor (Hex)", "Valor (Bin)"]
         widths = [100, 120, 320]
         
         for i, header in enumerate(headers):
             tk.Label(header_frame, text=header, font=('Segoe UI', 10, 'bold'), 
                     bg="#4a86e8", fg="white", width=widths[i]//10).grid(row=0, column=i, padx=2, pady=5, sticky="w")
         
-        # Crear contenedor para filas de registros
+        # Contenedor de las filas visibles y barra de desplazamiento propia
         self.rows_frame = tk.Frame(self, bg="#ffffff")
         self.rows_frame.pack(fill="both", expand=True)
         
-        # Crear canvas y scrollbar para permitir desplazamiento
-        self.canvas = tk.Canvas(self.rows_frame, bg="#ffffff", highlightthickness=0)
-        scrollbar = ttk.Scrollbar(self.rows_frame, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        
-        scrollbar.pack(side="right", fill="y")
-        self.canvas.pack(side="left", fill="both", expand=True)
-        
-        # Frame dentro del canvas para las filas
-        self.table_frame = tk.Frame(self.canvas, bg="#ffffff")
-        self.canvas_window = self.canvas.create_window((0, 0), window=self.table_frame, anchor="nw")
+        self.scrollbar = ttk.Scrollbar(self.rows_frame, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
         
-        # Configurar eventos para redimensionar el canvas
-        self.table_frame.bind("<Configure>", self.on_frame_configure)
-        self.canvas.bind("<Configure>", self.on_canvas_configure)
+        self.table_frame = tk.Frame(self.rows_frame, bg="#ffffff")
+        self.table_frame.pack(side="left", fill="both", expand=True)
+        self.table_frame.pack_propagate(False)  # La altura la decide la ventana, no las filas
+        self.table_frame.bind("<Configure>", self.on_resize)
         
-        # Crear filas para los 32 registros
-        self.reg_labels = []
-        self.hex_labels = []
-        self.bin_labels = []
+        # Rueda del mouse (Windows/macOS y X11)
+        for widget in (self.table_frame, self.scrollbar):
+            widget.bind("<MouseWheel>", lambda e: self.scroll_rows(-1 if e.delta > 0 else 1) or "break")
+            widget.bind("<Button-4>", lambda e: self.scroll_rows(-3) or "break")
+            widget.bind("<Button-5>", lambda e: self.scroll_rows(3) or "break")
         
-        for i in range(32):
-            row_frame = tk.Frame(self.table_frame, bg="#ffffff" if i % 2 == 0 else "#f5f5f5")
+        self.add_row_widgets(1)
+        self.update_idletasks()
+        self.row_height = max(self.row_widgets[0][0].winfo_reqheight(), 1)
+    
+    def add_row_widgets(self, count):
+        for _ in range(count):
+            row_frame = tk.Frame(self.table_frame, bg="#ffffff")
             row_frame.pack(fill="x")
             
-            reg_label = tk.Label(row_frame, text=f"R{i}", font=('Consolas', 10), 
-                               bg=row_frame["bg"], width=10, anchor="w")
-            reg_label.grid(row=0, column=0, padx=2, pady=2, sticky="w")
+            name_label = tk.Label(row_frame, text="", font=('Consolas', 10), 
+                                 bg="#ffffff", width=10, anchor="w")
+            name_label.grid(row=0, column=0, padx=2, pady=2, sticky="w")
             
-            hex_label = tk.Label(row_frame, text="0x00000000", font=('Consolas', 10), 
-                               bg=row_frame["bg"], width=12, anchor="w")
+            hex_label = tk.Label(row_frame, text="", font=('Consolas', 10), 
+                               bg="#ffffff", width=12, anchor="w")
             hex_label.grid(row=0, column=1, padx=2, pady=2, sticky="w")
             
-            bin_label = tk.Label(row_frame, text="00000000000000000000000000000000", font=('Consolas', 10), 
-                               bg=row_frame["bg"], width=32, anchor="w")
+            bin_label = tk.Label(row_frame, text="", font=('Consolas', 10), 
+                               bg="#ffffff", width=32, anchor="w")
             bin_label.grid(row=0, column=2, padx=2, pady=2, sticky="w")
             
-            self.reg_labels.append(reg_label)
-            self.hex_labels.append(hex_label)
-            self.bin_labels.append(bin_label)
+            widgets = (row_frame, name_label, hex_label, bin_label)
+            for widget in widgets:
+                widget.bind("<MouseWheel>", lambda e: self.scroll_rows(-1 if e.delta > 0 else 1) or "break")
+                widget.bind("<Button-4>", lambda e: self.scroll_rows(-3) or "break")
+                widget.bind("<Button-5>", lambda e: self.scroll_rows(3) or "break")
+            self.row_widgets.append(widgets)
     
-    def on_frame_configure(self, event):
-        # Actualizar región de desplazamiento del canvas
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+    def visible_rows(self):
+        return min(len(self.row_widgets), len(self.values))
     
-    def on_canvas_configure(self, event):
-        # Ajustar el ancho del frame interno al ancho del canvas
-        self.canvas.itemconfig(self.canvas_window, width=event.width)
+    def on_resize(self, event):
+        # Tantas filas de widgets como entran en la altura disponible
+        needed = max(event.height // self.row_height, 1)
+        if needed > len(self.row_widgets):
+            self.add_row_widgets(needed - len(self.row_widgets))
+        for row_frame, *_ in self.row_widgets[needed:]:
+            row_frame.destroy()
+        del self.row_widgets[needed:]
+        self.scroll_to(self.first_row)
     
-    def update_register(self, reg_num, value):
-        if 0 <= reg_num < 32:
-            hex_value = f"0x{value:08X}"
-            bin_value = f"{value:032b}"
-            
-            self.hex_labels[reg_num].config(text=hex_value)
-            self.bin_labels[reg_num].config(text=bin_value)
-            
-            # Resaltar el registro actualizado
-            row_frame = self.hex_labels[reg_num].master
-            orig_bg = "#ffffff" if reg_num % 2 == 0 else "#f5f5f5"
-            
-            # Efecto de resaltado temporal
-            row_frame.config(bg="#e6f2ff")
-            self.reg_labels[reg_num].config(bg="#e6f2ff")
-            self.hex_labels[reg_num].config(bg="#e6f2ff")
-            self.bin_labels[reg_num].config(bg="#e6f2ff")
-            
-            # Restaurar color original después de un tiempo
-            self.after(1500, lambda: self.restore_color(reg_num, orig_bg))
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.values)))
+        elif unit == "pages":
+            self.scroll_rows(int(amount) * max(self.visible_rows() - 1, 1))
+        else:
+            self.scroll_rows(int(amount))
+    
+    def scroll_rows(self, delta):
+        self.scroll_to(self.first_row + delta)
+    
+    def scroll_to(self, row):
+        self.first_row = max(0, min(row, len(self.values) - self.visible_rows()))
+        self.render()
+    
+    def render(self):
+        total = len(self.values)
+        for offset in range(len(self.row_widgets)):
+            self.render_row(self.first_row + offset)
+        if total:
+            self.scrollbar.set(self.first_row / total, (self.first_row + self.visible_rows()) / total)
+    
+    def render_row(self, row):
+        offset = row - self.first_row
+        if not 0 <= offset < len(self.row_widgets):
+            return
+        widgets = self.row_widgets[offset]
+        row_frame, name_label, hex_label, bin_label = widgets
+        if row < len(self.values):
+            value = self.values[row]
+            name_label.config(text=self.row_name(row))
+            hex_label.config(text=f"0x{value:08X}")
+            bin_label.config(text=f"{value:032b}")
+            bg = self.fader.color if row in self.highlighted else self.ROW_COLORS[row % 2]
+        else:
+            for label in (name_label, hex_label, bin_label):
+                label.config(text="")
+            bg = "#ffffff"
+        for widget in widgets:
+            widget.config(bg=bg)
+    
+    def set_value(self, row, value):
+        if 0 <= row < len(self.values):
+            self.values[row] = value
+            # Resaltar la fila actualizada (el color original vuelve con el temporizador compartido)
+            self.highlighted.add(row)
+            self.fader.mark((id(self), row), (), None, self.on_highlight_end)
+            self.render_row(row)
+    
+    def on_highlight_end(self, key):
+        self.highlighted.discard(key[1])
+        self.render_row(key[1])
     
-    def restore_color(self, reg_num, color):
-        row_frame = self.hex_labels[reg_num].master
-        row_frame.config(bg=color)
-        self.reg_labels[reg_num].config(bg=color)
-        self.hex_labels[reg_num].config(bg=color)
-        self.bin_labels[reg_num].config(bg=color)
+    def set_values(self, values):
+        # Reemplaza todo el contenido (p. ej. una imagen de memoria de una traza) sin resaltar
+        self.values = array('I', values)
+        self.highlighted.clear()
+        self.scroll_to(self.first_row)
     
     def clear_values(self):
-        for i in range(32):
-            self.hex_labels[i].config(text="0x00000000")
-            self.bin_labels[i].config(text="00000000000000000000000000000000")
+        self.values = array('I', bytes(4 * len(self.values)))
+        self.highlighted.clear()
+        self.render()
+    
+    def parse_number(self, text):
+        try:
+            return int(text.strip(), 0)
+        except ValueError:
+            self.status_label.config(text=f"Valor inválido: {text.strip()}")
+            return None
+    
+    def goto(self, text):
+        row = self.parse_row(text)
+        if row is None:
+            return
+        if not 0 <= row < len(self.values):
+            self.status_label.config(text=f"Fuera de rango (0-{len(self.values) - 1})")
+            return
+        self.status_label.config(text="")
+        self.show_row(row)
+    
+    def parse_row(self, text):
+        return self.parse_number(text)
+    
+    def show_row(self, row):
+        # Deja la fila arriba (si se puede) y la resalta
+        self.scroll_to(row)
+        self.highlighted.add(row)
+        self.fader.mark((id(self), row), (), None, self.on_highlight_end)
+        self.render_row(row)
+    
+    def search(self, text):
+        value = self.parse_number(text)
+        if value is None:
+            return
+        value &= 0xFFFFFFFF
+        # Siguiente aparición después de la primera fila visible, dando la vuelta al final
+        start = self.first_row + 1
+        try:
+            row = self.values.index(value, start)
+        except ValueError:
+            try:
+                row = self.values.index(value, 0, start)
+            except ValueError:
+                self.status_label.config(text=f"0x{value:08X} no encontrado")
+                return
+        self.status_label.config(text=f"0x{value:08X} en {self.row_name(row)}")
+        self.show_row(row)
 
-# Clase para visualizar memoria en formato de tabla
-class MemoryTable(tk.Frame):
-    def __init__(self, master=None, **kwargs):
-        super().__init__(master, **kwargs)
-        self.configure(bg="#ffffff")
-        
-        # Crear tabla de memoria
-        self.create_table()
-        
-        # Inicializar valores
-        self.clear_values()
+class RegistersTable(VirtualTable):
+    def __init__(self, master=None, fader=None, **kwargs):
+        super().__init__(master, "Registro", 32, fader, **kwargs)
     
-    def create_table(self):
-        # Crear encabezados
-        header_frame = tk.Frame(self, bg="#4a86e8")
-        header_frame.pack(fill="x")
-        
-        headers = ["Dirección", "Valor (Hex)", "Valor (Bin)"]
-        widths = [100, 120, 320]
-        
-        for i, header in enumerate(headers):
-            tk.Label(header_frame, text=header, font=('Segoe UI', 10, 'bold'), 
-                    bg="#4a86e8", fg="white", width=widths[i]//10).grid(row=0, column=i, padx=2, pady=5, sticky="w")
-        
-        # Crear contenedor para filas de memoria
-        self.rows_frame = tk.Frame(self, bg="#ffffff")
-        self.rows_frame.pack(fill="both", expand=True)
-        
-        # Crear canvas y scrollbar para permitir desplazamiento
-        self.canvas = tk.Canvas(self.rows_frame, bg="#ffffff", highlightthickness=0)
-        scrollbar = ttk.Scrollbar(self.rows_frame, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        
-        scrollbar.pack(side="right", fill="y")
-        self.canvas.pack(side="left", fill="both", expand=True)
-        
-        # Frame dentro del canvas para las filas
-        self.table_frame = tk.Frame(self.canvas, bg="#ffffff")
-        self.canvas_window = self.canvas.create_window((0, 0), window=self.table_frame, anchor="nw")
-        
-        # Configurar eventos para redimensionar el canvas
-        self.table_frame.bind("<Configure>", self.on_frame_configure)
-        self.canvas.bind("<Configure>", self.on_canvas_configure)
-        
-        # Crear filas para las 32 posiciones de memoria
-        self.addr_labels = []
-        self.hex_labels = []
-        self.bin_labels = []
-        
-        for i in range(32):
-            row_frame = tk.Frame(self.table_frame, bg="#ffffff" if i % 2 == 0 else "#f5f5f5")
-            row_frame.pack(fill="x")
-            
-            addr_label = tk.Label(row_frame, text=f"Mem[{i}]", font=('Consolas', 10), 
-                                bg=row_frame["bg"], width=10, anchor="w")
-            addr_label.grid(row=0, column=0, padx=2, pady=2, sticky="w")
-            
-            hex_label = tk.Label(row_frame, text="0x00000000", font=('Consolas', 10), 
-                               bg=row_frame["bg"], width=12, anchor="w")
-            hex_label.grid(row=0, column=1, padx=2, pady=2, sticky="w")
-            
-            bin_label = tk.Label(row_frame, text="00000000000000000000000000000000", font=('Consolas', 10), 
-                               bg=row_frame["bg"], width=32, anchor="w")
-            bin_label.grid(row=0, column=2, padx=2, pady=2, sticky="w")
-            
-            self.addr_labels.append(addr_label)
-            self.hex_labels.append(hex_label)
-            self.bin_labels.append(bin_label)
+    def row_name(self, row):
+        return f"R{row}"
     
-    def on_frame_configure(self, event):
-        # Actualizar región de desplazamiento del canvas
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+    def parse_row(self, text):
+        # Acepta 5, R5 o $5
+        return self.parse_number(text.strip().lstrip("rR$"))
     
-    def on_canvas_configure(self, event):
-        # Ajustar el ancho del frame interno al ancho del canvas
-        self.canvas.itemconfig(self.canvas_window, width=event.width)
+    def update_register(self, reg_num, value):
+        self.set_value(reg_num, value)
+
+# Clase para visualizar memoria en formato de tabla
+class MemoryTable(VirtualTable):
+    def __init__(self, master=None, fader=None, words=32, **kwargs):
+        super().__init__(master, "Dirección", words, fader, **kwargs)
     
-    def update_memory(self, addr, value):
-        if 0 <= addr < 32:
-            hex_value = f"0x{value:08X}"
-            bin_value = f"{value:032b}"
-            
-            self.hex_labels[addr].config(text=hex_value)
-            self.bin_labels[addr].config(text=bin_value)
-            
-            # Resaltar la dirección de memoria actualizada
-            row_frame = self.hex_labels[addr].master
-            orig_bg = "#ffffff" if addr % 2 == 0 else "#f5f5f5"
-            
-            # Efecto de resaltado temporal
-            row_frame.config(bg="#e6f2ff")
-            self.addr_labels[addr].config(bg="#e6f2ff")
-            self.hex_labels[addr].config(bg="#e6f2ff")
-            self.bin_labels[addr].config(bg="#e6f2ff")
-            
-            # Restaurar color original después de un tiempo
-            self.after(1500, lambda: self.restore_color(addr, orig_bg))
+    def row_name(self, row):
+        return f"Mem[{row}]"
     
-    def restore_color(self, addr, color):
-        row_frame = self.hex_labels[addr].master
-        row_frame.config(bg=color)
-        self.addr_labels[addr].config(bg=color)
-        self.hex_labels[addr].config(bg=color)
-        self.bin_labels[addr].config(bg=color)
+    def parse_row(self, text):
+        # Acepta el índice de palabra (12, Mem[12]) o una dirección en bytes con @ (@0x30)
+        text = text.strip()
+        if text.startswith("@"):
+            address = self.parse_number(text[1:])
+            return None if address is None else address // 4
+        return self.parse_number(text.replace("Mem[", "").replace("mem[", "").rstrip("]"))
     
-    def clear_values(self):
-        for i in range(32):
-            self.hex_labels[i].config(text="0x00000000")
-            self.bin_labels[i].config(text="00000000000000000000000000000000")
+    def update_memory(self, addr, value):
+        self.set_value(addr, value)
 
 # Clase para visualizar el pipeline
 class PipelineVisualizer(tk.Frame):
-    def __init__(self, master=None, **kwargs):
+    def __init__(self, master=None, fader=None, **kwargs):
         super().__init__(master, **kwargs)
         self.configure(bg="#ffffff", padx=10, pady=10)
+        self.fader = fader or HighlightFader(self)
         
         # Diccionarios para almacenar las etiquetas de los campos
         self.if_id_labels = {}
@@ -886,18 +797,9 @@ class PipelineVisualizer(tk.Frame):
         # Resaltar el campo actualizado
         orig_bg = "#ffffff" if field_name in ["inst", "rs_data", "alu_result", "read_data"] else "#f5f5f5"
         
-        # Efecto de resaltado temporal
-        field_frame.config(bg="#e6f2ff")
-        for widget in field_frame.winfo_children():
-            widget.config(bg="#e6f2ff")
-        
-        # Restaurar color original después de un tiempo
-        self.after(1500, lambda: self.restore_color(field_frame, orig_bg))
-    
-    def restore_color(self, frame, color):
-        frame.config(bg=color)
-        for widget in frame.winfo_children():
-            widget.config(bg=color)
+        # Efecto de resaltado temporal (el color original vuelve con el temporizador compartido)
+        self.fader.mark((register_name, field_name),
+                        (field_frame, *field_frame.winfo_children()), orig_bg)
     
     def clear_values(self):
         for register_name in ["IF/ID", "ID/EX", "EX/MEM", "MEM/WB"]:
@@ -935,7 +837,14 @@ class MipsFpgaGUI(tk.Tk):
         self.title("MIPS FPGA Interface")
         self.geometry("1200x800")
         self.ser = None
+        self.worker = None      # SerialWorker: único hilo que usa self.ser mientras hay conexión
+        self.last_frame = None  # Última trama mostrada: referencia de "RUN HASTA" registro/memoria
+        self.shown_frame = EMPTY_FRAME  # DebugFrame que muestran las tablas
+        self.trace = None       # TraceWriter mientras se graba la traza binaria
+        self.trace_reader = None  # TraceReader de la traza abierta en la pestaña de memoria
         self.binary_instructions = []
+        # Ensamblador del conversor: reutiliza las líneas que no cambiaron entre conversiones
+        self.assembler = IncrementalAssembler()
         self.dark_mode = False
         
         # Configurar colores
@@ -1213,12 +1122,35 @@ class MipsFpgaGUI(tk.Tk):
         self.step_btn.grid(row=2, column=0, padx=5, pady=5)
         self.step_btn.configure(state="disabled")
         
+        self.trace_btn = HoverButton(cmd_btn_frame, text="GRABAR TRAZA", 
+                                    command=self.toggle_trace,
+                                    width=150, height=35, bg_color="#9c27b0")
+        self.trace_btn.grid(row=0, column=1, padx=5, pady=5)
+        
+        self.run_until_btn = HoverButton(cmd_btn_frame, text="RUN HASTA", 
+                                        command=self.run_until_program,
+                                        width=150, height=35, bg_color="#4a86e8")
+        self.run_until_btn.grid(row=1, column=1, padx=5, pady=5)
+        self.run_until_btn.configure(state="disabled")
+        
+        self.step_n_btn = HoverButton(cmd_btn_frame, text="STEP N", 
+                                     command=self.step_n_program,
+                                     width=150, height=35, bg_color="#4a86e8")
+        self.step_n_btn.grid(row=2, column=1, padx=5, pady=5)
+        self.step_n_btn.configure(state="disabled")
+        
         self.reset_btn = HoverButton(cmd_btn_frame, text="RESET", 
                                     command=self.reset_program,
                                     width=150, height=35, bg_color="#ff9800")
         self.reset_btn.grid(row=3, column=0, padx=5, pady=5)
         self.reset_btn.configure(state="disabled")
         
+        self.cancel_btn = HoverButton(cmd_btn_frame, text="CANCELAR", 
+                                     command=self.cancel_commands,
+                                     width=150, height=35, bg_color="#f44336")
+        self.cancel_btn.grid(row=3, column=1, padx=5, pady=5)
+        self.cancel_btn.configure(state="disabled")
+        
         # Panel de información
         info_frame = ttk.LabelFrame(left_paned, text="Estado")
         left_paned.add(info_frame, weight=40)
@@ -1255,13 +1187,31 @@ class MipsFpgaGUI(tk.Tk):
         self.fpga_notebook.add(self.log_tab, text="Log")
         
         # Crear visualizadores
-        self.registers_table = RegistersTable(self.registers_tab)
+        # Un solo temporizador para el resaltado de las tres vistas
+        self.fader = HighlightFader(self)
+        
+        self.registers_table = RegistersTable(self.registers_tab, fader=self.fader)
         self.registers_table.pack(fill="both", expand=True, padx=10, pady=10)
         
-        self.memory_table = MemoryTable(self.memory_tab)
+        # Inspección sin la placa: una traza grabada (.mtr) o una imagen de memoria (.bin)
+        mem_btn_frame = ttk.Frame(self.memory_tab)
+        mem_btn_frame.pack(fill="x", padx=10, pady=(10, 0))
+        
+        self.open_image_btn = HoverButton(mem_btn_frame, text="ABRIR TRAZA/IMAGEN", 
+                                         command=self.open_memory_image,
+                                         width=180, height=35, bg_color="#9c27b0")
+        self.open_image_btn.grid(row=0, column=0, padx=5, pady=5)
+        
+        self.trace_cycle_btn = HoverButton(mem_btn_frame, text="CICLO DE LA TRAZA", 
+                                          command=self.show_trace_cycle,
+                                          width=180, height=35, bg_color="#9c27b0")
+        self.trace_cycle_btn.grid(row=0, column=1, padx=5, pady=5)
+        self.trace_cycle_btn.configure(state="disabled")
+        
+        self.memory_table = MemoryTable(self.memory_tab, fader=self.fader)
         self.memory_table.pack(fill="both", expand=True, padx=10, pady=10)
         
-        self.pipeline_visualizer = PipelineVisualizer(self.pipeline_tab)
+        self.pipeline_visualizer = PipelineVisualizer(self.pipeline_tab, fader=self.fader)
         self.pipeline_visualizer.pack(fill="both", expand=True)
         
         # Área de texto para log
@@ -1282,6 +1232,21 @@ class MipsFpgaGUI(tk.Tk):
         self.output_text.tag_configure("error", foreground="#f44336")
         self.output_text.tag_configure("header", foreground="#9c27b0", font=('Consolas', 11, 'bold'))
         self.output_text.tag_configure("subheader", foreground="#673ab7", font=('Consolas', 11, 'bold'))
+        self.log_console = LogConsole(self.output_text)
+        
+        # Botones del log
+        log_btn_frame = ttk.Frame(self.log_frame)
+        log_btn_frame.pack(fill="x", padx=5, pady=(0, 5))
+        
+        self.spill_btn = HoverButton(log_btn_frame, text="GUARDAR LOG", 
+                                    command=self.toggle_log_spill,
+                                    width=150, height=35, bg_color="#4a86e8")
+        self.spill_btn.grid(row=0, column=0, padx=5, pady=5)
+        
+        self.clear_log_btn = HoverButton(log_btn_frame, text="LIMPIAR LOG", 
+                                        command=self.log_console.clear,
+                                        width=150, height=35, bg_color="#ff9800")
+        self.clear_log_btn.grid(row=0, column=1, padx=5, pady=5)
 
     def refresh_ports(self):
         ports = [port.device for port in serial.tools.list_ports.comports()]
@@ -1305,8 +1270,8 @@ class MipsFpgaGUI(tk.Tk):
                     return
             else:
                 try:
-                    self.ser = serial.Serial(
-                        port=port,
+                    self.ser = serial.serial_for_url(
+                        port,
                         baudrate=BAUDRATE,
                         bytesize=BYTESIZE,
                         stopbits=STOPBITS,
@@ -1319,23 +1284,34 @@ class MipsFpgaGUI(tk.Tk):
                     self.log_output(f"Error de conexión: {str(e)}", "error")
                     return
             
+            # Desde acá el puerto solo se usa desde el hilo de E/S
+            self.worker = SerialWorker(self.ser)
+            self.after(WORKER_POLL_MS, self.poll_worker, self.worker)
+            
             # Actualizar estado de la interfaz
             self.connect_btn.configure(text="Desconectar")
             self.load_btn.configure(state="normal")
             self.run_btn.configure(state="normal")
             self.step_btn.configure(state="normal")
+            self.step_n_btn.configure(state="normal")
+            self.run_until_btn.configure(state="normal")
             self.reset_btn.configure(state="normal")
+            self.cancel_btn.configure(state="normal")
             self.status_bar.config(text=f"Conectado a {port}")
             self.conn_status.config(text="Conectado", fg=self.current_colors["success"])
             self.port_info.config(text=port)
         else:
+            self.stop_worker()
             self.ser.close()
             self.ser = None
             self.connect_btn.configure(text="Conectar")
             self.load_btn.configure(state="disabled")
             self.run_btn.configure(state="disabled")
             self.step_btn.configure(state="disabled")
+            self.step_n_btn.configure(state="disabled")
+            self.run_until_btn.configure(state="disabled")
             self.reset_btn.configure(state="disabled")
+            self.cancel_btn.configure(state="disabled")
             self.status_bar.config(text="Desconectado")
             self.conn_status.config(text="Desconectado", fg=self.current_colors["error"])
             self.port_info.config(text="-")
@@ -1347,20 +1323,16 @@ class MipsFpgaGUI(tk.Tk):
             messagebox.showwarning("Advertencia", "No hay código MIPS para convertir.")
             return
         
-        self.binary_text.delete("1.0", tk.END)
         self.error_text.delete("1.0", tk.END)
         
         try:
-            binary_instructions, errors = convert_asm_to_coe(mips_code)
-            self.binary_instructions = binary_instructions
+            # En la GUI se ensambla todo el texto (sin el encabezado de input.asm);
+            # solo se codifican las líneas que cambiaron desde la conversión anterior
+            binary_instructions, errors = self.assembler.update(mips_code)
             
             # Mostrar instrucciones binarias
-            for i, instr in enumerate(binary_instructions):
-                self.binary_text.insert(tk.END, f"{instr}")
-                if i < len(binary_instructions) - 1:
-                    self.binary_text.insert(tk.END, ",\n")
-                else:
-                    self.binary_text.insert(tk.END, ";\n")
+            self.update_binary_text(binary_instructions)
+            self.binary_instructions = binary_instructions
             
             # Mostrar errores si los hay
             if errors:
@@ -1376,6 +1348,24 @@ class MipsFpgaGUI(tk.Tk):
             self.status_bar.config(text="Error durante la conversión.")
             messagebox.showerror("Error", f"Error durante la conversión: {str(e)}")
 
+    def update_binary_text(self, words):
+        """
+        Actualiza el panel binario reemplazando solo las líneas cuya palabra cambió.
+        Si la cantidad de instrucciones cambió o el panel fue editado a mano se reescribe entero.
+        """
+        previous = self.binary_instructions
+        if len(previous) != len(words) or not words or self.binary_text.edit_modified():
+            self.binary_text.delete("1.0", tk.END)
+            self.binary_text.insert(tk.END, format_coe(words))
+        else:
+            last = len(words) - 1
+            for i, (old, new) in enumerate(zip(previous, words)):
+                if old != new:
+                    line = f"{i + 1}.0"
+                    self.binary_text.delete(line, f"{line} lineend")
+                    self.binary_text.insert(line, format(new, '032b') + ("," if i < last else ";"))
+        self.binary_text.edit_modified(False)
+
     def load_mips_file(self):
         file_path = filedialog.askopenfilename(
             title="Seleccionar archivo MIPS",
@@ -1404,9 +1394,7 @@ class MipsFpgaGUI(tk.Tk):
         )
         if file_path:
             try:
-                with open(file_path, 'w') as file:
-                    for i, instr in enumerate(self.binary_instructions):
-                        file.write(instr + (",\n" if i < len(self.binary_instructions) - 1 else ";\n"))
+                write_coe(self.binary_instructions, file_path)
                 self.status_bar.config(text=f"Archivo guardado: {file_path}")
                 messagebox.showinfo("Éxito", f"Archivo guardado correctamente en:\n{file_path}")
             except Exception as e:
@@ -1422,28 +1410,25 @@ class MipsFpgaGUI(tk.Tk):
         
         try:
             instrucciones = parse_coe(file_path)
-            if not instrucciones:
-                messagebox.showwarning("Advertencia", "No se encontraron instrucciones en el archivo.")
-                return
-            
-            self.log_output(f"Enviando comando LOAD_PROGRAM (0x04)...", "info")
-            enviar_datos(self.ser, bytes([CMD_LOAD]))
-            time.sleep(0.1)
-            
-            self.log_output(f"Enviando programa ({len(instrucciones)} instrucciones)...", "info")
-            for instr in instrucciones:
-                data_instr = instr.to_bytes(4, byteorder='big')
-                enviar_datos(self.ser, data_instr)
-                if instr == HALT_INSTR:
-                    self.log_output("Se envió la instrucción HALT (0x0000003F). Finalizando carga.", "success")
-                    break
-            
-            self.log_output("Carga de programa finalizada.", "success")
-            self.status_bar.config(text=f"Programa cargado: {file_path}")
-        
         except Exception as e:
             self.log_output(f"Error al cargar el programa: {str(e)}", "error")
             messagebox.showerror("Error", f"Error al cargar el programa: {str(e)}")
+            return
+        if not instrucciones:
+            messagebox.showwarning("Advertencia", "No se encontraron instrucciones en el archivo.")
+            return
+        
+        def mostrar(carga):
+            if instrucciones[carga.instrucciones - 1] == HALT_INSTR:
+                self.log_output("Se envió la instrucción HALT (0x0000003F). Finalizando carga.", "success")
+            self.log_output(f"{carga.bytes} bytes en {carga.segundos:.3f} s: "
+                            f"{carga.bytes_por_seg:.0f} bytes/s (línea: {carga.tasa_linea:.0f} bytes/s)", "info")
+            self.log_output("Carga de programa finalizada.", "success")
+            self.status_bar.config(text=f"Programa cargado: {file_path}")
+        
+        self.log_output(f"Enviando comando LOAD_PROGRAM (0x04)...", "info")
+        self.log_output(f"Enviando programa ({len(instrucciones)} instrucciones)...", "info")
+        self.submit_command("LOAD_PROGRAM", comando_carga(instrucciones, BAUDRATE), mostrar, cancelable=False)
 
     def run_program(self):
         self.execute_command(CMD_RUN, "RUN")
@@ -1452,119 +1437,148 @@ class MipsFpgaGUI(tk.Tk):
         self.execute_command(CMD_STEP, "STEP")
 
     def reset_program(self):
-        try:
-            self.log_output("Enviando comando RESET (0x0C)...", "info")
-            enviar_datos(self.ser, bytes([CMD_RESET]))
+        def limpiar(_):
             self.log_output("Comando RESET enviado.", "success")
             self.status_bar.config(text="FPGA reiniciada")
             
             # Limpiar visualizadores
+            self.last_frame = None
+            self.shown_frame = EMPTY_FRAME
             self.registers_table.clear_values()
             self.memory_table.clear_values()
             self.pipeline_visualizer.clear_values()
-            
-        except Exception as e:
-            self.log_output(f"Error al enviar comando RESET: {str(e)}", "error")
-            messagebox.showerror("Error", f"Error al enviar comando RESET: {str(e)}")
+        
+        self.log_output("Enviando comando RESET (0x0C)...", "info")
+        self.submit_command("RESET", comando_reset(BAUDRATE), limpiar, cancelable=False)
 
-    def execute_command(self, cmd, cmd_name):
-        try:
-            self.log_output(f"Enviando comando {cmd_name} (0x{cmd:02X})...", "info")
-            enviar_datos(self.ser, bytes([cmd]))
-            
-            self.log_output("Esperando respuesta de la FPGA (registros y memoria)...", "info")
-            
-            # Usar un hilo para no bloquear la interfaz
-            threading.Thread(target=self.read_fpga_response, args=(cmd_name,), daemon=True).start()
-            
-        except Exception as e:
-            self.log_output(f"Error al enviar comando {cmd_name}: {str(e)}", "error")
-            messagebox.showerror("Error", f"Error al enviar comando {cmd_name}: {str(e)}")
+    def step_n_program(self):
+        n = simpledialog.askinteger("STEP N", "Cantidad de ciclos:", parent=self, minvalue=1)
+        if n:
+            self.execute_steps(f"STEP {n}", comando_step_n(n, self.trace))
 
-    def read_fpga_response(self, cmd_name):
+    def run_until_program(self):
+        texto = simpledialog.askstring(
+            "RUN HASTA", "Condición de parada:\n  pc=0x40  la instrucción en 0x40 llega a IF/ID\n"
+            "  r5      cambia R5\n  mem3    cambia Mem[3]", parent=self)
+        if not texto:
+            return
         try:
-            data = leer_respuesta(self.ser, EXPECTED_RESPONSE_BYTES)
-            regs = leer_respuesta(self.ser, PIPELINE_BYTES)
-            
-            # Procesar y mostrar los datos en la interfaz
-            self.after(0, lambda: self.display_fpga_data(data, regs, cmd_name))
+            condicion = parse_condicion(texto, self.last_frame)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.execute_steps(f"RUN HASTA {texto.strip()}", comando_run_until(condicion, self.trace))
+
+    def execute_steps(self, cmd_name, trabajo):
+        # Las tramas intermedias no se decodifican ni se muestran: solo la última
+        def mostrar(resultado):
+            pasos = resultado.pasos
+            if cmd_name.startswith("RUN HASTA") and not pasos.cumplida:
+                self.log_output(f"La condición no se cumplió en {pasos.ciclos} ciclos.", "warning")
+            self.log_output(f"{pasos.ciclos} ciclos en {pasos.segundos:.3f} s: "
+                            f"{pasos.ciclos_por_seg:.1f} ciclos/s", "info")
+            if resultado.trama is not None:
+                self.display_fpga_data(resultado.trama, cmd_name)
+        
+        self.log_output(f"Enviando comandos STEP (0x{CMD_STEP:02X}) para {cmd_name}...", "info")
+        self.submit_command(cmd_name, trabajo, mostrar)
+
+    def toggle_trace(self):
+        if self.trace is None:
+            file_path = filedialog.asksaveasfilename(
+                title="Grabar traza binaria",
+                defaultextension=".mtr",
+                filetypes=[("Trazas MIPS", "*.mtr"), ("Todos los archivos", "*.*")]
+            )
+            if not file_path:
+                return
+            try:
+                self.trace = TraceWriter(file_path)
+            except OSError as e:
+                messagebox.showerror("Error", f"No se pudo crear la traza: {str(e)}")
+                return
+            self.trace_btn.configure(text="DETENER TRAZA")
+            self.log_output(f"Grabando las tramas recibidas en {file_path}", "info")
+        else:
+            traza, self.trace = self.trace, None
+            self.trace_btn.configure(text="GRABAR TRAZA")
             
-        except Exception as e:
-            self.after(0, lambda: self.log_output(f"Error al leer respuesta: {str(e)}", "error"))
+            def guardada(_):
+                self.log_output(f"Traza guardada en {traza.path} ({traza.records} tramas)", "success")
+            if self.worker is not None:
+                # Los comandos ya encolados todavía escriben en la traza: se cierra detrás de ellos
+                self.worker.submit("CERRAR TRAZA", comando(traza.close), guardada, cancelable=False)
+            else:
+                traza.close()
+                guardada(None)
 
-    def display_fpga_data(self, data, regs, cmd_name):
-        if len(data) < EXPECTED_RESPONSE_BYTES or len(regs) < PIPELINE_BYTES:
-            self.log_output("Datos incompletos recibidos.", "warning")
-            return
+    def execute_command(self, cmd, cmd_name):
+        def mostrar(trama):
+            self.display_fpga_data(trama, cmd_name)
         
-        # Actualizar registros
-        for i in range(32):
-            reg = int.from_bytes(data[i*4:(i+1)*4], byteorder='big')
+        self.log_output(f"Enviando comando {cmd_name} (0x{cmd:02X})...", "info")
+        self.submit_command(cmd_name, comando_trama(cmd, self.trace), mostrar)
+
+    def submit_command(self, cmd_name, trabajo, al_terminar, cancelable=True):
+        # Los pedidos se ejecutan de a uno en el hilo de E/S, en el orden de los clics;
+        # LOAD_PROGRAM y RESET no se cortan a medias y CANCELAR no los descarta
+        if self.worker.busy:
+            self.log_output(f"{cmd_name} en cola: espera al comando {self.worker.current or 'anterior'}", "info")
+        self.worker.submit(cmd_name, trabajo, al_terminar, cancelable=cancelable)
+
+    def cancel_commands(self):
+        if self.worker is not None and self.worker.busy:
+            self.log_output("Cancelando los comandos pendientes...", "warning")
+            self.worker.cancel()
+
+    def poll_worker(self, worker):
+        # Único punto donde los resultados del hilo de E/S llegan a la interfaz
+        for resultado in worker.poll():
+            if isinstance(resultado.error, TrabajoCancelado):
+                self.log_output(f"{resultado.nombre}: {str(resultado.error)}.", "warning")
+            elif resultado.error is not None:
+                self.log_output(f"Error en {resultado.nombre}: {str(resultado.error)}", "error")
+            # Un STEP N cortado igual avanzó la placa: se muestra hasta dónde llegó
+            if resultado.al_terminar is not None and (resultado.error is None or resultado.valor is not None):
+                resultado.al_terminar(resultado.valor)
+        if worker is self.worker:
+            self.after(WORKER_POLL_MS, self.poll_worker, worker)
+
+    def stop_worker(self):
+        worker, self.worker = self.worker, None
+        if worker is not None:
+            worker.stop()
+            self.poll_worker(worker)  # Informar lo que quedó cancelado
+
+    def show_frame(self, frame):
+        anterior, self.shown_frame = self.shown_frame, frame
+        
+        # Actualizar solo los registros, palabras y campos que cambiaron desde la trama anterior
+        for i in changed_indices(anterior.registers, frame.registers):
+            self.registers_table.update_register(i, frame.registers[i])
+        if len(self.memory_table.values) != len(frame.memory):
+            # Había una imagen de memoria de otro tamaño: volver a las palabras de la trama
+            self.memory_table.set_values(frame.memory)
+        else:
+            for i in changed_indices(anterior.memory, frame.memory):
+                self.memory_table.update_memory(i, frame.memory[i])
+        for i in changed_indices(anterior.pipeline, frame.pipeline):
+            titulo, campo, bits = PIPELINE_GUI_FIELDS[i]
+            self.pipeline_visualizer.update_pipeline_register(titulo, campo, frame.pipeline[i], bits)
+
+    def display_fpga_data(self, trama, cmd_name):
+        self.last_frame = trama.raw
+        frame = trama.frame
+        self.show_frame(frame)
+        
+        # Registrar los valores distintos de cero
+        for i, reg in enumerate(frame.registers):
             if reg != 0:
-                self.registers_table.update_register(i, reg)
                 self.log_output(f"R{i:02d}: 0x{reg:08X}", "info")
-        
-        # Actualizar memoria
-        offset = 32 * 4
-        for i in range(32):
-            mem_word = int.from_bytes(data[offset + i*4 : offset + (i+1)*4], byteorder='big')
+        for i, mem_word in enumerate(frame.memory):
             if mem_word != 0:
-                self.memory_table.update_memory(i, mem_word)
                 self.log_output(f"Mem[{i:02d}]: 0x{mem_word:08X}", "info")
         
-        # Parseo de IF_ID
-        if_id = regs[0:8]
-        if_id_inst = int.from_bytes(if_id[0:4], byteorder='big')
-        if_id_pc = int.from_bytes(if_id[4:8], byteorder='big')
-        
-        # Parseo de ID_EX
-        id_ex = regs[8:26]
-        id_ex_rs_data   = int.from_bytes(id_ex[0:4], byteorder='big')
-        id_ex_rt_data   = int.from_bytes(id_ex[4:8], byteorder='big')
-        id_ex_immediate = int.from_bytes(id_ex[8:12], byteorder='big')
-        id_ex_op_code   = id_ex[12]
-        id_ex_rs_addr   = id_ex[13]
-        id_ex_rt_addr   = id_ex[14]
-        id_ex_rd_addr   = id_ex[15]
-        id_ex_controlU  = int.from_bytes(id_ex[16:18], byteorder='big')
-        
-        # Parseo de EX_M
-        ex_m = regs[26:37]
-        ex_m_alu_result = int.from_bytes(ex_m[0:4], byteorder='big')
-        ex_m_wr_data    = int.from_bytes(ex_m[4:8], byteorder='big')
-        ex_m_addr_rd    = ex_m[8]
-        ex_m_controlU   = int.from_bytes(ex_m[9:11], byteorder='big')
-        
-        # Parseo de M_WB
-        m_wb = regs[37:47]
-        m_wb_read_data   = int.from_bytes(m_wb[0:4], byteorder='big')
-        m_wb_alu_result  = int.from_bytes(m_wb[4:8], byteorder='big')
-        m_wb_addr_rd     = m_wb[8]
-        m_wb_controlU    = m_wb[9]
-        
-        # Actualizar visualizador de pipeline
-        self.pipeline_visualizer.update_pipeline_register("IF/ID", "inst", if_id_inst)
-        self.pipeline_visualizer.update_pipeline_register("IF/ID", "pc+4", if_id_pc)
-        
-        self.pipeline_visualizer.update_pipeline_register("ID/EX", "rs_data", id_ex_rs_data)
-        self.pipeline_visualizer.update_pipeline_register("ID/EX", "rt_data", id_ex_rt_data)
-        self.pipeline_visualizer.update_pipeline_register("ID/EX", "immediate", id_ex_immediate)
-        self.pipeline_visualizer.update_pipeline_register("ID/EX", "op_code", id_ex_op_code & 0x3F, 6)
-        self.pipeline_visualizer.update_pipeline_register("ID/EX", "rs_addr", id_ex_rs_addr & 0x1F, 5)
-        self.pipeline_visualizer.update_pipeline_register("ID/EX", "rt_addr", id_ex_rt_addr & 0x1F, 5)
-        self.pipeline_visualizer.update_pipeline_register("ID/EX", "rd_addr", id_ex_rd_addr & 0x1F, 5)
-        self.pipeline_visualizer.update_pipeline_register("ID/EX", "controlU", id_ex_controlU, 16)
-        
-        self.pipeline_visualizer.update_pipeline_register("EX/MEM", "alu_result", ex_m_alu_result)
-        self.pipeline_visualizer.update_pipeline_register("EX/MEM", "wr_data", ex_m_wr_data)
-        self.pipeline_visualizer.update_pipeline_register("EX/MEM", "addr_rd", ex_m_addr_rd & 0x1F, 5)
-        self.pipeline_visualizer.update_pipeline_register("EX/MEM", "controlU", ex_m_controlU & 0x1FF, 9)
-        
-        self.pipeline_visualizer.update_pipeline_register("MEM/WB", "read_data", m_wb_read_data)
-        self.pipeline_visualizer.update_pipeline_register("MEM/WB", "alu_result", m_wb_alu_result)
-        self.pipeline_visualizer.update_pipeline_register("MEM/WB", "addr_rd", m_wb_addr_rd & 0x1F, 5)
-        self.pipeline_visualizer.update_pipeline_register("MEM/WB", "controlU", m_wb_controlU & 0xF, 4)
-        
         # Mostrar mensaje de éxito
         self.log_output(f"Comando {cmd_name} ejecutado correctamente", "success")
         self.status_bar.config(text=f"Comando {cmd_name} ejecutado correctamente")
@@ -1572,11 +1586,107 @@ class MipsFpgaGUI(tk.Tk):
         # Cambiar a la pestaña de pipeline para mostrar los resultados
         self.fpga_notebook.select(2)  # Seleccionar la pestaña de pipeline
 
+    def open_memory_image(self):
+        file_path = filedialog.askopenfilename(
+            title="Abrir traza o imagen de memoria",
+            filetypes=[("Trazas MIPS", "*.mtr"), ("Imágenes de memoria", "*.bin"), ("Todos los archivos", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            if is_trace_file(file_path):
+                reader = TraceReader(file_path)
+            else:
+                words = self.read_memory_image(file_path)
+                reader = None
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"No se pudo abrir el archivo: {str(e)}")
+            return
+        
+        self.close_trace_reader()
+        if reader is None:
+            self.memory_table.set_values(words)
+            if len(words) == len(self.shown_frame.memory):
+                # Mismo tamaño que la trama: la próxima trama se compara contra la imagen
+                self.shown_frame = DebugFrame(self.shown_frame.registers, tuple(words), self.shown_frame.pipeline)
+            self.log_output(f"Imagen de memoria {file_path}: {len(words)} palabras", "info")
+            self.status_bar.config(text=f"Imagen de memoria: {file_path}")
+            return
+        if not len(reader):
+            reader.close()
+            messagebox.showwarning("Advertencia", "La traza no tiene tramas.")
+            return
+        self.trace_reader = reader
+        self.trace_cycle_btn.configure(state="normal")
+        self.log_output(f"Traza {file_path}: {len(reader)} tramas, ciclos "
+                        f"{reader.cycle(0)} a {reader.cycle(-1)}", "info")
+        self.show_trace_cycle()
+
+    def read_memory_image(self, file_path):
+        # Palabras de 32 bits big-endian, como las imágenes .bin de mips_to_bin
+        with open(file_path, "rb") as f:
+            data = f.read()
+        if not data or len(data) % 4:
+            raise ValueError(f"{len(data)} bytes: una imagen de memoria tiene palabras de 4 bytes")
+        words = array('I')
+        words.frombytes(data)
+        if sys.byteorder == "little":
+            words.byteswap()
+        return words
+
+    def show_trace_cycle(self):
+        reader = self.trace_reader
+        if reader is None:
+            return
+        primero, ultimo = reader.cycle(0), reader.cycle(-1)
+        ciclo = simpledialog.askinteger("Traza", f"Ciclo a mostrar ({primero} a {ultimo}):", parent=self,
+                                        minvalue=primero, maxvalue=ultimo, initialvalue=ultimo)
+        if ciclo is None:
+            return
+        try:
+            indice = reader.index_of(ciclo)
+        except KeyError as e:
+            messagebox.showerror("Error", str(e.args[0]))
+            return
+        # Registros, memoria y pipeline de ese ciclo (last_frame sigue siendo el de la placa)
+        self.show_frame(reader.decode(indice))
+        self.status_bar.config(text=f"Traza {reader.path}: ciclo {ciclo}")
+
+    def close_trace_reader(self):
+        if self.trace_reader is not None:
+            self.trace_reader.close()
+            self.trace_reader = None
+            self.trace_cycle_btn.configure(state="disabled")
+
     def log_output(self, message, tag=None):
-        self.output_text.insert(tk.END, message + "\n", tag)
-        self.output_text.see(tk.END)  # Desplazar al final
+        self.log_console.write(message, tag)
+
+    def toggle_log_spill(self):
+        if self.log_console.spill_file is None:
+            file_path = filedialog.asksaveasfilename(
+                title="Guardar log",
+                defaultextension=".log",
+                filetypes=[("Archivos de log", "*.log"), ("Todos los archivos", "*.*")]
+            )
+            if not file_path:
+                return
+            try:
+                self.log_console.spill_to(file_path)
+            except OSError as e:
+                messagebox.showerror("Error", f"No se pudo abrir el archivo: {str(e)}")
+                return
+            self.spill_btn.configure(text="DETENER LOG")
+            self.log_output(f"Guardando el log en {file_path}", "info")
+        else:
+            self.log_console.stop_spill()
+            self.spill_btn.configure(text="GUARDAR LOG")
 
     def on_closing(self):
+        self.log_console.stop_spill()
+        self.stop_worker()
+        self.close_trace_reader()
+        if self.trace is not None:
+            self.trace.close()
         if self.ser and self.ser.is_open:
             self.ser.close()
         self.destroy()
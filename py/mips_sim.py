@@ -0,0 +1,481 @@
+#===========================================
+# Script: mips_sim.py
+# Description:
+#    Modelo funcional (una instrucción por paso) del MIPS de src/pipeline.
+#    MockSerial lo usa para ejecutar de verdad el programa recibido con
+#    LOAD_PROGRAM en lugar de devolver valores fijos.
+#    Sigue al RTL aun donde difiere del MIPS estándar:
+#      - $0 es un registro más: register_mem no lo fuerza a 0
+#      - no hay delay slot; JAL y JALR guardan PC+8 (isJal)
+#      - JR/JALR saltan a la dirección en bytes que tiene rs
+#      - ANDI/ORI/XORI usan el inmediato extendido con signo
+#      - LUI deja {inmediato_extendido[31:16], 16'b0}, como el ALU (0 o 0xFFFF0000)
+#      - ADD, SUB y los funct desconocidos son NOP (control_unit no los decodifica)
+#      - los opcodes desconocidos del grupo 000 escriben PC+8 en rd y detienen
+#        el procesador (señales 20'b111); los de los grupos 010/011/110/111 son NOP
+#      - memoria de datos de 128 bytes big-endian con dirección = resultado[6:0];
+#        los accesos no alineados se permiten y dan la vuelta al final
+#      - SB/SH escriben siempre 4 bytes: {24'b0, byte} / {16'b0, media palabra}
+#      - memoria de instrucciones de 128 palabras direccionada con PC[8:0]
+#    dump() devuelve los 256 bytes en el mismo formato que la debug_unit:
+#    32 registros y luego las 32 palabras de la memoria de datos.
+#===========================================
+import struct
+
+from frame_layout import PIPELINE_FIELDS, PIPELINE_STRUCT
+
+NUM_REGISTROS = 32
+BYTES_MEMORIA_DATOS = 128
+PALABRAS_MEMORIA_INSTRUCCIONES = 128
+
+_MASCARA = 0xFFFFFFFF
+_SIGNO = 0x80000000
+_REGISTROS_STRUCT = struct.Struct(">{}I".format(NUM_REGISTROS))
+
+
+def _sext16(valor):
+    return valor - 0x10000 if valor & 0x8000 else valor
+
+
+def leer_palabra(mem, direccion):
+    """Palabra big-endian en direccion[6:0]; los 4 bytes dan la vuelta al final (ram_async_single_port)."""
+    direccion &= BYTES_MEMORIA_DATOS - 1
+    if direccion <= BYTES_MEMORIA_DATOS - 4:
+        return int.from_bytes(mem[direccion:direccion + 4], "big")
+    return int.from_bytes(bytes(mem[(direccion + i) & (BYTES_MEMORIA_DATOS - 1)] for i in range(4)), "big")
+
+
+def escribir_palabra(mem, direccion, dato):
+    """Escribe los 4 bytes de dato desde direccion[6:0], dando la vuelta al final."""
+    direccion &= BYTES_MEMORIA_DATOS - 1
+    if direccion <= BYTES_MEMORIA_DATOS - 4:
+        mem[direccion:direccion + 4] = dato.to_bytes(4, "big")
+    else:
+        for i, byte in enumerate(dato.to_bytes(4, "big")):
+            mem[(direccion + i) & (BYTES_MEMORIA_DATOS - 1)] = byte
+
+
+# Manejadores de las instrucciones predecodificadas, numerados de modo que los
+# más frecuentes se prueben primero en el bucle de _run_predecodificado
+(_ADDI, _ADDU, _BNE, _BEQ, _LW, _SW, _SLL, _SUBU,
+ _AND, _OR, _XOR, _NOR, _SLT, _SLTU, _SRL, _SRA,
+ _SLLV, _SRLV, _SRAV, _ANDI, _ORI, _XORI, _SLTI, _SLTIU,
+ _CONSTANTE, _LB, _LH, _LBU, _LHU, _SB, _SH, _J,
+ _JAL, _JR, _JALR, _HALT, _HALT_LINK, _NOP) = range(38)
+
+_NOP_DECODIFICADA = (_NOP, 0, 0, 0)
+_DIRECCION = BYTES_MEMORIA_DATOS - 1
+
+# funct -> manejador para el tipo R (los que no están son NOP, como en control_unit)
+_MANEJADOR_FUNCT = {0x21: _ADDU, 0x23: _SUBU, 0x24: _AND, 0x25: _OR, 0x26: _XOR, 0x27: _NOR,
+                    0x2A: _SLT, 0x2B: _SLTU, 0x00: _SLL, 0x02: _SRL, 0x03: _SRA,
+                    0x04: _SLLV, 0x06: _SRLV, 0x07: _SRAV, 0x08: _JR, 0x09: _JALR, 0x3F: _HALT}
+# opcode[2:0] -> manejador para tipo I aritmético, loads y stores
+_MANEJADOR_INMEDIATO = (_ADDI, _ADDI, _SLTI, _SLTIU, _ANDI, _ORI, _XORI, _CONSTANTE)
+_MANEJADOR_LOAD = (_LB, _LH, _LB, _LW, _LBU, _LHU, _LB, _LW)
+_MANEJADOR_STORE = (_SB, _SH, _SB, _SW, _SB, _SB, _SB, _SB)
+
+
+def predecode(w):
+    """
+    Decodifica una palabra en (manejador, a, b, c) con los campos ya listos
+    para ejecutar: inmediatos extendidos, desplazamientos de branch en bytes,
+    índice de J ya desplazado y el resultado de LUI como constante.
+      - tipo R: (manejador, rs, rt, rd) o (manejador, rt, rd, sa) en shifts fijos
+      - tipo I: (manejador, rs, rt, inmediato)
+      - branches: (manejador, rs, rt, desplazamiento)
+      - J/JAL: (manejador, 0, 0, índice << 2)
+    """
+    op = w >> 26
+    rs = (w >> 21) & 31
+    rt = (w >> 16) & 31
+    rd = (w >> 11) & 31
+    imm = w & 0xFFFF
+    if imm & 0x8000:
+        imm |= 0xFFFF0000
+    grupo = op >> 3
+    if op == 0:
+        manejador = _MANEJADOR_FUNCT.get(w & 63, _NOP)
+        if manejador == _SLL or manejador == _SRL or manejador == _SRA:
+            sa = (w >> 6) & 31
+            if manejador == _SLL and rd == 0 and rt == 0 and sa == 0:
+                return _NOP_DECODIFICADA
+            return (manejador, rt, rd, sa)
+        return (manejador, rs, rt, rd)
+    if grupo == 0b001:
+        manejador = _MANEJADOR_INMEDIATO[op & 7]
+        if manejador == _CONSTANTE:
+            return (_CONSTANTE, 0, rt, imm & 0xFFFF0000)  # LUI del ALU
+        return (manejador, rs, rt, imm)
+    if grupo == 0b100:
+        return (_MANEJADOR_LOAD[op & 7], rs, rt, imm)
+    if grupo == 0b101:
+        return (_MANEJADOR_STORE[op & 7], rs, rt, imm)
+    if op == 4 or op == 5:
+        return (_BEQ if op == 4 else _BNE, rs, rt, (imm << 2) & _MASCARA)
+    if op == 2 or op == 3:
+        return (_J if op == 2 else _JAL, 0, 0, (w & 0x3FFFFFF) << 2)
+    if grupo == 0b000:
+        return (_HALT_LINK, 0, 0, rd)
+    return _NOP_DECODIFICADA
+
+
+class MipsSimulator:
+    """
+    Estado arquitectónico del procesador (PC, registros, memorias) y un
+    intérprete que lo avanza instrucción por instrucción.
+    registers es una lista de 32 enteros sin signo, memory un bytearray de
+    128 bytes e instructions una lista de 128 palabras.
+    """
+
+    def __init__(self, decode_cache=True):
+        # Con decode_cache cada palabra se decodifica una sola vez al cargarla
+        # (ver predecode); sin ella se decodifica en cada ejecución
+        self.decode_cache = decode_cache
+        self.reset()
+
+    def reset(self):
+        """Como o_reset_mips: borra PC, registros y ambas memorias."""
+        self.registers = [0] * NUM_REGISTROS
+        self.memory = bytearray(BYTES_MEMORIA_DATOS)
+        self.instructions = [0] * PALABRAS_MEMORIA_INSTRUCCIONES
+        self.decoded = [_NOP_DECODIFICADA] * PALABRAS_MEMORIA_INSTRUCCIONES
+        self.pc = 0
+        self.halted = False
+        self.executed = 0  # Instrucciones ejecutadas desde el último reset
+
+    def load_program(self, palabras):
+        """
+        Escribe las palabras desde la dirección 0, como WRITE_INST en la
+        debug_unit. Las posiciones siguientes conservan lo que tenían, y
+        también su decodificación: solo se vuelven a decodificar las
+        posiciones cuya palabra cambió.
+        """
+        if len(palabras) > PALABRAS_MEMORIA_INSTRUCCIONES:
+            raise ValueError("El programa tiene {} instrucciones y la memoria solo {}".format(
+                len(palabras), PALABRAS_MEMORIA_INSTRUCCIONES))
+        imem = self.instructions
+        decodificadas = self.decoded
+        for i, palabra in enumerate(palabras):
+            palabra &= _MASCARA
+            if imem[i] != palabra:
+                imem[i] = palabra
+                decodificadas[i] = predecode(palabra)
+        self.halted = False
+
+    def dump(self):
+        """Registros y memoria de datos en el formato de 256 bytes de la debug_unit."""
+        return _REGISTROS_STRUCT.pack(*self.registers) + bytes(self.memory)
+
+    def pipeline_data(self):
+        """
+        Bytes de pipeline. El modelo es funcional, así que solo IF_ID refleja
+        el estado real (instrucción en PC y PC+4); el resto va en 0.
+        """
+        campos = [0] * len(PIPELINE_FIELDS)
+        campos[0] = self.fetch(self.pc)
+        campos[1] = (self.pc + 4) & _MASCARA
+        return PIPELINE_STRUCT.pack(*campos)
+
+    def fetch(self, pc):
+        """Palabra en la dirección pc de la memoria de instrucciones (PC[8:0], big-endian)."""
+        if not pc & 3:
+            return self.instructions[(pc >> 2) & (PALABRAS_MEMORIA_INSTRUCCIONES - 1)]
+        palabra = 0
+        for i in range(4):
+            direccion = (pc + i) & 0x1FF
+            byte = self.instructions[direccion >> 2] >> (24 - 8 * (direccion & 3))
+            palabra = (palabra << 8) | (byte & 0xFF)
+        return palabra
+
+    def step(self):
+        """Ejecuta una instrucción. Devuelve 1 si se ejecutó y 0 si ya estaba detenido."""
+        return self.run(1)
+
+    def run(self, max_instrucciones=None):
+        """
+        Ejecuta hasta HALT o hasta max_instrucciones (None: sin límite).
+        Devuelve la cantidad de instrucciones ejecutadas, HALT incluido.
+        """
+        if self.halted:
+            return 0
+        limite = -1 if max_instrucciones is None else max_instrucciones
+        if self.decode_cache:
+            n = self._run_predecodificado(limite)
+        else:
+            n = self._run_decodificando(limite)
+        self.executed += n
+        return n
+
+    def _run_predecodificado(self, limite):
+        """Ejecuta desde self.decoded: en el bucle solo quedan el despacho y la operación."""
+        r = self.registers
+        mem = self.memory
+        decodificadas = self.decoded
+        fetch = self.fetch
+        M = _MASCARA
+        pc = self.pc
+        n = 0
+        while n != limite:
+            if pc & 3:
+                k, a, b, c = predecode(fetch(pc))
+            else:
+                k, a, b, c = decodificadas[(pc >> 2) & 127]
+            n += 1
+            pc = (pc + 4) & M
+            if k < 8:
+                if k == 0:              # ADDI, ADDIU
+                    r[b] = (r[a] + c) & M
+                elif k == 1:            # ADDU
+                    r[c] = (r[a] + r[b]) & M
+                elif k == 2:            # BNE
+                    if r[a] != r[b]:
+                        pc = (pc + c) & M
+                elif k == 3:            # BEQ
+                    if r[a] == r[b]:
+                        pc = (pc + c) & M
+                elif k == 4:            # LW, LWU
+                    d = (r[a] + c) & 127
+                    r[b] = int.from_bytes(mem[d:d + 4], "big") if d <= 124 else leer_palabra(mem, d)
+                elif k == 5:            # SW
+                    d = (r[a] + c) & 127
+                    if d <= 124:
+                        mem[d:d + 4] = r[b].to_bytes(4, "big")
+                    else:
+                        escribir_palabra(mem, d, r[b])
+                elif k == 6:            # SLL
+                    r[b] = (r[a] << c) & M
+                else:                   # SUBU
+                    r[c] = (r[a] - r[b]) & M
+            elif k < 16:
+                if k == 8:              # AND
+                    r[c] = r[a] & r[b]
+                elif k == 9:            # OR
+                    r[c] = r[a] | r[b]
+                elif k == 10:           # XOR
+                    r[c] = r[a] ^ r[b]
+                elif k == 11:           # NOR
+                    r[c] = ~(r[a] | r[b]) & M
+                elif k == 12:           # SLT
+                    r[c] = int((r[a] ^ _SIGNO) < (r[b] ^ _SIGNO))
+                elif k == 13:           # SLTU
+                    r[c] = int(r[a] < r[b])
+                elif k == 14:           # SRL
+                    r[b] = r[a] >> c
+                else:                   # SRA
+                    x = r[a]
+                    r[b] = ((x - 0x100000000 if x & _SIGNO else x) >> c) & M
+            elif k < 24:
+                if k == 16:             # SLLV
+                    s = r[a]
+                    r[c] = (r[b] << s) & M if s < 32 else 0
+                elif k == 17:           # SRLV
+                    r[c] = r[b] >> r[a]
+                elif k == 18:           # SRAV
+                    x = r[b]
+                    r[c] = ((x - 0x100000000 if x & _SIGNO else x) >> r[a]) & M
+                elif k == 19:           # ANDI
+                    r[b] = r[a] & c
+                elif k == 20:           # ORI
+                    r[b] = r[a] | c
+                elif k == 21:           # XORI
+                    r[b] = r[a] ^ c
+                elif k == 22:           # SLTI
+                    r[b] = int((r[a] ^ _SIGNO) < (c ^ _SIGNO))
+                else:                   # SLTIU
+                    r[b] = int(r[a] < c)
+            elif k < 31:
+                if k == 24:             # LUI (constante)
+                    r[b] = c
+                elif k <= 28:
+                    # Loads parciales: usan el byte/media palabra menos significativo
+                    # de la palabra leída en d, o sea los bytes d+3 y d+2
+                    d = (r[a] + c) & 127
+                    if k == 25:         # LB
+                        x = mem[(d + 3) & 127]
+                        r[b] = x | 0xFFFFFF00 if x & 0x80 else x
+                    elif k == 26:       # LH
+                        x = (mem[(d + 2) & 127] << 8) | mem[(d + 3) & 127]
+                        r[b] = x | 0xFFFF0000 if x & 0x8000 else x
+                    elif k == 27:       # LBU
+                        r[b] = mem[(d + 3) & 127]
+                    else:               # LHU
+                        r[b] = (mem[(d + 2) & 127] << 8) | mem[(d + 3) & 127]
+                else:
+                    # SB/SH: escriben la palabra completa con ceros arriba
+                    d = (r[a] + c) & 127
+                    dato = r[b] & (0xFF if k == 29 else 0xFFFF)
+                    if d <= 124:
+                        mem[d:d + 4] = dato.to_bytes(4, "big")
+                    else:
+                        escribir_palabra(mem, d, dato)
+            elif k == 37:               # NOP
+                pass
+            elif k == 31:               # J
+                pc = (pc & 0xF0000000) | c
+            elif k == 32:               # JAL
+                r[31] = (pc + 4) & M
+                pc = (pc & 0xF0000000) | c
+            elif k == 33:               # JR
+                pc = r[a]
+            elif k == 34:               # JALR: rs se lee antes de escribir rd
+                destino = r[a]
+                r[c] = (pc + 4) & M
+                pc = destino
+            else:
+                # HALT (y los opcodes desconocidos del grupo 000, que además
+                # escriben PC+8 en rd): el PC queda en la instrucción
+                if k == 36:
+                    r[c] = (pc + 4) & M
+                pc = (pc - 4) & M
+                self.halted = True
+                break
+        self.pc = pc
+        return n
+
+    def _run_decodificando(self, limite):
+        """Intérprete directo: extrae opcode, funct y registros de cada palabra al ejecutarla."""
+        r = self.registers
+        mem = self.memory
+        imem = self.instructions
+        fetch = self.fetch
+        M = _MASCARA
+        pc = self.pc
+        n = 0
+        while n != limite:
+            w = fetch(pc) if pc & 3 else imem[(pc >> 2) & 127]
+            n += 1
+            op = w >> 26
+            rs = (w >> 21) & 31
+            rt = (w >> 16) & 31
+            pc4 = (pc + 4) & M
+
+            if op >> 3 == 1:
+                # Tipo I aritmético/lógico: resultado en rt
+                imm = w & 0xFFFF
+                if imm & 0x8000:
+                    imm |= 0xFFFF0000
+                a = r[rs]
+                k = op & 7
+                if k <= 1:      # ADDI, ADDIU (sin excepción de overflow)
+                    r[rt] = (a + imm) & M
+                elif k == 5:    # ORI
+                    r[rt] = a | imm
+                elif k == 4:    # ANDI
+                    r[rt] = a & imm
+                elif k == 6:    # XORI
+                    r[rt] = a ^ imm
+                elif k == 2:    # SLTI
+                    r[rt] = int((a ^ _SIGNO) < (imm ^ _SIGNO))
+                elif k == 3:    # SLTIU
+                    r[rt] = int(a < imm)
+                else:           # LUI
+                    r[rt] = imm & 0xFFFF0000
+                pc = pc4
+
+            elif op == 0:
+                f = w & 63
+                rd = (w >> 11) & 31
+                a = r[rs]
+                b = r[rt]
+                if f >= 0x21:
+                    if f == 0x21:       # ADDU
+                        r[rd] = (a + b) & M
+                    elif f == 0x23:     # SUBU
+                        r[rd] = (a - b) & M
+                    elif f == 0x24:     # AND
+                        r[rd] = a & b
+                    elif f == 0x25:     # OR
+                        r[rd] = a | b
+                    elif f == 0x26:     # XOR
+                        r[rd] = a ^ b
+                    elif f == 0x27:     # NOR
+                        r[rd] = ~(a | b) & M
+                    elif f == 0x2A:     # SLT
+                        r[rd] = int((a ^ _SIGNO) < (b ^ _SIGNO))
+                    elif f == 0x2B:     # SLTU
+                        r[rd] = int(a < b)
+                    elif f == 0x3F:     # HALT: IF_ID y PC quedan congelados
+                        self.halted = True
+                        break
+                elif f <= 7:
+                    if f & 4:           # Variables: desplazamiento = rs completo
+                        s = a
+                    else:
+                        s = (w >> 6) & 31
+                    k = f & 3
+                    if k == 0:          # SLL, SLLV
+                        r[rd] = (b << s) & M if s < 32 else 0
+                    elif k == 2:        # SRL, SRLV
+                        r[rd] = b >> s
+                    elif k == 3:        # SRA, SRAV
+                        r[rd] = ((b - 0x100000000 if b & _SIGNO else b) >> s) & M
+                elif f == 8:            # JR
+                    pc = a
+                    continue
+                elif f == 9:            # JALR: rs se lee antes de escribir rd
+                    r[rd] = (pc4 + 4) & M
+                    pc = a
+                    continue
+                pc = pc4
+
+            elif op >> 4 == 2:
+                # Loads (100xxx) y stores (101xxx)
+                direccion = (r[rs] + _sext16(w & 0xFFFF)) & (BYTES_MEMORIA_DATOS - 1)
+                k = op & 7
+                if op & 8:
+                    b = r[rt]
+                    if k == 3:          # SW
+                        dato = b
+                    elif k == 1:        # SH
+                        dato = b & 0xFFFF
+                    else:               # SB (y los stores desconocidos)
+                        dato = b & 0xFF
+                    if direccion <= BYTES_MEMORIA_DATOS - 4:
+                        mem[direccion:direccion + 4] = dato.to_bytes(4, "big")
+                    else:
+                        for i, byte in enumerate(dato.to_bytes(4, "big")):
+                            mem[(direccion + i) & (BYTES_MEMORIA_DATOS - 1)] = byte
+                else:
+                    if direccion <= BYTES_MEMORIA_DATOS - 4:
+                        dato = int.from_bytes(mem[direccion:direccion + 4], "big")
+                    else:
+                        dato = int.from_bytes(bytes(mem[(direccion + i) & (BYTES_MEMORIA_DATOS - 1)]
+                                                    for i in range(4)), "big")
+                    if k == 3 or k == 7:    # LW, LWU
+                        r[rt] = dato
+                    elif k == 4:            # LBU
+                        r[rt] = dato & 0xFF
+                    elif k == 5:            # LHU
+                        r[rt] = dato & 0xFFFF
+                    elif k == 1:            # LH
+                        dato &= 0xFFFF
+                        r[rt] = dato | 0xFFFF0000 if dato & 0x8000 else dato
+                    else:                   # LB (y los loads desconocidos)
+                        dato &= 0xFF
+                        r[rt] = dato | 0xFFFFFF00 if dato & 0x80 else dato
+                pc = pc4
+
+            elif op == 4 or op == 5:
+                # BEQ/BNE: se resuelven en ID, destino = PC+4 + (inmediato << 2)
+                if (r[rs] == r[rt]) == (op == 4):
+                    pc = (pc4 + (_sext16(w & 0xFFFF) << 2)) & M
+                else:
+                    pc = pc4
+
+            elif op == 2 or op == 3:
+                # J/JAL: {PC+4[31:28], índice, 00}
+                if op == 3:
+                    r[31] = (pc4 + 4) & M
+                pc = (pc4 & 0xF0000000) | ((w & 0x3FFFFFF) << 2)
+
+            elif op < 8:
+                # Resto del grupo 000: RegWrite + isJal + halt
+                r[(w >> 11) & 31] = (pc4 + 4) & M
+                self.halted = True
+                break
+
+            else:
+                pc = pc4
+        self.pc = pc
+        return n
@@ -1,236 +1,753 @@
+import argparse
+import glob
+import hashlib
+import os
+import re
+import struct
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, compress
+from operator import itemgetter
 
-# Diccionarios con opcodes y funct para instrucciones tipo R
+from asm_cache import default_cache
+
+# Posición (bit menos significativo) de cada campo dentro de la palabra de 32 bits
+RS_SHIFT = 21
+RT_SHIFT = 16
+RD_SHIFT = 11
+SA_SHIFT = 6
+
+# Versión del ensamblador para las claves de la caché: cambia con cualquier cambio en este archivo
+with open(__file__, "rb") as _fuente:
+    ASSEMBLER_VERSION = hashlib.sha256(_fuente.read()).hexdigest()[:16]
+
+# Marcador a partir del cual convert_asm_to_coe empieza a ensamblar
+FIN_EJEMPLO = "--------fin del ejemplo-----"
+
+# Instrucciones tipo R: funct (opcode 000000)
 opcode_map = {
-    "SLL":  ("000000", "000000"),
-    "SRL":  ("000000", "000010"),
-    "SRA":  ("000000", "000011"),
-    "SLLV": ("000000", "000100"),
-    "SRLV": ("000000", "000110"),
-    "SRAV": ("000000", "000111"),
-    "ADDU": ("000000", "100001"),
-    "SUBU": ("000000", "100011"),
-    "AND":  ("000000", "100100"),
-    "OR":   ("000000", "100101"),
-    "XOR":  ("000000", "100110"),
-    "NOR":  ("000000", "100111"),
-    "SLT":  ("000000", "101010"),
-    "SLTU": ("000000", "101011"),
-    "JR":   ("000000", "001000"),
-    "JALR": ("000000", "001001"),
-    "HALT": ("000000", "111111")  # HALT como una instrucción especial
+    "SLL":  0b000000,
+    "SRL":  0b000010,
+    "SRA":  0b000011,
+    "SLLV": 0b000100,
+    "SRLV": 0b000110,
+    "SRAV": 0b000111,
+    "ADDU": 0b100001,
+    "SUBU": 0b100011,
+    "AND":  0b100100,
+    "OR":   0b100101,
+    "XOR":  0b100110,
+    "NOR":  0b100111,
+    "SLT":  0b101010,
+    "SLTU": 0b101011,
+    "JR":   0b001000,
+    "JALR": 0b001001,
+    "HALT": 0b111111   # HALT como una instrucción especial
 }
 
 # Instrucciones tipo I y J con sus opcodes
 opcode_immediate = {
-    "LB":    "100000",
-    "LH":    "100001",
-    "LW":    "100011",
-    "LWU":   "100111",
-    "LBU":   "100100",
-    "LHU":   "100101",
-    "SB":    "101000",
-    "SH":    "101001",
-    "SW":    "101011",
-    "ADDI":  "001000",
-    "ADDIU": "001001",
-    "ANDI":  "001100",
-    "ORI":   "001101",
-    "XORI":  "001110",
-    "LUI":   "001111",
-    "SLTI":  "001010",
-    "SLTIU": "001011",
-    "BEQ":   "000100",
-    "BNE":   "000101"
+    "LB":    0b100000,
+    "LH":    0b100001,
+    "LW":    0b100011,
+    "LWU":   0b100111,
+    "LBU":   0b100100,
+    "LHU":   0b100101,
+    "SB":    0b101000,
+    "SH":    0b101001,
+    "SW":    0b101011,
+    "ADDI":  0b001000,
+    "ADDIU": 0b001001,
+    "ANDI":  0b001100,
+    "ORI":   0b001101,
+    "XORI":  0b001110,
+    "LUI":   0b001111,
+    "SLTI":  0b001010,
+    "SLTIU": 0b001011,
+    "BEQ":   0b000100,
+    "BNE":   0b000101
 }
 
 opcode_jump = {
-    "J":   "000010",
-    "JAL": "000011"
+    "J":   0b000010,
+    "JAL": 0b000011
 }
 
-# Validar que un registro esté en el rango válido (0 a 31)
-def is_valid_register(reg):
-    if reg.startswith("$") and reg[1:].isdigit():
-        reg_num = int(reg[1:])
-        return 0 <= reg_num <= 31
-    return False
-
-# Validar que un valor inmediato esté en el rango válido (16 bits con signo)
-def is_valid_immediate(imm):
+# "$0".."$31" -> número de registro
+_REGISTROS = {f"${n}": n for n in range(32)}
+
+# Conversión de registros a su número de 5 bits
+def reg_to_int(reg):
+    num = _REGISTROS.get(reg)
+    if num is not None:
+        return num
+    # Formas menos comunes como "$05"
+    if reg.startswith("$") and reg[1:].isdigit() and int(reg[1:]) <= 31:
+        return int(reg[1:])
+    raise ValueError(f"Registro no válido: {reg}")
+
+# Conversión de inmediato a 16 bits (con signo)
+def imm_to_int(imm):
     try:
-        imm_num = int(imm)
-        return -32768 <= imm_num <= 32767
+        valor = int(imm)
     except ValueError:
-        return False
+        valor = None
+    if valor is None or not -32768 <= valor <= 32767:
+        raise ValueError(f"Valor inmediato no válido: {imm}")
+    return valor & 0xFFFF
 
-# Validar que un índice de salto esté en el rango válido (26 bits)
-def is_valid_instr_index(index):
+# Conversión de la cantidad de desplazamiento a 5 bits
+def shamt_to_int(sa):
     try:
-        index_num = int(index)
-        return 0 <= index_num <= 0x3FFFFFF
+        valor = int(sa)
     except ValueError:
-        return False
-
-# Conversión de registros a binario
-def reg_to_bin(reg):
-    if is_valid_register(reg):
-        reg_num = int(reg[1:])
-        return format(reg_num, '05b')  # Convertir a 5 bits binarios
-    else:
-        raise ValueError(f"Registro no válido: {reg}")
-
-# Conversión de inmediato a 16 bits
-def imm_to_bin(imm):
-    if is_valid_immediate(imm):
-        return format(int(imm) & 0xFFFF, '016b')
-    else:
-        raise ValueError(f"Valor inmediato no válido: {imm}")
+        valor = None
+    if valor is None or not 0 <= valor <= 31:
+        raise ValueError(f"Desplazamiento no válido: {sa}")
+    return valor
 
 # Conversión de índice de salto a 26 bits
-def instr_index_to_bin(index):
-    if is_valid_instr_index(index):
-        return format(int(index) & 0x3FFFFFF, '026b')
-    else:
+def instr_index_to_int(index):
+    try:
+        valor = int(index)
+    except ValueError:
+        valor = None
+    if valor is None or not 0 <= valor <= 0x3FFFFFF:
         raise ValueError(f"Índice de salto no válido: {index}")
+    return valor
+
+# Formatos de operandos, en el orden en que se escriben en el .asm.
+# Cada operando es (conversor, bit donde se ubica en la palabra).
+FORMATOS = {
+    "R":     ((reg_to_int, RD_SHIFT), (reg_to_int, RS_SHIFT), (reg_to_int, RT_SHIFT)),  # OP rd, rs, rt
+    "SHIFT": ((reg_to_int, RD_SHIFT), (reg_to_int, RT_SHIFT), (shamt_to_int, SA_SHIFT)),  # OP rd, rt, sa
+    "JR":    ((reg_to_int, RS_SHIFT),),                                                 # JR rs
+    "JALR":  ((reg_to_int, RS_SHIFT), (reg_to_int, RD_SHIFT)),                          # JALR rs, rd
+    "HALT":  (),
+    "I":     ((reg_to_int, RT_SHIFT), (reg_to_int, RS_SHIFT), (imm_to_int, 0)),         # OP rt, rs, imm
+    "LUI":   ((reg_to_int, RT_SHIFT), (imm_to_int, 0)),                                 # LUI rt, imm
+    "J":     ((instr_index_to_int, 0),),                                                # J index
+}
 
-# Procesamiento de una instrucción
-def process_instruction(instr):
-    # Eliminar comentarios de la línea
-    instr = instr.split("#")[0].strip()
-    if not instr:
-        return None
-
-    parts = instr.replace(",", "").split()
-    if not parts:
-        return None
-
-    op = parts[0]
-
-    # Caso especial para HALT
-    if op == "HALT":
-        if len(parts) != 1:
-            raise ValueError(f"Instrucción mal formateada: {instr} (HALT no requiere operandos)")
-        return "00000000000000000000000000111111"
-
-    # Validar que la instrucción tenga el número correcto de operandos
+def _formato(op):
+    if op in ("SLL", "SRL", "SRA"):
+        return "SHIFT"
+    if op in ("JR", "JALR", "HALT", "LUI"):
+        return op
     if op in opcode_map:
-        # Instrucciones tipo R
-        if op in ["JR", "JALR"]:
-            if len(parts) != 2 and len(parts) != 3:
-                raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-        elif op in ["SLL", "SRL", "SRA"]:
-            if len(parts) != 4:
-                raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-        else:
-            if len(parts) != 4:
-                raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-    elif op in opcode_immediate:
-        # Instrucciones tipo I
-        if op == "LUI":
-            if len(parts) != 3:
-                raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-        else:
-            if len(parts) != 4:
-                raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-    elif op in opcode_jump:
-        # Instrucciones tipo J
-        if len(parts) != 2:
-            raise ValueError(f"Instrucción mal formateada: {instr} (faltan operandos)")
-    else:
-        raise ValueError(f"Instrucción no reconocida: {op}")
+        return "R"
+    if op in opcode_immediate:
+        return "I"
+    return "J"
 
-    # Instrucciones tipo R
+def _palabra_base(op):
     if op in opcode_map:
-        opcode, funct = opcode_map[op]
-
-        if op == "JR":
-            rs = reg_to_bin(parts[1])
-            return opcode + rs + "00000" + "00000" + "00000" + funct
-
-        elif op == "JALR":
-            rs = reg_to_bin(parts[1])
-            rd = reg_to_bin(parts[2])
-            return opcode + rs + "00000" + rd + "00000" + funct
+        return opcode_map[op]
+    if op in opcode_immediate:
+        return opcode_immediate[op] << 26
+    return opcode_jump[op] << 26
+
+# Conversores directos (búsqueda en tabla, sin validar) para el camino rápido;
+# cualquier operando que no esté en la tabla se revalida con el conversor completo.
+_DESPLAZAMIENTOS = {str(n): n for n in range(32)}
+_CONVERSORES_RAPIDOS = {
+    reg_to_int: _REGISTROS.__getitem__,
+    shamt_to_int: _DESPLAZAMIENTOS.__getitem__,
+}
 
-        elif op in ["SLL", "SRL", "SRA"]:
-            rd = reg_to_bin(parts[1])
-            rt = reg_to_bin(parts[2])
-            sa = format(int(parts[3]), '05b')
-            return opcode + "00000" + rt + rd + sa + funct
+def _compilar(palabra, operandos):
+    """Arma la función que codifica los tokens ya separados de un mnemónico."""
+    conv = [(_CONVERSORES_RAPIDOS.get(c, c), shift) for c, shift in operandos]
+    if len(conv) == 3:
+        (a, sa), (b, sb), (c, sc) = conv
+        return lambda p: palabra | a(p[1]) << sa | b(p[2]) << sb | c(p[3]) << sc
+    if len(conv) == 2:
+        (a, sa), (b, sb) = conv
+        return lambda p: palabra | a(p[1]) << sa | b(p[2]) << sb
+    if len(conv) == 1:
+        (a, sa), = conv
+        return lambda p: palabra | a(p[1]) << sa
+    return lambda p: palabra
+
+# Tabla precalculada: mnemónico -> (palabra con opcode/funct, operandos, cantidades de tokens aceptadas)
+TABLA_INSTRUCCIONES = {}
+# Camino rápido: mnemónico -> (cantidad de tokens, codificador)
+_CODIFICADORES = {}
+for _op in (*opcode_map, *opcode_immediate, *opcode_jump):
+    _operandos = FORMATOS[_formato(_op)]
+    _cantidades = (len(_operandos) + 1,)
+    if _op == "JR":
+        _cantidades = (2, 3)   # Un segundo operando de JR se ignora
+    TABLA_INSTRUCCIONES[_op] = (_palabra_base(_op), _operandos, _cantidades)
+    _CODIFICADORES[_op] = (len(_operandos) + 1, _compilar(_palabra_base(_op), _operandos))
+
+# Ensamblado validando cada operando (mensajes de error por línea)
+def _encode_validando(instr, parts):
+    op = parts[0]
+    entrada = TABLA_INSTRUCCIONES.get(op)
+    if entrada is None:
+        raise ValueError(f"Instrucción no reconocida: {op}")
 
-        else:
-            rd = reg_to_bin(parts[1])
-            rs = reg_to_bin(parts[2])
-            rt = reg_to_bin(parts[3])
-            return opcode + rs + rt + rd + "00000" + funct
+    palabra, operandos, cantidades = entrada
+    # Validar que la instrucción tenga el número correcto de operandos
+    if len(parts) not in cantidades:
+        motivo = "HALT no requiere operandos" if op == "HALT" else "faltan operandos"
+        raise ValueError(f"Instrucción mal formateada: {instr.split('#', 1)[0].strip()} ({motivo})")
+
+    for i, (convertir, shift) in enumerate(operandos, start=1):
+        palabra |= convertir(parts[i]) << shift
+    return palabra
+
+# Ensamblado de los tokens de una instrucción: camino rápido y, si falla, validando
+def _encode_partes(instr, parts):
+    codificador = _CODIFICADORES.get(parts[0])
+    if codificador is not None and len(parts) == codificador[0]:
+        try:
+            return codificador[1](parts)
+        except (KeyError, ValueError):
+            pass
+    return _encode_validando(instr, parts)
 
-    # Instrucciones tipo I
-    elif op in opcode_immediate:
-        opcode = opcode_immediate[op]
+# Ensamblado de una instrucción a una palabra de 32 bits
+def encode_instruction(instr):
+    # Eliminar comentarios de la línea
+    parts = instr.split("#", 1)[0].replace(",", "").split()
+    if not parts:
+        return None
+    return _encode_partes(instr, parts)
 
-        if op == "LUI":
-            rt = reg_to_bin(parts[1])
-            imm = imm_to_bin(parts[2])
-            return opcode + "00000" + rt + imm
+# Procesamiento de una instrucción a su forma binaria de 32 caracteres
+def process_instruction(instr):
+    palabra = encode_instruction(instr)
+    return None if palabra is None else format(palabra, '032b')
+
+# Ensamblar un programa completo (texto). Devuelve (palabras, errores).
+# Con skip_header se ignora todo hasta el marcador FIN_EJEMPLO (formato de input.asm).
+# Si el programa usa etiquetas ("bucle:") o constantes (".equ N, 10") se ensambla
+# en dos pasadas; BEQ/BNE y J/JAL aceptan una etiqueta en lugar del número.
+def assemble(source, skip_header=True):
+    lineas = source.splitlines()
+    inicio = 0
+    if skip_header:
+        # Ignorar todo antes de "--------fin del ejemplo-----" (incluido el marcador)
+        inicio = next((n + 1 for n, linea in enumerate(lineas) if FIN_EJEMPLO in linea), len(lineas))
+
+    # Con etiquetas o directivas hacen falta las dos pasadas
+    if (":" in source or "." in source) and _define_simbolos(lineas, inicio):
+        return _assemble_dos_pasadas(lineas, skip_header)
+
+    palabras = []
+    errores = []
+    agregar = palabras.append
+    codificadores = _CODIFICADORES
+    # Las comas se quitan una sola vez sobre todo el texto; no cambian la cantidad de líneas
+    tokens_por_linea = source.replace(",", "").splitlines()
+
+    for line_num in range(inicio, len(lineas)):
+        parts = tokens_por_linea[line_num].split()
+        # Ignorar líneas vacías y comentarios
+        if not parts or parts[0][0] == "#":
+            continue
+        codificador = codificadores.get(parts[0])
+        if codificador is not None and len(parts) == codificador[0]:
+            try:
+                agregar(codificador[1](parts))
+                continue
+            except (KeyError, ValueError):
+                pass
+        # Comentario al final, operando fuera de tabla o error: camino validando
+        instr = lineas[line_num].strip()
+        if skip_header and FIN_EJEMPLO in instr:
+            continue
+        try:
+            palabra = encode_instruction(instr)
+        except ValueError as e:
+            errores.append(f"Error en la línea {line_num + 1}: {e}")
+            continue
+        if palabra is not None:
+            agregar(palabra)
+
+    return palabras, errores
+
+# Etiqueta al comienzo de una línea ("bucle:") y nombre válido de símbolo
+_ETIQUETA = re.compile(r"([A-Za-z_][A-Za-z0-9_.]*)\s*:")
+_NOMBRE = re.compile(r"[A-Za-z_][A-Za-z0-9_.]*$")
+
+# Operando que puede ser una etiqueta: mnemónico -> (posición del token, relativo a PC+4)
+_DESTINOS = {"BEQ": (3, True), "BNE": (3, True), "J": (1, False), "JAL": (1, False)}
+
+def _definir(nombre, valor, tabla, etiquetas, constantes):
+    if nombre in etiquetas or nombre in constantes:
+        raise ValueError(f"Símbolo duplicado: {nombre}")
+    tabla[nombre] = valor
+
+def _directiva(texto, etiquetas, constantes):
+    # .equ NOMBRE, valor   (el valor puede ser otra constante ya definida)
+    parts = texto.replace(",", " ").split()
+    if parts[0] != ".equ":
+        raise ValueError(f"Directiva no reconocida: {parts[0]}")
+    if len(parts) != 3 or not _NOMBRE.match(parts[1]):
+        raise ValueError(f"Directiva mal formateada: {texto} (se espera .equ NOMBRE, valor)")
+    valor = constantes.get(parts[2], parts[2])
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ValueError(f"Valor de constante no válido: {parts[2]}") from None
+    _definir(parts[1], str(valor), constantes, etiquetas, constantes)
+
+# Líneas a ensamblar de un iterable de líneas (lista o archivo abierto, leído de a una):
+# genera (número de línea, texto sin comentario) salteando el encabezado y las líneas vacías
+def _lineas_fuente(lineas, skip_header=False):
+    start_processing = not skip_header
+    for line_num, linea in enumerate(lineas, start=1):
+        # Ignorar todo antes de "--------fin del ejemplo-----" (y el marcador)
+        if skip_header and FIN_EJEMPLO in linea:
+            start_processing = True
+            continue
+        if start_processing:
+            texto = linea.split("#", 1)[0].strip()
+            if texto:
+                yield line_num, texto
+
+# Si alguna línea (sin su comentario) empieza con una etiqueta o una directiva,
+# igual que las separa _definir_simbolos; un ":" o un "." en un comentario no cuenta
+def _define_simbolos(lineas, inicio=0):
+    for line_num in range(inicio, len(lineas)):
+        texto = lineas[line_num].split("#", 1)[0].strip()
+        if texto.startswith(".") or ":" in texto and _ETIQUETA.match(texto):
+            return True
+    return False
 
+# Quita las etiquetas del comienzo de una línea. Devuelve (nombres, resto de la línea).
+def _separar_etiquetas(texto):
+    if ":" not in texto:
+        return (), texto
+    nombres = []
+    etiqueta = _ETIQUETA.match(texto)
+    while etiqueta:
+        nombres.append(etiqueta.group(1))
+        texto = texto[etiqueta.end():].lstrip()
+        etiqueta = _ETIQUETA.match(texto)
+    return nombres, texto
+
+# Primera pasada como generador: registra etiquetas y constantes y genera
+# (número de línea, instrucción) en orden de dirección
+def _definir_simbolos(fuente, etiquetas, constantes, on_error):
+    pc = 0
+    for line_num, texto in fuente:
+        nombres, texto = _separar_etiquetas(texto)
+        for nombre in nombres:
+            try:
+                _definir(nombre, pc, etiquetas, etiquetas, constantes)
+            except ValueError as e:
+                on_error(line_num, str(e))
+        if texto.startswith("."):
+            try:
+                _directiva(texto, etiquetas, constantes)
+            except ValueError as e:
+                on_error(line_num, str(e))
+        elif texto:
+            pc += 1
+            yield line_num, texto
+
+# Relectura para la segunda pasada en streaming: solo quita etiquetas y directivas
+def _quitar_simbolos(fuente):
+    for line_num, texto in fuente:
+        texto = _separar_etiquetas(texto)[1]
+        if texto and not texto.startswith("."):
+            yield line_num, texto
+
+# Primera pasada: ubicar etiquetas y constantes sin ensamblar.
+# Devuelve (instrucciones, etiquetas, constantes, errores), donde instrucciones es
+# una lista de (número de línea, texto) cuya posición es la dirección (en palabras),
+# etiquetas mapea nombre -> dirección y constantes nombre -> valor (texto decimal).
+def first_pass(lineas, skip_header=False):
+    etiquetas = {}
+    constantes = {}
+    errores = []
+    instrucciones = list(_definir_simbolos(_lineas_fuente(lineas, skip_header), etiquetas, constantes,
+                                           lambda line_num, mensaje: errores.append((line_num, mensaje))))
+    return instrucciones, etiquetas, constantes, errores
+
+# Reemplaza constantes y etiquetas en los tokens de la instrucción ubicada en 'pc' (en palabras)
+def _resolver_simbolos(parts, pc, etiquetas, constantes):
+    for i in range(1, len(parts)):
+        valor = constantes.get(parts[i])
+        if valor is not None:
+            parts[i] = valor
+
+    destino = _DESTINOS.get(parts[0])
+    # Con operandos de más o de menos se deja el error de formato al ensamblador
+    if destino is None or len(parts) != _CODIFICADORES[parts[0]][0]:
+        return
+    i, relativo = destino
+    objetivo = etiquetas.get(parts[i])
+    if objetivo is not None:
+        # Los saltos condicionales son relativos a PC+4; J/JAL llevan el índice de instrucción
+        parts[i] = str(objetivo - (pc + 1) if relativo else objetivo)
+    elif _NOMBRE.match(parts[i]):
+        raise ValueError(f"Etiqueta no definida: {parts[i]}")
+
+# Segunda pasada como generador: resuelve símbolos (búsquedas O(1) en los
+# diccionarios) y genera la palabra de cada instrucción
+def _codificar(instrucciones, etiquetas, constantes, on_error):
+    hay_simbolos = bool(etiquetas or constantes)
+    for pc, (line_num, texto) in enumerate(instrucciones):
+        parts = texto.replace(",", "").split()
+        try:
+            if hay_simbolos:
+                _resolver_simbolos(parts, pc, etiquetas, constantes)
+            palabra = _encode_partes(texto, parts)
+        except ValueError as e:
+            on_error(line_num, str(e))
+            continue
+        yield palabra
+
+def _assemble_dos_pasadas(lineas, skip_header):
+    instrucciones, etiquetas, constantes, errores = first_pass(lineas, skip_header)
+    palabras = list(_codificar(instrucciones, etiquetas, constantes,
+                               lambda line_num, mensaje: errores.append((line_num, mensaje))))
+    errores.sort(key=lambda error: error[0])
+    return palabras, [f"Error en la línea {n}: {mensaje}" for n, mensaje in errores]
+
+# Análisis de una línea que no depende del resto del programa:
+# (etiquetas, tipo, texto, tokens, posibles símbolos, es instrucción, define símbolos, resultado)
+# tipo es "instruccion", "directiva" o None; posibles símbolos son los operandos que
+# empiezan con letra o "_"; resultado es la palabra (o el mensaje de error) de las
+# instrucciones sin símbolos, y None en las demás líneas.
+_VACIA = ((), None, "", (), (), 0, False, None)
+_ES_INSTRUCCION = itemgetter(5)
+_DEFINE_SIMBOLOS = itemgetter(6)
+_RESULTADO = itemgetter(7)
+
+def _analizar_linea(linea):
+    texto = linea.split("#", 1)[0].strip()
+    if not texto:
+        return _VACIA
+    nombres, texto = _separar_etiquetas(texto)
+    nombres = tuple(nombres)
+    if not texto:
+        return (nombres, None, "", (), (), 0, True, None)
+    if texto.startswith("."):
+        return (nombres, "directiva", texto, (), (), 0, True, None)
+    parts = tuple(texto.replace(",", "").split())
+    simbolos = tuple(token for token in parts[1:] if token[0].isalpha() or token[0] == "_")
+    resultado = None if simbolos else _codificar_o_error(texto, list(parts))
+    return (nombres, "instruccion", texto, parts, simbolos, 1, bool(nombres), resultado)
+
+def _codificar_o_error(texto, parts, pc=0, etiquetas=None, constantes=None):
+    try:
+        if etiquetas is not None:
+            _resolver_simbolos(parts, pc, etiquetas, constantes)
+        return _encode_partes(texto, parts)
+    except ValueError as e:
+        return str(e)
+
+class IncrementalAssembler:
+    """
+    Ensamblador para el editor de la GUI. Recuerda el análisis y la palabra
+    (o el error) de cada línea de la conversión anterior, así que al volver a
+    convertir solo se analizan y codifican las líneas cuyo texto cambió; el
+    resto del recorrido se hace con map/compress sobre esos resultados.
+    Las líneas que usan etiquetas o constantes se guardan junto con su
+    dirección y el valor de esos símbolos: si una etiqueta se mueve, solo se
+    recalculan las líneas que la usan. El resultado es el mismo que el de
+    assemble en dos pasadas.
+    """
+
+    def __init__(self):
+        # Ambos se rehacen en cada update con lo que queda en el texto actual
+        self._lineas = {}     # texto de la línea -> _analizar_linea(texto)
+        self._simbolicas = {} # (texto, pc, sin símbolos, valores de los símbolos) -> palabra o mensaje de error
+        self.reused = 0       # Instrucciones reutilizadas / codificadas en la última conversión
+        self.encoded = 0
+
+    def update(self, source):
+        """Ensambla el texto completo del editor. Devuelve (palabras, errores)."""
+        lineas = source.splitlines()
+        infos = list(map(self._lineas.get, lineas))
+        self.encoded = 0
+        i = 0
+        try:
+            while True:
+                i = infos.index(None, i)   # Líneas nuevas o modificadas
+                infos[i] = self._lineas[lineas[i]] = _analizar_linea(lineas[i])
+                self.encoded += infos[i][5]
+        except ValueError:
+            pass
+        # Solo se recuerdan las líneas del texto actual (el editor no acumula ediciones viejas)
+        self._lineas = dict(zip(lineas, infos))
+
+        # Primera pasada: dirección de cada línea y definición de símbolos
+        errores = []
+        etiquetas = {}
+        constantes = {}
+        es_instruccion = list(map(_ES_INSTRUCCION, infos))
+        pcs = list(accumulate(es_instruccion, initial=0))
+        for i in compress(range(len(infos)), map(_DEFINE_SIMBOLOS, infos)):
+            nombres, tipo, texto = infos[i][:3]
+            for nombre in nombres:
+                try:
+                    _definir(nombre, pcs[i], etiquetas, etiquetas, constantes)
+                except ValueError as e:
+                    errores.append((i + 1, str(e)))
+            if tipo == "directiva":
+                try:
+                    _directiva(texto, etiquetas, constantes)
+                except ValueError as e:
+                    errores.append((i + 1, str(e)))
+
+        # Segunda pasada: las instrucciones sin símbolos ya traen su resultado
+        instrucciones = list(compress(infos, es_instruccion))
+        resultados = list(map(_RESULTADO, instrucciones))
+        simbolicas_previas = self._simbolicas
+        simbolicas = {}
+        # Igual que _codificar: sin símbolos definidos no se resuelve nada y el
+        # error de la línea es el del ensamblador (p. ej. el registro antes que la etiqueta)
+        tablas = (etiquetas, constantes) if etiquetas or constantes else (None, None)
+        pc = 0
+        try:
+            while True:
+                pc = resultados.index(None, pc)
+                _, _, texto, parts, simbolos = instrucciones[pc][:5]
+                clave = (texto, pc, tablas[0] is None,
+                         tuple(etiquetas.get(s, constantes.get(s)) for s in simbolos))
+                resultado = simbolicas_previas.get(clave)
+                if resultado is None:
+                    resultado = _codificar_o_error(texto, list(parts), pc, *tablas)
+                    self.encoded += 1
+                simbolicas[clave] = resultados[pc] = resultado
+        except ValueError:
+            pass
+        self._simbolicas = simbolicas
+        self.reused = len(resultados) - self.encoded
+
+        if str in set(map(type, resultados)):
+            numeros = compress(range(1, len(infos) + 1), es_instruccion)
+            palabras = []
+            for line_num, resultado in zip(numeros, resultados):
+                if type(resultado) is str:
+                    errores.append((line_num, resultado))
+                else:
+                    palabras.append(resultado)
         else:
-            rt = reg_to_bin(parts[1])
-            rs = reg_to_bin(parts[2])
-            imm = imm_to_bin(parts[3])
-            return opcode + rs + rt + imm
+            palabras = resultados
 
-    # Instrucciones tipo J
-    elif op in opcode_jump:
-        opcode = opcode_jump[op]
-        instr_index = instr_index_to_bin(parts[1])
-        return opcode + instr_index
+        errores.sort(key=lambda error: error[0])
+        return palabras, [f"Error en la línea {n}: {mensaje}" for n, mensaje in errores]
 
-    return None
+# Texto .coe: una palabra binaria por línea separadas por "," y terminado en ";"
+def format_coe(palabras):
+    if not palabras:
+        return ""
+    return ",\n".join([format(p, '032b') for p in palabras]) + ";\n"
 
-# Convertir archivo .asm a .coe
-def convert_asm_to_coe(input_file, output_file):
+def write_coe(palabras, output_file):
+    with open(output_file, "w") as coe_file:
+        coe_file.write(format_coe(palabras))
+
+# Escritura incremental del .coe: cada palabra se escribe al llegar la siguiente,
+# para saber si termina en "," o en ";". Devuelve la cantidad de palabras.
+def _escribir_coe(palabras, coe_file):
+    cantidad = 0
+    anterior = None
+    for palabra in palabras:
+        if anterior is not None:
+            coe_file.write(format(anterior, '032b') + ",\n")
+        anterior = palabra
+        cantidad += 1
+    if anterior is not None:
+        coe_file.write(format(anterior, '032b') + ";\n")
+    return cantidad
+
+# Imagen binaria: palabras de 4 bytes big-endian, igual que se envían en LOAD_PROGRAM
+def _escribir_imagen(palabras, bin_file):
+    cantidad = 0
+    for palabra in palabras:
+        bin_file.write(_PALABRA.pack(palabra))
+        cantidad += 1
+    return cantidad
+
+_PALABRA = struct.Struct(">I")
+
+def _es_imagen(output_file):
+    return output_file.endswith(".bin")
+
+def _imprimir_error(line_num, mensaje):
+    print(f"Error en la línea {line_num}: {mensaje}")
+
+# Ensamblado en streaming: el .asm se lee de a una línea (dos veces, una por pasada),
+# y cada palabra se escribe apenas se codifica, así que la memoria usada no depende
+# del largo del programa (solo de la cantidad de etiquetas y constantes). Los errores
+# se informan con on_error(número de línea, mensaje) a medida que aparecen.
+# Si output_file termina en .bin se escribe una imagen binaria en lugar del .coe.
+# Devuelve la cantidad de palabras escritas.
+def stream_asm(input_file, output_file, on_error=_imprimir_error, skip_header=True):
+    etiquetas = {}
+    constantes = {}
     with open(input_file, "r") as asm_file:
-        instructions = asm_file.readlines()
-
-    binary_instructions = []
-    start_processing = False  # Bandera para indicar cuándo empezar a procesar
+        for _ in _definir_simbolos(_lineas_fuente(asm_file, skip_header), etiquetas, constantes, on_error):
+            pass
+
+    imagen = _es_imagen(output_file)
+    with open(input_file, "r") as asm_file, open(output_file, "wb" if imagen else "w") as salida:
+        instrucciones = _quitar_simbolos(_lineas_fuente(asm_file, skip_header))
+        palabras = _codificar(instrucciones, etiquetas, constantes, on_error)
+        return (_escribir_imagen if imagen else _escribir_coe)(palabras, salida)
+
+# Igual que assemble, pero consultando primero la caché en disco (asm_cache):
+# un texto ya ensamblado con esta versión del ensamblador no se vuelve a procesar.
+# Escribe en el directorio de la caché (~/.cache/mips_fpga/asm o MIPS_ASM_CACHE);
+# convert_asm_to_coe, assemble_batch y la línea de comandos solo la usan si se pide.
+def assemble_cached(source, skip_header=True, cache=None):
+    cache = cache or default_cache()
+    clave = cache.key(source, ASSEMBLER_VERSION, skip_header)
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = assemble(source, skip_header)
+        cache.put(clave, *resultado)
+    return resultado
+
+# Convertir archivo .asm a .coe (o a una imagen binaria si output_file termina en .bin).
+# El modo streaming no usa la caché: no tiene el texto completo para calcular la clave.
+def convert_asm_to_coe(input_file, output_file, stream=False, cache=False):
+    if stream:
+        stream_asm(input_file, output_file)
+        return
 
-    for line_num, instr in enumerate(instructions, start=1):
-        instr = instr.strip()
-
-        # Ignorar todo antes de "--------fin del ejemplo-----"
-        if "--------fin del ejemplo-----" in instr:
-            start_processing = True
-            continue  # Saltar la línea del marcador
+    with open(input_file, "r") as asm_file:
+        source = asm_file.read()
+    palabras, errores = assemble_cached(source) if cache else assemble(source)
 
-        # Ignorar la línea específica con el mensaje
-        if "# A partir de aquí, escribe las instrucciones que deseas convertir:" in instr:
-            continue  # Saltar esta línea
+    for error in errores:
+        print(error)
 
-        # Ignorar comentarios y líneas vacías
-        if not start_processing or not instr or instr.startswith("#"):
-            continue
+    if _es_imagen(output_file):
+        with open(output_file, "wb") as bin_file:
+            _escribir_imagen(palabras, bin_file)
+    else:
+        write_coe(palabras, output_file)
 
-        # Procesar solo si la bandera está activada
-        try:
-            binary_instr = process_instruction(instr)
-            if binary_instr:
-                binary_instructions.append(binary_instr)
-        except ValueError as e:
-            print(f"Error en la línea {line_num}: {e}")
+# Ensamblado de un archivo para el modo por lotes (se ejecuta en un proceso del pool).
+# Si el archivo no tiene el marcador "fin del ejemplo" se ensambla completo.
+# Devuelve (entrada, salida, palabras, errores, segundos).
+def _ensamblar_archivo(input_file, output_file, stream, cache):
+    inicio = time.perf_counter()
+    with open(input_file, "r") as asm_file:
+        skip_header = any(FIN_EJEMPLO in linea for linea in asm_file)
 
-    with open(output_file, "w") as coe_file:
-        # Escribir las instrucciones binarias directamente
-        for i, bin_instr in enumerate(binary_instructions):
-            coe_file.write(bin_instr + (",\n" if i < len(binary_instructions) - 1 else ";\n"))
+    if stream:
+        errores = []
+        palabras = stream_asm(input_file, output_file, skip_header=skip_header,
+                              on_error=lambda n, mensaje: errores.append(f"Error en la línea {n}: {mensaje}"))
+    else:
+        with open(input_file, "r") as asm_file:
+            source = asm_file.read()
+        codigo, errores = assemble_cached(source, skip_header) if cache else assemble(source, skip_header)
+        palabras = len(codigo)
+        if _es_imagen(output_file):
+            with open(output_file, "wb") as bin_file:
+                _escribir_imagen(codigo, bin_file)
+        else:
+            write_coe(codigo, output_file)
+    return input_file, output_file, palabras, errores, time.perf_counter() - inicio
+
+# Tarea del pool: además del resultado devuelve los contadores de caché del archivo,
+# porque los procesos del pool no llegan a escribir stats.json (terminan sin atexit)
+def _ensamblar_en_lote(input_file, output_file, stream, cache):
+    resultado = _ensamblar_archivo(input_file, output_file, stream, cache)
+    return resultado, default_cache().take_counters() if cache else None
+
+# Archivos .asm de un directorio o de un patrón glob ("tests/*.asm"), ordenados
+def _archivos_lote(patrones):
+    archivos = set()
+    for patron in patrones:
+        if os.path.isdir(patron):
+            patron = os.path.join(patron, "*.asm")
+        archivos.update(glob.glob(patron))
+    return sorted(archivos)
+
+# Ensambla muchos .asm en paralelo con un ProcessPoolExecutor; cada salida se escribe
+# junto a su .asm con la extensión 'ext' (.coe o .bin). Imprime el reporte por archivo
+# y el total. Devuelve la lista de resultados de _ensamblar_archivo.
+def assemble_batch(patrones, jobs=None, ext=".coe", stream=False, cache=False):
+    entradas = _archivos_lote(patrones)
+    if not entradas:
+        print("No se encontraron archivos .asm en: " + ", ".join(patrones))
+        return []
+    salidas = [os.path.splitext(entrada)[0] + ext for entrada in entradas]
+
+    jobs = jobs or os.cpu_count() or 1
+    # Varios archivos por tarea para amortizar la comunicación con los procesos
+    chunksize = max(1, len(entradas) // (4 * jobs))
+
+    if cache:
+        default_cache().flush()  # Los procesos del pool no deben heredar contadores pendientes
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        resultados = []
+        for resultado, contadores in pool.map(_ensamblar_en_lote, entradas, salidas, [stream] * len(entradas),
+                                              [cache] * len(entradas), chunksize=chunksize):
+            resultados.append(resultado)
+            if contadores:
+                default_cache().add_counters(contadores)
+    total = time.perf_counter() - inicio
+    if cache:
+        default_cache().flush()
+
+    for entrada, salida, palabras, errores, segundos in resultados:
+        estado = f"{len(errores)} errores" if errores else "OK"
+        print(f"{entrada} -> {salida}: {palabras} instrucciones, {estado} ({segundos * 1000:.1f} ms)")
+        for error in errores:
+            print(f"    {error}")
+
+    con_errores = sum(1 for resultado in resultados if resultado[3])
+    print(f"\n{len(resultados)} archivos, {sum(r[2] for r in resultados)} instrucciones, "
+          f"{sum(len(r[3]) for r in resultados)} errores en {con_errores} archivos")
+    print(f"Tiempo total: {total:.2f} s (suma por archivo: {sum(r[4] for r in resultados):.2f} s)")
+    return resultados
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
+    parser = argparse.ArgumentParser(
+        description="Ensamblador MIPS a .coe (o imagen binaria .bin)",
+        usage="python mips_to_bin.py [--stream] input.asm output.coe|output.bin\n"
+              "       python mips_to_bin.py --batch DIRECTORIO|PATRÓN... [--jobs N] [--ext .coe|.bin] [--stream]")
+    parser.add_argument("archivos", nargs="*")
+    parser.add_argument("--stream", action="store_true",
+                        help="leer y escribir de a una línea, con memoria acotada")
+    parser.add_argument("--batch", action="store_true",
+                        help="ensamblar todos los .asm de los directorios o patrones glob indicados")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="procesos del modo por lotes (por defecto, uno por CPU)")
+    parser.add_argument("--ext", default=".coe", choices=(".coe", ".bin"),
+                        help="extensión de las salidas del modo por lotes")
+    parser.add_argument("--cache", action="store_true",
+                        help="reutilizar programas ya ensamblados de la caché en disco "
+                             "(~/.cache/mips_fpga/asm, o el directorio de MIPS_ASM_CACHE)")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="mostrar aciertos, fallos y tamaño de la caché")
+    args = parser.parse_args()
+
+    codigo_salida = 0
+    if args.batch:
+        resultados = assemble_batch(args.archivos, jobs=args.jobs, ext=args.ext,
+                                    stream=args.stream, cache=args.cache)
+        codigo_salida = 1 if not resultados or any(r[3] for r in resultados) else 0
+    elif len(args.archivos) == 2:
+        input_file, output_file = args.archivos
+        convert_asm_to_coe(input_file, output_file, stream=args.stream, cache=args.cache)
+        print(f"Conversión completada. Archivo guardado en {output_file}")
+    elif not (args.cache_stats and not args.archivos):
         print("Uso: python mips_to_bin.py input.asm output.coe")
         sys.exit(1)
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    convert_asm_to_coe(input_file, output_file)
-    print(f"Conversión completada. Archivo guardado en {output_file}")
+    if args.cache_stats:
+        cache = default_cache()
+        stats = cache.stats()
+        consultas = stats["hits"] + stats["misses"]
+        print(f"Caché {cache.directorio}: {stats['hits']} aciertos, {stats['misses']} fallos"
+              f" ({100 * stats['hits'] / consultas if consultas else 0:.0f}% de aciertos), "
+              f"{stats['bytes_read']} bytes leídos, {stats['bytes_written']} bytes escritos, "
+              f"{stats['entries']} entradas ({stats['size_bytes']} bytes), {stats['evictions']} desalojadas")
+    sys.exit(codigo_salida)
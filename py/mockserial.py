@@ -1,227 +1,279 @@
+#===========================================
+# Script: mockserial.py
+# Description:
+#    Sustituto de serial.Serial que responde como la debug_unit sin la placa.
+#    Los bytes escritos se interpretan como en la FSM de debug_unit.v:
+#      - LOAD_PROGRAM (0x04): las palabras de 4 bytes siguientes se guardan en
+#        la memoria de instrucciones hasta recibir HALT
+#      - RUN (0x03) / STEP (0x05): ejecutan el programa y responden con los 256
+#        bytes de registros y memoria más los 47 bytes de pipeline; al llegar a
+#        HALT el procesador se reinicia
+#      - RESET (0x0C): borra procesador y memorias
+#    El programa se ejecuta en uno de dos modelos (parámetro modelo):
+#      - "pipeline": pipeline_sim, ciclo a ciclo; STEP avanza un ciclo y la
+#        trama de pipeline es idéntica a la del hardware
+#      - "funcional": mips_sim, una instrucción por STEP y RUN mucho más rápido;
+#        de la trama de pipeline solo IF_ID es real
+#      - "bloques": block_sim, igual que "funcional" pero RUN ejecuta bloques
+#        básicos traducidos a Python; para programas largos
+#    A diferencia del hardware, LOAD_PROGRAM y RESET responden con un ACK (0x01);
+#    con ack=False se comporta exactamente como la placa y no lo envía.
+#    Con baudrate se activa el modo temporizado: los bytes viajan a esa
+#    velocidad con el encuadre 8N1 en ambos sentidos y cada estado de la FSM
+#    consume sus ciclos de reloj (FRECUENCIA_RELOJ), así que read() espera lo
+#    que esperaría con la placa y flush() lo que tarda en salir lo escrito:
+#      - comando: IDLE -> START -> estado del comando, 2 ciclos
+#      - LOAD_PROGRAM: 1 ciclo por byte y 1 más por palabra (WRITE_INST)
+#      - STEP: 1 ciclo; RUN: un ciclo por paso del modelo (en "pipeline" son
+#        ciclos reales; en los modelos funcionales, instrucciones)
+#      - respuesta: la FSM carga la FIFO de TX (32 bytes) de a un byte por
+#        ciclo y queda ocupada hasta poner el último; luego RETURN y RESET/IDLE
+#    Los comandos que llegan mientras la FSM está ocupada esperan en la FIFO
+#    de RX (no se modela su desborde).
+#===========================================
+import time
+from bisect import bisect_right
+
+from block_sim import BlockSimulator
+from debug_link import ACK, CMD_LOAD, CMD_RESET, CMD_RUN, CMD_STEP, HALT_INSTR, tiempo_caracter
+from mips_sim import MipsSimulator
+from pipeline_sim import PipelineSimulator
+
+MODELOS = {
+    "pipeline": PipelineSimulator,
+    "funcional": MipsSimulator,
+    "bloques": BlockSimulator,
+}
+
+# Un RUN sin HALT colgaría a la placa; el mock se detiene tras este límite de
+# pasos del modelo (ciclos o instrucciones)
+MAX_INSTRUCCIONES = 50_000_000
+
+# Reloj de la debug_unit y el pipeline (clk_wiz_0 en toplevel.v) y FIFO de TX (FIFO_W = 5)
+FRECUENCIA_RELOJ = 50_000_000
+BYTES_FIFO_TX = 32
+CICLOS_COMANDO = 2
+CICLOS_FIN_RESPUESTA = 2
+# Tamaño de los tramos de pending_response()
+BYTES_TRAMO = 16
+
+
 class MockSerial:
-    def __init__(self):
+    def __init__(self, verbose=True, max_instrucciones=MAX_INSTRUCCIONES, modelo="pipeline",
+                 ack=True, baudrate=None):
+        if modelo not in MODELOS:
+            raise ValueError("Modelo desconocido: {} (opciones: {})".format(modelo, ", ".join(MODELOS)))
+        self.verbose = verbose     # Si es False no se imprime cada operación
+        self.max_instrucciones = max_instrucciones
+        self.ack = ack             # Responder ACK a LOAD_PROGRAM y RESET
         self.buffer = bytearray()  # Buffer para almacenar datos enviados/recepcionados
         self.response_buffer = bytearray()  # Buffer para simular respuestas de la FPGA
-        self.registers = [0] * 32  # Simulación de los 32 registros
-        self.memory = [0] * 128    # Simulación de 128 bytes de memoria
-        self.pipeline = [0] * 47   # Simulación de los registros de pipeline
+        self.cpu = MODELOS[modelo]()  # Modelo que ejecuta el programa cargado
         self.is_open = True
-        
-        # Inicializar algunos registros con valores para pruebas
-        self.registers[1] = 0x12345678
-        self.registers[2] = 0x00000020
-        self.registers[3] = 0x00000030
-        self.registers[5] = 0x00000050
-        self.registers[7] = 0x00FF0000
-        
-        # Inicializar algunas posiciones de memoria
-        self.memory[0] = 0xAABBCCDD
-        self.memory[4] = 0x11223344
-        self.memory[8] = 0x55667788
-        
-        # Inicializar pipeline
-        self._init_pipeline()
-
-    def _init_pipeline(self):
-        # IF/ID
-        # inst (4 bytes)
-        self.pipeline[0:4] = (0x8C010000).to_bytes(4, byteorder='big')  # lw $1, 0($0)
-        # pc+4 (4 bytes)
-        self.pipeline[4:8] = (0x00000004).to_bytes(4, byteorder='big')
-        
-        # ID/EX
-        # rs_data (4 bytes)
-        self.pipeline[8:12] = (0x00000000).to_bytes(4, byteorder='big')
-        # rt_data (4 bytes)
-        self.pipeline[12:16] = (0x12345678).to_bytes(4, byteorder='big')
-        # immediate (4 bytes)
-        self.pipeline[16:20] = (0x00000000).to_bytes(4, byteorder='big')
-        # op_code (1 byte)
-        self.pipeline[20] = 0x23  # opcode para lw
-        # rs_addr (1 byte)
-        self.pipeline[21] = 0x00  # $0
-        # rt_addr (1 byte)
-        self.pipeline[22] = 0x01  # $1
-        # rd_addr (1 byte)
-        self.pipeline[23] = 0x00  # No aplica para lw
-        # controlU (2 bytes)
-        self.pipeline[24:26] = (0x0380).to_bytes(2, byteorder='big')
-        
-        # EX/MEM
-        # alu_result (4 bytes)
-        self.pipeline[26:30] = (0x00000000).to_bytes(4, byteorder='big')
-        # wr_data (4 bytes)
-        self.pipeline[30:34] = (0x00000000).to_bytes(4, byteorder='big')
-        # addr_rd (1 byte)
-        self.pipeline[34] = 0x01  # $1
-        # controlU (2 bytes)
-        self.pipeline[35:37] = (0x0180).to_bytes(2, byteorder='big')
-        
-        # MEM/WB
-        # read_data (4 bytes)
-        self.pipeline[37:41] = (0xAABBCCDD).to_bytes(4, byteorder='big')
-        # alu_result (4 bytes)
-        self.pipeline[41:45] = (0x00000000).to_bytes(4, byteorder='big')
-        # addr_rd (1 byte)
-        self.pipeline[45] = 0x01  # $1
-        # controlU (1 byte)
-        self.pipeline[46] = 0x02
+        self._cargando = False     # True entre LOAD_PROGRAM y la palabra HALT
+        self._parcial = bytearray()  # Bytes de una palabra todavía incompleta
+        self._programa = []        # Palabras recibidas en la carga en curso
+        self.last_executed = 0     # Pasos (ciclos o instrucciones) del último RUN/STEP
+        # Modo temporizado: instantes en time.monotonic()
+        self.baudrate = baudrate
+        self._t_caracter = tiempo_caracter(baudrate) if baudrate else 0.0
+        self._tiempos = []         # Instante en que llega cada byte de response_buffer
+        self._linea_rx = 0.0       # Fin del último byte enviado a la placa
+        self._linea_tx = 0.0       # Fin del último byte enviado por la placa
+        self._ocupado_hasta = 0.0  # La FSM no atiende bytes nuevos antes de este instante
+        self._reloj = 0.0          # Instante de la placa mientras se procesa un byte
+
+    @property
+    def registers(self):
+        return self.cpu.registers
+
+    @property
+    def memory(self):
+        return self.cpu.memory
 
     def write(self, data):
         """Simula el envío de datos a la FPGA."""
         self.buffer.extend(data)
-        print(f"MockSerial: Datos enviados a la FPGA: {data}")
-
-        # Simular respuestas basadas en el comando enviado
-        if data == b'\x04':  # CMD_LOAD
-            print("MockSerial: Simulando respuesta a LOAD_PROGRAM (ACK)")
-            self.response_buffer.extend(b'\x01')  # Simular un ACK
-
-        elif data == b'\x03':  # CMD_RUN
-            print("MockSerial: Simulando respuesta a RUN (registros y memoria)")
-            # Simular ejecución de las instrucciones del .coe
-            self._simulate_run()
-            # Enviar los registros y memoria como respuesta
-            self.response_buffer.extend(self._get_registers_and_memory())
-            # Enviar los datos de pipeline como respuesta
-            self.response_buffer.extend(self._get_pipeline_data())
-
-        elif data == b'\x05':  # CMD_STEP
-            print("MockSerial: Simulando respuesta a STEP (registros y memoria)")
-            # Simular ejecución de una instrucción
-            self._simulate_step()
-            # Enviar los registros y memoria como respuesta
-            self.response_buffer.extend(self._get_registers_and_memory())
-            # Enviar los datos de pipeline como respuesta
-            self.response_buffer.extend(self._get_pipeline_data())
-
-        elif data == b'\x0C':  # CMD_RESET
-            print("MockSerial: Simulando respuesta a RESET (ACK)")
-            self.response_buffer.extend(b'\x01')  # Simular un ACK
-            # Reiniciar registros y memoria
-            self.registers = [0] * 32
-            self.memory = [0] * 128
-            self.pipeline = [0] * 47
-            # Reinicializar con algunos valores para pruebas
-            self.registers[1] = 0x12345678
-            self.registers[2] = 0x00000020
-            self.registers[3] = 0x00000030
-            self.registers[5] = 0x00000050
-            self.registers[7] = 0x00FF0000
-            self.memory[0] = 0xAABBCCDD
-            self.memory[4] = 0x11223344
-            self.memory[8] = 0x55667788
-            self._init_pipeline()
+        self._log(f"MockSerial: Datos enviados a la FPGA: {bytes(data)}")
+        if not self.baudrate:
+            self._procesar(memoryview(bytes(data)))
+            return len(data)
+        ahora = time.monotonic()
+        for byte in bytes(data):
+            # El byte queda en la FIFO de RX al terminar su bit de stop
+            self._linea_rx = max(ahora, self._linea_rx) + self._t_caracter
+            self._reloj = max(self._linea_rx, self._ocupado_hasta)
+            self._avanzar(1)
+            self._procesar(memoryview(bytes([byte])))
+        return len(data)
+
+    def _procesar(self, datos):
+        while datos:
+            if self._cargando:
+                datos = self._recibir_programa(datos)
+            else:
+                self._comando(datos[0])
+                datos = datos[1:]
+
+    def _avanzar(self, ciclos):
+        """Modo temporizado: la FSM pasa ciclos de reloj ocupada."""
+        if self.baudrate:
+            self._reloj += ciclos / FRECUENCIA_RELOJ
+            self._ocupado_hasta = self._reloj
+
+    def _encolar(self, datos):
+        """Agrega bytes a la respuesta; en modo temporizado calcula cuándo llega cada uno."""
+        self.response_buffer.extend(datos)
+        if not self.baudrate:
+            return
+        inicio = max(self._reloj, self._linea_tx)
+        n = len(datos)
+        self._tiempos.extend(inicio + (i + 1) * self._t_caracter for i in range(n))
+        self._linea_tx = inicio + n * self._t_caracter
+        # Con la FIFO llena la FSM espera a que salga un byte para poner el siguiente
+        self._reloj = inicio + max(0, n - BYTES_FIFO_TX) * self._t_caracter
+        self._avanzar(CICLOS_FIN_RESPUESTA)
+
+    def _esperar(self, size):
+        """Modo temporizado: espera a que lleguen los primeros size bytes y los descuenta."""
+        if not self.baudrate:
+            return
+        n = min(size, len(self._tiempos))
+        if n:
+            demora = self._tiempos[n - 1] - time.monotonic()
+            if demora > 0:
+                time.sleep(demora)
+            del self._tiempos[:n]
+
+    def pending_response(self):
+        """
+        Saca toda la respuesta pendiente como una lista de (instante, bytes) en
+        tramos de hasta BYTES_TRAMO bytes; instante es el time.monotonic() en
+        que termina de llegar el tramo (0 sin modo temporizado).
+        """
+        datos = bytes(self.response_buffer)
+        self.response_buffer.clear()
+        if not self.baudrate:
+            return [(0.0, datos)] if datos else []
+        tiempos = self._tiempos
+        self._tiempos = []
+        return [(tiempos[min(i + BYTES_TRAMO, len(datos)) - 1], datos[i:i + BYTES_TRAMO])
+                for i in range(0, len(datos), BYTES_TRAMO)]
+
+    def _comando(self, cmd):
+        if cmd == CMD_LOAD:
+            self._log("MockSerial: LOAD_PROGRAM, esperando instrucciones hasta HALT")
+            self._avanzar(CICLOS_COMANDO)
+            if self.ack:
+                self._encolar(bytes([ACK]))
+            self._cargando = True
+            self._parcial.clear()
+            self._programa = []
+
+        elif cmd == CMD_RUN:
+            self.last_executed = self.cpu.run(self.max_instrucciones)
+            self._avanzar(CICLOS_COMANDO + self.last_executed)
+            self._log(f"MockSerial: RUN, {self.last_executed} pasos ejecutados")
+            if not self.cpu.halted:
+                self._log(f"MockSerial: RUN no llegó a HALT en {self.max_instrucciones} pasos")
+            self._responder()
+
+        elif cmd == CMD_STEP:
+            self.last_executed = self.cpu.step()
+            self._avanzar(CICLOS_COMANDO + 1)
+            self._log(f"MockSerial: STEP, PC = 0x{self.cpu.pc:08X}")
+            self._responder()
+
+        elif cmd == CMD_RESET:
+            self._log("MockSerial: RESET")
+            self._avanzar(CICLOS_COMANDO + 1)
+            if self.ack:
+                self._encolar(bytes([ACK]))
+            self.cpu.reset()
+
+        else:
+            self._log(f"MockSerial: Comando desconocido 0x{cmd:02X} ignorado")
+
+    def _recibir_programa(self, datos):
+        """Consume palabras de la carga en curso. Devuelve los bytes que sobran tras HALT."""
+        while datos:
+            faltan = 4 - len(self._parcial)
+            self._parcial.extend(datos[:faltan])
+            datos = datos[faltan:]
+            if len(self._parcial) < 4:
+                break
+            palabra = int.from_bytes(self._parcial, "big")
+            self._parcial.clear()
+            self._programa.append(palabra)
+            self._avanzar(1)  # WRITE_INST
+            if palabra == HALT_INSTR:
+                self.cpu.load_program(self._programa)
+                self._log(f"MockSerial: Programa cargado ({len(self._programa)} instrucciones)")
+                self._cargando = False
+                break
+        return datos
+
+    def _responder(self):
+        """Encola la trama de 303 bytes; tras HALT la debug_unit reinicia el procesador."""
+        self._encolar(self.cpu.dump() + self._get_pipeline_data())
+        if self.cpu.halted:
+            self.cpu.reset()
 
     def read(self, size):
         """Simula la lectura de datos desde la FPGA."""
+        self._esperar(size)
         if len(self.response_buffer) < size:
-            print("MockSerial: No hay suficientes datos en el buffer de respuesta.")
+            self._log("MockSerial: No hay suficientes datos en el buffer de respuesta.")
             # Rellenar con ceros si no hay suficientes datos
             self.response_buffer.extend(b'\x00' * (size - len(self.response_buffer)))
         
         data = self.response_buffer[:size]
         self.response_buffer = self.response_buffer[size:]
-        print(f"MockSerial: Datos leídos desde la FPGA: {len(data)} bytes")
+        self._log(f"MockSerial: Datos leídos desde la FPGA: {len(data)} bytes")
         return data
 
+    def readinto(self, b):
+        """Lee len(b) bytes directamente en el buffer b (como pyserial)."""
+        size = len(b)
+        self._esperar(size)
+        if len(self.response_buffer) < size:
+            self._log("MockSerial: No hay suficientes datos en el buffer de respuesta.")
+            self.response_buffer.extend(b'\x00' * (size - len(self.response_buffer)))
+        b[:size] = self.response_buffer[:size]
+        del self.response_buffer[:size]
+        self._log(f"MockSerial: Datos leídos desde la FPGA: {size} bytes")
+        return size
+
+    @property
+    def in_waiting(self):
+        """Cantidad de bytes de respuesta pendientes de lectura (como pyserial)."""
+        if self.baudrate:
+            return bisect_right(self._tiempos, time.monotonic())
+        return len(self.response_buffer)
+
     def flush(self):
-        """Simula el flush del buffer."""
-        print("MockSerial: Flush del buffer.")
+        """Simula el flush del buffer; en modo temporizado espera a que salga lo escrito."""
+        self._log("MockSerial: Flush del buffer.")
+        demora = self._linea_rx - time.monotonic()
+        if self.baudrate and demora > 0:
+            time.sleep(demora)
+
+    def reset_input_buffer(self):
+        """Descarta los bytes de respuesta que ya llegaron (como pyserial)."""
+        n = self.in_waiting
+        del self.response_buffer[:n]
+        if self.baudrate:
+            del self._tiempos[:n]
 
     def close(self):
         """Simula el cierre del puerto serie."""
-        print("MockSerial: Puerto serie cerrado.")
+        self._log("MockSerial: Puerto serie cerrado.")
         self.is_open = False
 
-    def _simulate_run(self):
-        """Simula la ejecución de todas las instrucciones del .coe."""
-        # Simular ejecución de las instrucciones
-        self.registers[5] = 20  # ADDI $r5, $r5, 20
-        self.registers[1] = self.registers[2] + self.registers[3]  # ADDU $r1, $r2, $r3
-        self.registers[7] = 255 << 16  # LUI $r7, 255
-        # J 1024 (no afecta registros ni memoria)
-        # BEQ $r5, $r5, 8 (no afecta registros ni memoria)
-        self.registers[1] = self.registers[2] << 5  # SLL $r1, $r2, 5
-        
-        # Actualizar pipeline para reflejar la última instrucción
-        # IF/ID
-        self.pipeline[0:4] = (0x00021140).to_bytes(4, byteorder='big')  # sll $2, $2, 5
-        self.pipeline[4:8] = (0x00000018).to_bytes(4, byteorder='big')  # pc+4
-        
-        # ID/EX
-        self.pipeline[8:12] = (0x00000000).to_bytes(4, byteorder='big')  # rs_data
-        self.pipeline[12:16] = (0x00000020).to_bytes(4, byteorder='big')  # rt_data
-        self.pipeline[16:20] = (0x00000005).to_bytes(4, byteorder='big')  # immediate (shift amount)
-        self.pipeline[20] = 0x00  # opcode
-        self.pipeline[21] = 0x00  # rs_addr
-        self.pipeline[22] = 0x02  # rt_addr
-        self.pipeline[23] = 0x02  # rd_addr
-        self.pipeline[24:26] = (0x0040).to_bytes(2, byteorder='big')  # controlU
-        
-        # EX/MEM
-        self.pipeline[26:30] = (0x00000400).to_bytes(4, byteorder='big')  # alu_result
-        self.pipeline[30:34] = (0x00000000).to_bytes(4, byteorder='big')  # wr_data
-        self.pipeline[34] = 0x02  # addr_rd
-        self.pipeline[35:37] = (0x0040).to_bytes(2, byteorder='big')  # controlU
-        
-        # MEM/WB
-        self.pipeline[37:41] = (0x00000000).to_bytes(4, byteorder='big')  # read_data
-        self.pipeline[41:45] = (0x00000400).to_bytes(4, byteorder='big')  # alu_result
-        self.pipeline[45] = 0x02  # addr_rd
-        self.pipeline[46] = 0x01  # controlU
-
-    def _simulate_step(self):
-        """Simula la ejecución de una instrucción."""
-        # Simular ejecución de una instrucción
-        self.registers[5] = 20  # ADDI $r5, $r5, 20
-        
-        # Actualizar pipeline para reflejar la instrucción
-        # IF/ID
-        self.pipeline[0:4] = (0x20A50014).to_bytes(4, byteorder='big')  # addi $5, $5, 20
-        self.pipeline[4:8] = (0x00000004).to_bytes(4, byteorder='big')  # pc+4
-        
-        # ID/EX
-        self.pipeline[8:12] = (0x00000050).to_bytes(4, byteorder='big')  # rs_data
-        self.pipeline[12:16] = (0x00000000).to_bytes(4, byteorder='big')  # rt_data
-        self.pipeline[16:20] = (0x00000014).to_bytes(4, byteorder='big')  # immediate (20 en decimal)
-        self.pipeline[20] = 0x08  # opcode para addi
-        self.pipeline[21] = 0x05  # rs_addr ($5)
-        self.pipeline[22] = 0x05  # rt_addr ($5)
-        self.pipeline[23] = 0x00  # rd_addr (no aplica para addi)
-        self.pipeline[24:26] = (0x0140).to_bytes(2, byteorder='big')  # controlU
-        
-        # EX/MEM
-        self.pipeline[26:30] = (0x00000064).to_bytes(4, byteorder='big')  # alu_result (0x50 + 0x14 = 0x64)
-        self.pipeline[30:34] = (0x00000000).to_bytes(4, byteorder='big')  # wr_data
-        self.pipeline[34] = 0x05  # addr_rd
-        self.pipeline[35:37] = (0x0040).to_bytes(2, byteorder='big')  # controlU
-        
-        # MEM/WB
-        self.pipeline[37:41] = (0x00000000).to_bytes(4, byteorder='big')  # read_data
-        self.pipeline[41:45] = (0x00000064).to_bytes(4, byteorder='big')  # alu_result
-        self.pipeline[45] = 0x05  # addr_rd
-        self.pipeline[46] = 0x01  # controlU
-
-    def _get_registers_and_memory(self):
-        """Devuelve los registros y memoria en formato de bytes."""
-        # Convertir registros a bytes (32 registros de 32 bits = 128 bytes)
-        reg_bytes = bytearray()
-        for reg in self.registers:
-            reg_bytes.extend(reg.to_bytes(4, byteorder='big'))
-        
-        # Convertir memoria a bytes (32 palabras de 32 bits = 128 bytes)
-        mem_bytes = bytearray()
-        for i in range(32):
-            if i < len(self.memory) // 4:
-                word = self.memory[i*4]
-                mem_bytes.extend(word.to_bytes(4, byteorder='big'))
-            else:
-                mem_bytes.extend((0).to_bytes(4, byteorder='big'))
-        
-        # Combinar registros y memoria (256 bytes en total)
-        return reg_bytes + mem_bytes
+    def _log(self, message):
+        if self.verbose:
+            print(message)
 
     def _get_pipeline_data(self):
         """Devuelve los datos de pipeline en formato de bytes."""
-        return bytes(self.pipeline)
+        return self.cpu.pipeline_data()
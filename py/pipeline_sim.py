@@ -0,0 +1,334 @@
+#===========================================
+# Script: pipeline_sim.py
+# Description:
+#    Modelo ciclo a ciclo del pipeline de 5 etapas de src/pipeline, para que
+#    MockSerial devuelva en STEP los mismos 47 bytes de IF_ID/ID_EX/EX_M/M_WB
+#    que envía debug_unit.v. Reproduce:
+#      - control_unit.v: las 20 señales por opcode/funct (tablas _SENALES_*)
+#      - hazard_unit.v: stall por load-use y por branch con operandos en EX/MEM;
+#        el stall congela PC e IF_ID y vacía ID_EX
+#      - forwarding_unit_ID.v: rs/rt en ID desde el alu_result de EX_M
+#      - forwarding_unit_EX.v: EX_M con prioridad sobre M_WB
+#      - branches resueltos en ID, J/JAL/JR/JALR vaciando IF_ID, sin delay slot;
+#        JR/JALR toman rs del banco de registros sin forwarding
+#      - banco de registros escrito en el flanco negativo (WB antes que ID)
+#      - memoria de datos escrita en cada flanco positivo con lo que haya en
+#        EX_M, también con el reloj del pipeline detenido (i_we no depende del
+#        enable), incluso durante el RESET
+#    El estado de los registros de pipeline es una lista fija de enteros en el
+#    orden de frame_layout.PIPELINE_FIELDS (más los PC+8 que no se transmiten),
+#    así que la trama sale de un único PIPELINE_STRUCT.pack.
+#===========================================
+from frame_layout import PIPELINE_FIELDS, PIPELINE_STRUCT
+from mips_sim import MipsSimulator, escribir_palabra, leer_palabra
+
+_MASCARA = 0xFFFFFFFF
+_SIGNO = 0x80000000
+
+# Posición de cada registro de pipeline en PipelineSimulator.latches
+(IF_ID_INST, IF_ID_PC4,
+ ID_EX_RS_DATA, ID_EX_RT_DATA, ID_EX_SEXT, ID_EX_OP, ID_EX_RS, ID_EX_RT, ID_EX_RD, ID_EX_CTRL,
+ EX_M_ALU, EX_M_WDATA, EX_M_RD, EX_M_CTRL,
+ M_WB_READ, M_WB_ALU, M_WB_RD, M_WB_CTRL,
+ ID_EX_PC8, EX_M_PC8, M_WB_PC8) = range(21)
+NUM_LATCHES = 21
+assert M_WB_CTRL + 1 == len(PIPELINE_FIELDS)
+
+# Bits de las señales de control_unit.v
+JUMP, JSEL, BRANCH, IS_BEQ = 1 << 19, 1 << 18, 1 << 17, 1 << 16
+REG_DST, ALU_SRC, JAL_SEL = 1 << 15, 1 << 14, 1 << 9
+MEM_READ, MEM_WRITE, MEM_TO_REG, REG_WRITE, IS_JAL, HALT = 1 << 8, 1 << 7, 1 << 3, 1 << 2, 1 << 1, 1
+
+
+def _tipo_i(alu_op):
+    return REG_DST | ALU_SRC | (alu_op << 10) | REG_WRITE
+
+
+def _load(bhw):
+    return REG_DST | ALU_SRC | MEM_READ | (bhw << 4) | MEM_TO_REG | REG_WRITE
+
+
+def _store(bhw):
+    return REG_DST | ALU_SRC | MEM_WRITE | (bhw << 4)
+
+
+def _tabla_opcodes():
+    tabla = [0] * 64
+    for op in range(8):
+        tabla[op] = REG_WRITE | IS_JAL | HALT  # default del grupo 000: 20'b111
+    tabla[0b000100] = BRANCH | IS_BEQ | (0b0111 << 10)
+    tabla[0b000101] = BRANCH | (0b0111 << 10)
+    tabla[0b000010] = JUMP
+    tabla[0b000011] = JUMP | JAL_SEL | REG_WRITE | IS_JAL
+    for op, alu_op in ((0b000, 0b0000), (0b001, 0b0001), (0b100, 0b0100), (0b101, 0b0101),
+                       (0b110, 0b1000), (0b111, 0b1001), (0b010, 0b1100), (0b011, 0b1101)):
+        tabla[0b001000 | op] = _tipo_i(alu_op)
+    for op in range(8):
+        tabla[0b100000 | op] = _load(op if op in (0b000, 0b001, 0b011, 0b100, 0b101, 0b111) else 0)
+        tabla[0b101000 | op] = _store(op if op in (0b000, 0b001, 0b011) else 0)
+    return tuple(tabla)
+
+
+def _tabla_funct():
+    tabla = [0] * 64
+    for funct in (0x21, 0x23, 0x24, 0x25, 0x26, 0x27, 0x2A, 0x2B, 0x00, 0x02, 0x03, 0x04, 0x06, 0x07):
+        tabla[funct] = (0b0010 << 10) | REG_WRITE
+    tabla[0x08] = JSEL
+    tabla[0x09] = JSEL | REG_WRITE | IS_JAL
+    tabla[0x3F] = HALT
+    return tuple(tabla)
+
+
+# Señales de control por opcode; para opcode 0 se usan las de la tabla por funct
+_SENALES_OPCODE = _tabla_opcodes()
+_SENALES_FUNCT = _tabla_funct()
+
+
+def control_signals(inst):
+    """Las 20 señales que control_unit.v genera para la instrucción."""
+    op = inst >> 26
+    return _SENALES_FUNCT[inst & 63] if op == 0 else _SENALES_OPCODE[op]
+
+
+# ALU_control.v: código de operación del ALU para cada aluOp (el tipo R usa funct)
+_ALU_CONTROL = {0b0000: 0b100000, 0b0001: 0b100001, 0b0100: 0b100100, 0b0101: 0b100101,
+                0b1000: 0b100110, 0b1001: 0b001111, 0b1100: 0b101010, 0b1101: 0b101011,
+                0b0111: 0b100010}
+_ALU_CONTROL = tuple(_ALU_CONTROL.get(alu_op, 0b100000) for alu_op in range(16))
+
+
+def _alu(codigo, a, b, shamt):
+    """ALU.v sobre enteros sin signo de 32 bits."""
+    if codigo <= 0b000111:
+        if codigo == 0b000000:
+            return (b << shamt) & _MASCARA
+        if codigo == 0b000010:
+            return b >> shamt
+        if codigo == 0b000011:
+            return ((b - 0x100000000 if b & _SIGNO else b) >> shamt) & _MASCARA
+        if codigo == 0b000100:
+            return (b << a) & _MASCARA if a < 32 else 0
+        if codigo == 0b000110:
+            return b >> a
+        if codigo == 0b000111:
+            return ((b - 0x100000000 if b & _SIGNO else b) >> a) & _MASCARA
+        return 0
+    if codigo <= 0b100001:
+        return (a + b) & _MASCARA if codigo >= 0b100000 else (b & 0xFFFF0000 if codigo == 0b001111 else 0)
+    if codigo <= 0b100011:
+        return (a - b) & _MASCARA
+    if codigo == 0b100100:
+        return a & b
+    if codigo == 0b100101:
+        return a | b
+    if codigo == 0b100110:
+        return a ^ b
+    if codigo == 0b100111:
+        return ~(a | b) & _MASCARA
+    if codigo == 0b101010:
+        return int((a ^ _SIGNO) < (b ^ _SIGNO))
+    if codigo == 0b101011:
+        return int(a < b)
+    return 0
+
+
+def _dato_a_memoria(bhw, dato):
+    """mem_data_in de MEM.v: SB y SH escriben la palabra completa con ceros arriba."""
+    if bhw == 0b000:
+        return dato & 0xFF
+    if bhw == 0b001:
+        return dato & 0xFFFF
+    return dato
+
+
+def _dato_leido(bhw, palabra):
+    """read_data de MEM.v según BHW."""
+    if bhw == 0b000:
+        palabra &= 0xFF
+        return palabra | 0xFFFFFF00 if palabra & 0x80 else palabra
+    if bhw == 0b001:
+        palabra &= 0xFFFF
+        return palabra | 0xFFFF0000 if palabra & 0x8000 else palabra
+    if bhw == 0b100:
+        return palabra & 0xFF
+    if bhw == 0b101:
+        return palabra & 0xFFFF
+    return palabra
+
+
+class PipelineSimulator(MipsSimulator):
+    """
+    Mismo estado arquitectónico que MipsSimulator más los registros de
+    pipeline en latches. Cada paso es un ciclo de reloj con el enable de la
+    debug_unit activo:
+      - step(): un ciclo, como STEP
+      - run(): ciclos hasta que HALT llega a M_WB, más ese último ciclo, como RUN
+    En ambos casos halted queda en True si M_WB tenía HALT al empezar el
+    último ciclo (la debug_unit reinicia el procesador tras enviar esa trama).
+    """
+
+    def reset(self):
+        """
+        RESET: borra PC, registros, memorias y latches. Como la memoria de datos
+        escribe también en ese flanco, un store que estaba en EX_M sobrevive.
+        """
+        pendiente = getattr(self, "latches", None)
+        super().reset()
+        if pendiente is not None and pendiente[EX_M_CTRL] & MEM_WRITE:
+            self._escribir_ex_m(pendiente)
+        self.latches = [0] * NUM_LATCHES
+        self.cycles = 0
+
+    def load_program(self, palabras):
+        super().load_program(palabras)
+        # Los flancos sin enable durante la carga siguen escribiendo el store de EX_M
+        self._escribir_ex_m(self.latches)
+
+    def pipeline_data(self):
+        """Los 47 bytes de IF_ID, ID_EX, EX_M y M_WB tal como los envía la debug_unit."""
+        return PIPELINE_STRUCT.pack(*self.latches[:len(PIPELINE_FIELDS)])
+
+    def _escribir_ex_m(self, latches):
+        ctrl = latches[EX_M_CTRL]
+        if ctrl & MEM_WRITE:
+            escribir_palabra(self.memory, latches[EX_M_ALU],
+                              _dato_a_memoria((ctrl >> 4) & 7, latches[EX_M_WDATA]))
+
+    def step(self):
+        return self.run(1)
+
+    def run(self, max_ciclos=None):
+        """
+        Avanza ciclos hasta el final de RUN o hasta max_ciclos (None: sin
+        límite). Devuelve la cantidad de ciclos ejecutados.
+        """
+        r = self.registers
+        mem = self.memory
+        imem = self.instructions
+        fetch = self.fetch
+        senales_op = _SENALES_OPCODE
+        senales_funct = _SENALES_FUNCT
+        alu_control = _ALU_CONTROL
+        alu = _alu
+        M = _MASCARA
+        pc = self.pc
+        (ifid_inst, ifid_pc4,
+         idex_rs_data, idex_rt_data, idex_sext, idex_op, idex_rs, idex_rt, idex_rd, idex_ctrl,
+         exm_alu, exm_wdata, exm_rd, exm_ctrl,
+         mwb_read, mwb_alu, mwb_rd, mwb_ctrl,
+         idex_pc8, exm_pc8, mwb_pc8) = self.latches
+        limite = -1 if max_ciclos is None else max_ciclos
+        n = 0
+        halt = False
+        while n != limite:
+            n += 1
+            halt = mwb_ctrl & HALT
+
+            # WB (flanco negativo): el banco de registros se escribe antes de que ID lea
+            if mwb_ctrl & IS_JAL:
+                wb = mwb_pc8
+            elif mwb_ctrl & MEM_TO_REG:
+                wb = mwb_read
+            else:
+                wb = mwb_alu
+            if mwb_ctrl & REG_WRITE:
+                r[mwb_rd] = wb
+
+            # EX: forwarding desde EX_M (prioridad) o M_WB
+            if idex_ctrl & JAL_SEL:
+                dest_ex = 31
+            else:
+                dest_ex = idex_rt if idex_ctrl & REG_DST else idex_rd
+            reg_write_m = exm_ctrl & REG_WRITE and exm_rd
+            reg_write_wb = mwb_ctrl & REG_WRITE and mwb_rd
+            if reg_write_m and exm_rd == idex_rs:
+                a = exm_alu
+            elif reg_write_wb and mwb_rd == idex_rs:
+                a = wb
+            else:
+                a = idex_rs_data
+            if reg_write_m and exm_rd == idex_rt:
+                dato_rt = exm_alu
+            elif reg_write_wb and mwb_rd == idex_rt:
+                dato_rt = wb
+            else:
+                dato_rt = idex_rt_data
+            alu_op = (idex_ctrl >> 10) & 15
+            alu_result = alu(idex_op if alu_op == 0b0010 else alu_control[alu_op], a,
+                             idex_sext if idex_ctrl & ALU_SRC else dato_rt, (idex_sext >> 6) & 31)
+
+            # MEM: lectura asíncrona con la dirección de EX_M
+            bhw = (exm_ctrl >> 4) & 7
+            read_data = _dato_leido(bhw, leer_palabra(mem, exm_alu))
+
+            # ID: decodificación, forwarding desde EX_M y resolución de branches
+            inst = ifid_inst
+            op = inst >> 26
+            senales = senales_funct[inst & 63] if op == 0 else senales_op[op]
+            rs = (inst >> 21) & 31
+            rt = (inst >> 16) & 31
+            rs_data = exm_alu if reg_write_m and exm_rd == rs else r[rs]
+            rt_data = exm_alu if reg_write_m and exm_rd == rt else r[rt]
+            sext = inst & 0xFFFF
+            if sext & 0x8000:
+                sext |= 0xFFFF0000
+            pc_src = senales & BRANCH and (rs_data == rt_data) == bool(senales & IS_BEQ)
+
+            # hazard_unit
+            if idex_ctrl & MEM_READ and (rs == idex_rt or rt == idex_rt):
+                stall = True
+            elif senales & BRANCH:
+                stall = bool((idex_ctrl & REG_WRITE and dest_ex and (dest_ex == rs or dest_ex == rt))
+                             or (exm_ctrl & MEM_TO_REG and exm_rd and (exm_rd == rs or exm_rd == rt)))
+            else:
+                stall = False
+
+            # IF: próximo PC (branch, J/JAL, JR/JALR)
+            inst_if = fetch(pc) if pc & 3 else imem[(pc >> 2) & 127]
+            pc4_if = (pc + 4) & M
+            if senales & JSEL:
+                siguiente = r[rs]
+            elif senales & JUMP:
+                siguiente = (pc4_if & 0xF0000000) | ((inst & 0x3FFFFFF) << 2)
+            elif pc_src:
+                siguiente = (ifid_pc4 + (sext << 2)) & M
+            else:
+                siguiente = pc4_if
+
+            # Flanco positivo: la memoria escribe con el EX_M anterior y avanzan los latches
+            if exm_ctrl & MEM_WRITE:
+                escribir_palabra(mem, exm_alu, _dato_a_memoria(bhw, exm_wdata))
+            mwb_read, mwb_alu, mwb_rd, mwb_ctrl, mwb_pc8 = (
+                read_data, exm_alu, exm_rd, exm_ctrl & 0xF, exm_pc8)
+            exm_alu, exm_wdata, exm_rd, exm_ctrl, exm_pc8 = (
+                alu_result, dato_rt, dest_ex, idex_ctrl & 0x1FF, idex_pc8)
+            if stall:
+                idex_rs_data = idex_rt_data = idex_sext = idex_op = 0
+                idex_rs = idex_rt = idex_rd = idex_ctrl = idex_pc8 = 0
+            else:
+                idex_rs_data, idex_rt_data, idex_sext, idex_op = rs_data, rt_data, sext, inst & 63
+                idex_rs, idex_rt, idex_rd = rs, rt, (inst >> 11) & 31
+                idex_ctrl, idex_pc8 = senales & 0xFFFF, (ifid_pc4 + 4) & M
+            if senales & (JUMP | JSEL) or (pc_src and not stall):
+                ifid_inst = ifid_pc4 = 0
+            elif not stall and not senales & HALT:
+                ifid_inst, ifid_pc4 = inst_if, pc4_if
+            if not stall and not senales & HALT:
+                pc = siguiente
+
+            if halt:
+                break
+
+        self.pc = pc
+        latches = self.latches
+        latches[:] = (ifid_inst, ifid_pc4,
+                      idex_rs_data, idex_rt_data, idex_sext, idex_op, idex_rs, idex_rt, idex_rd, idex_ctrl,
+                      exm_alu, exm_wdata, exm_rd, exm_ctrl,
+                      mwb_read, mwb_alu, mwb_rd, mwb_ctrl,
+                      idex_pc8, exm_pc8, mwb_pc8)
+        # Hasta la trama siguiente el reloj sigue corriendo sin enable y la
+        # memoria vuelve a escribir el store que quedó en EX_M
+        self._escribir_ex_m(latches)
+        self.halted = bool(halt)
+        self.cycles += n
+        return n
@@ -3,25 +3,15 @@ import serial
 import sys
 import time
 
+from debug_link import CMD_STEP, FRAME_BYTES, FrameReader
+from frame_layout import decode_frame
+
 # Parámetros de comunicación (ajusta si es necesario)
 BAUDRATE = 19200
 BYTESIZE = 8       # 8 bits
 STOPBITS = 1       # 1 bit de stop
 PARITY   = 'N'     # Sin paridad
 
-CMD_STEP = 0x03    # Comando STEP
-EXPECTED_RESPONSE_BYTES = 256  # 32 registros + 128 memorias, cada uno de 4 bytes
-
-def read_exact(ser, n):
-    """Lee exactamente n bytes desde el puerto serie (o hasta timeout)."""
-    data = b''
-    while len(data) < n:
-        chunk = ser.read(n - len(data))
-        if not chunk:
-            break
-        data += chunk
-    return data
-
 def print_hex_dump(data, width=16):
     """Imprime un volcado hexadecimal del bloque de datos recibido."""
     for i in range(0, len(data), width):
@@ -33,12 +23,13 @@ def main():
     if len(sys.argv) < 2:
         print("Uso: {} <puerto_serial>".format(sys.argv[0]))
         print("Ejemplo: python3 step_debug.py /dev/ttyUSB0")
+        print("Ejemplo para simulación: socket://localhost:5000 (emulator_server.py)")
         sys.exit(1)
     
     port = sys.argv[1]
     try:
-        ser = serial.Serial(
-            port=port,
+        ser = serial.serial_for_url(
+            port,
             baudrate=BAUDRATE,
             bytesize=BYTESIZE,
             stopbits=STOPBITS,
@@ -53,34 +44,27 @@ def main():
     time.sleep(1)
     
     # Enviar comando STEP
-    print("Enviando comando STEP (0x05)...")
+    print("Enviando comando STEP (0x{:02X})...".format(CMD_STEP))
     ser.write(bytes([CMD_STEP]))
     ser.flush()
     
-    print("Esperando {} bytes de respuesta...".format(EXPECTED_RESPONSE_BYTES))
-    data = read_exact(ser, EXPECTED_RESPONSE_BYTES)
+    print("Esperando {} bytes de respuesta...".format(FRAME_BYTES))
+    lector = FrameReader(ser)
+    lector.read_frame()
     
-    if len(data) < EXPECTED_RESPONSE_BYTES:
-        print("Advertencia: Se recibieron solo {} bytes (se esperaban {}).".format(len(data), EXPECTED_RESPONSE_BYTES))
+    if lector.received < FRAME_BYTES:
+        print("Advertencia: Se recibieron solo {} bytes (se esperaban {}).".format(lector.received, FRAME_BYTES))
     else:
-        print("Se recibieron {} bytes.".format(len(data)))
+        print("Se recibieron {} bytes.".format(lector.received))
     
     # Opcional: Mostrar volcado completo en hexadecimal (para debug)
     print("\nVolcado hexadecimal completo:")
-    print_hex_dump(data)
-    
-    # Procesar la respuesta: Los primeros 128 bytes corresponden a 32 registros (4 bytes cada uno)
-    registros = []
-    for i in range(32):
-        reg = int.from_bytes(data[i*4:(i+1)*4], byteorder='big')
-        registros.append(reg)
+    print_hex_dump(lector.frame)
     
-    # Los siguientes 512 bytes corresponden a 128 posiciones de memoria (4 bytes cada uno)
-    memoria = []
-    offset = 32 * 4  # 128 bytes
-    for i in range(offset):
-        mem = int.from_bytes(data[offset + i*4 : offset + (i+1)*4], byteorder='big')
-        memoria.append(mem)
+    # Procesar la respuesta: 32 registros y 32 palabras de memoria de 4 bytes.
+    # Se decodifica el buffer completo del lector (los bytes que no llegaron quedan en 0)
+    frame = decode_frame(lector.buffer)
+    registros, memoria = frame.registers, frame.memory
     
     # Mostrar resultados de los registros (solo si son distintos de 0)
     print("\nRegistros (solo los distintos de 0):")
@@ -0,0 +1,247 @@
+#===========================================
+# Script: serial_worker.py
+# Description:
+#    Hilo de E/S que es dueño del puerto serie: los comandos para la
+#    debug_unit se encolan y se ejecutan de a uno, en orden, así dos pedidos
+#    seguidos nunca leen a la vez del mismo puerto. Los resultados (tramas ya
+#    decodificadas, resultados de carga, errores) vuelven por una única cola
+#    que el dueño consulta con poll(); la GUI lo hace desde el loop de Tk.
+#      - cancel(): corta el trabajo en curso mientras espera una trama (STEP
+#        N y RUN HASTA también entre ventanas) y descarta los encolados. Si
+#        quedaron respuestas en camino se descartan antes del siguiente
+#        trabajo, para que no se mezclen con otra respuesta (un RUN cortado
+#        puede responder mucho más tarde: conviene un RESET)
+#      - timeout: segundos que un trabajo espera cada trama
+#    LOAD_PROGRAM y RESET son escrituras que no se cortan a medias: se
+#    encolan con cancelable=False y no usan cancelar ni espera.
+#    Los trabajos son funciones (ser, lector, cancelar, espera) -> valor; este
+#    módulo trae los de cada comando (comando_trama, comando_carga,
+#    comando_reset, comando_step_n, comando_run_until).
+# Uso:
+#    worker = SerialWorker(ser)
+#    worker.submit("STEP", comando_trama(CMD_STEP), al_terminar=mostrar)
+#    for resultado in worker.poll(): ...
+#===========================================
+import itertools
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from debug_link import (BAUDRATE, CMD_RESET, Cancelado, FrameReader, cargar_programa,
+                        esperar_listo, run_until, step_n)
+from frame_layout import decode_frame
+
+# Segundos que un trabajo espera cada trama antes de fallar
+TIMEOUT_COMANDO = 10.0
+# Timeout de cada lectura del puerto: cada cuánto se revisan cancelación y límite
+INTERVALO_LECTURA = 0.1
+
+ResultadoTrabajo = namedtuple(
+    "ResultadoTrabajo",
+    ["id", "nombre", "valor", "error", "segundos", "al_terminar"],
+)
+# Un trabajo cancelado entre ventanas (STEP N, RUN HASTA) devuelve error
+# TrabajoCancelado y también su valor parcial
+
+# Respuesta de STEP/RUN: la trama decodificada y sus 303 bytes
+Trama = namedtuple("Trama", ["frame", "raw"])
+# Resultado de step_n / run_until con la última trama (None si no hubo ciclos)
+Pasos = namedtuple("Pasos", ["pasos", "trama"])
+
+
+class TrabajoCancelado(Exception):
+    pass
+
+
+class SerialWorker:
+    def __init__(self, ser, timeout=TIMEOUT_COMANDO):
+        self.ser = ser
+        self.timeout = timeout
+        self.lector = FrameReader(ser)
+        self.results = queue.Queue()      # Canal hacia el dueño (uno solo)
+        self._pedidos = queue.Queue()
+        self._cancelar = threading.Event()
+        self._ids = itertools.count(1)
+        self._generacion = 0              # Cuántas veces se llamó a cancel()
+        self._sucio = False               # Puede haber restos de una trama cortada
+        self.current = None               # Nombre del trabajo en curso
+        # Lecturas cortas para poder cancelar (MockSerial no tiene timeout: nunca espera)
+        if hasattr(ser, "timeout") and (ser.timeout is None or ser.timeout > INTERVALO_LECTURA):
+            ser.timeout = INTERVALO_LECTURA
+        self._hilo = threading.Thread(target=self._bucle, name="serial-worker", daemon=True)
+        self._hilo.start()
+
+    def submit(self, nombre, funcion, al_terminar=None, timeout=None, cancelable=True):
+        """
+        Encola un trabajo. al_terminar viaja en el ResultadoTrabajo para que el
+        dueño lo llame en su hilo. Un trabajo no cancelable (p. ej. cerrar una
+        traza) sigue en la cola después de cancel(). Devuelve el id del trabajo.
+        """
+        trabajo_id = next(self._ids)
+        self._pedidos.put((trabajo_id, nombre, funcion, al_terminar,
+                           self.timeout if timeout is None else timeout,
+                           self._generacion if cancelable else None))
+        return trabajo_id
+
+    def cancel(self):
+        """Corta el trabajo en curso y descarta los cancelables que esperan en la cola."""
+        self._generacion += 1
+        self._cancelar.set()
+        quedan = []
+        while True:
+            try:
+                pedido = self._pedidos.get_nowait()
+            except queue.Empty:
+                break
+            if pedido is None or pedido[5] is None:
+                quedan.append(pedido)
+            else:
+                self.results.put(ResultadoTrabajo(pedido[0], pedido[1], None,
+                                                  TrabajoCancelado("cancelado"), 0.0, None))
+        for pedido in quedan:
+            self._pedidos.put(pedido)
+
+    def poll(self):
+        """Resultados disponibles, sin bloquear."""
+        resultados = []
+        while True:
+            try:
+                resultados.append(self.results.get_nowait())
+            except queue.Empty:
+                return resultados
+
+    @property
+    def busy(self):
+        return self.current is not None or not self._pedidos.empty()
+
+    def stop(self, espera=2.0):
+        """Cancela lo pendiente y termina el hilo (el puerto lo cierra el dueño)."""
+        self.cancel()
+        self._pedidos.put(None)
+        self._hilo.join(espera)
+
+    def _bucle(self):
+        while True:
+            pedido = self._pedidos.get()
+            if pedido is None:
+                return
+            trabajo_id, nombre, funcion, al_terminar, timeout, generacion = pedido
+            self._cancelar.clear()
+            # Sacado de la cola justo antes de un cancel(): no llega a ejecutarse
+            if generacion is not None and generacion != self._generacion:
+                self.results.put(ResultadoTrabajo(trabajo_id, nombre, None,
+                                                  TrabajoCancelado("cancelado"), 0.0, None))
+                continue
+            self.current = nombre
+            if self._sucio:
+                self._descartar_entrada()
+            inicio = time.perf_counter()
+            valor = error = None
+            try:
+                valor = funcion(self.ser, self.lector, self._cancelar, timeout)
+                if generacion is not None and self._cancelar.is_set():
+                    raise TrabajoCancelado("cancelado")
+            except Exception as e:
+                # Con valor el trabajo terminó completo (p. ej. STEP N cortado
+                # entre ventanas); sin valor la respuesta quedó a medias
+                error = e
+                self._sucio = valor is None and isinstance(e, (TrabajoCancelado, TimeoutError))
+            self.current = None
+            self.results.put(ResultadoTrabajo(trabajo_id, nombre, valor, error,
+                                              time.perf_counter() - inicio, al_terminar))
+
+    def _descartar_entrada(self):
+        # Las respuestas ya pedidas (el resto de una ventana de STEP) siguen
+        # llegando: se descarta hasta que la línea quede en silencio
+        self._sucio = False
+        limite = time.monotonic() + self.timeout
+        try:
+            self.ser.reset_input_buffer()
+            while time.monotonic() < limite:
+                time.sleep(INTERVALO_LECTURA)
+                if not self.ser.in_waiting:
+                    break
+                self.ser.reset_input_buffer()
+        except (AttributeError, OSError):
+            pass
+
+
+def _leer(lector, cancelar, espera):
+    completa = lector.read_frame(time.monotonic() + espera, cancelar)
+    if cancelar.is_set():
+        raise TrabajoCancelado("cancelado")
+    if not completa:
+        raise TimeoutError("trama incompleta ({} bytes)".format(lector.received))
+    raw = bytes(lector.frame)
+    return Trama(decode_frame(raw), raw)
+
+
+def comando_trama(cmd, grabador=None):
+    """STEP o RUN: envía el comando y devuelve la Trama de respuesta (la agrega a grabador)."""
+    def trabajo(ser, lector, cancelar, espera):
+        ser.write(bytes([cmd]))
+        ser.flush()
+        trama = _leer(lector, cancelar, espera)
+        if grabador is not None:
+            grabador.append(trama.raw, cmd)
+        return trama
+    return trabajo
+
+
+def comando_carga(instrucciones, baudrate=BAUDRATE):
+    """
+    LOAD_PROGRAM del programa completo; devuelve el ResultadoCarga. No se
+    puede cancelar: cortar la escritura dejaría un programa a medias en la
+    placa (encolar con cancelable=False).
+    """
+    def trabajo(ser, lector, cancelar, espera):
+        return cargar_programa(ser, instrucciones, baudrate)
+    return trabajo
+
+
+def comando_reset(baudrate=BAUDRATE):
+    """
+    RESET: un byte sin trama de respuesta, no se puede cancelar (encolar con
+    cancelable=False). Se consume el ACK opcional (MockSerial lo envía) para
+    que no quede delante de la próxima respuesta.
+    """
+    def trabajo(ser, lector, cancelar, espera):
+        ser.write(bytes([CMD_RESET]))
+        esperar_listo(ser, baudrate)
+    return trabajo
+
+
+def _pasos(avanzar, lector):
+    try:
+        resultado = avanzar()
+    except Cancelado as e:
+        raise TrabajoCancelado(str(e)) from e
+    trama = None
+    if resultado.ciclos:
+        raw = bytes(lector.frame)
+        trama = Trama(decode_frame(raw), raw)
+    return Pasos(resultado, trama)
+
+
+def comando_step_n(n, grabador=None):
+    """step_n; devuelve Pasos. Cancelar corta entre ventanas o mientras espera una trama."""
+    def trabajo(ser, lector, cancelar, espera):
+        return _pasos(lambda: step_n(ser, n, lector, detener=cancelar, grabador=grabador,
+                                     timeout=espera), lector)
+    return trabajo
+
+
+def comando_run_until(condicion, grabador=None):
+    """run_until; devuelve Pasos. Cancelar corta entre ciclos o mientras espera una trama."""
+    def trabajo(ser, lector, cancelar, espera):
+        return _pasos(lambda: run_until(ser, condicion, lector=lector, detener=cancelar,
+                                        grabador=grabador, timeout=espera), lector)
+    return trabajo
+
+
+def comando(funcion):
+    """Trabajo a partir de una función sin argumentos (p. ej. cerrar una traza en el hilo de E/S)."""
+    def trabajo(ser, lector, cancelar, espera):
+        return funcion()
+    return trabajo
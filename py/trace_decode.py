@@ -0,0 +1,106 @@
+#===========================================
+# Script: trace_decode.py
+# Description:
+#    Decodificación vectorizada de trazas de STEP grabadas: N tramas de 303
+#    bytes concatenadas (el FrameReader.frame de cada paso: registros y memoria
+#    seguidos del pipeline) se interpretan de una sola vez con un dtype
+#    estructurado de NumPy construido a partir de frame_layout.
+#    El resultado son columnas (un array por campo a lo largo del tiempo), p. ej.
+#    trace["registers"][:, 5] son todos los valores de R5 y trace["if_id_pc"]
+#    todos los PC+4 de IF_ID.
+#    load_trace lee también los archivos de trace_file (cabecera y registros de
+#    tamaño fijo); en ese caso hay además las columnas "cycle" y "command".
+# Dependencies:
+#    - numpy
+#===========================================
+import numpy as np
+
+from frame_layout import FRAME_BYTES, NUM_MEMORY_WORDS, NUM_REGISTERS, PIPELINE_FIELDS
+from trace_file import HEADER_BYTES, RECORD_BYTES, is_trace_file
+
+# Tipo NumPy big-endian de cada ancho de campo en la trama
+_TIPOS = {4: ">u4", 2: ">u2", 1: "u1"}
+
+FRAME_DTYPE = np.dtype(
+    [("registers", ">u4", (NUM_REGISTERS,)),
+     ("memory", ">u4", (NUM_MEMORY_WORDS,))]
+    + [(nombre, _TIPOS[nbytes]) for nombre, _, nbytes, _ in PIPELINE_FIELDS]
+)
+assert FRAME_DTYPE.itemsize == FRAME_BYTES
+
+# Registro de un archivo de trace_file: ciclo y comando delante de la trama
+RECORD_DTYPE = np.dtype([("cycle", ">u8"), ("command", "u1")] + FRAME_DTYPE.descr)
+assert RECORD_DTYPE.itemsize == RECORD_BYTES
+
+# Tipo nativo de cada columna una vez decodificada
+_NATIVOS = {4: np.uint32, 2: np.uint16, 1: np.uint8}
+
+
+def frames_view(data):
+    """
+    Interpreta 'data' (bytes, bytearray, memoryview o un np.memmap de un
+    archivo) como un array de tramas sin copiar nada.
+    """
+    if len(data) % FRAME_BYTES:
+        raise ValueError("La traza tiene {} bytes, que no es múltiplo de {} (trama incompleta)"
+                         .format(len(data), FRAME_BYTES))
+    return np.frombuffer(data, dtype=FRAME_DTYPE)
+
+
+def decode_trace(data):
+    """
+    Decodifica N tramas concatenadas en un diccionario de columnas en orden
+    nativo: 'registers' y 'memory' de forma (N, 32) y un array de forma (N,)
+    por cada campo de pipeline (nombres de frame_layout.PIPELINE_FIELD_NAMES),
+    con los bits de relleno ya enmascarados.
+    """
+    return _columnas(frames_view(data))
+
+
+def _columnas(tramas):
+    columnas = {
+        "registers": tramas["registers"].astype(np.uint32),
+        "memory": tramas["memory"].astype(np.uint32),
+    }
+    for nombre, _, nbytes, bits in PIPELINE_FIELDS:
+        columna = tramas[nombre].astype(_NATIVOS[nbytes])
+        if bits < nbytes * 8:
+            columna &= (1 << bits) - 1
+        columnas[nombre] = columna
+    if "cycle" in tramas.dtype.names:
+        columnas["cycle"] = tramas["cycle"].astype(np.uint64)
+        columnas["command"] = tramas["command"].copy()
+    return columnas
+
+
+def load_trace(path):
+    """
+    Decodifica un archivo de tramas concatenadas o de trace_file, mapeándolo
+    en memoria. Un registro incompleto al final de una traza de trace_file se ignora.
+    """
+    if not is_trace_file(path):
+        return decode_trace(np.memmap(path, dtype=np.uint8, mode="r"))
+    datos = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_BYTES)
+    completos = len(datos) // RECORD_BYTES * RECORD_BYTES
+    return _columnas(np.frombuffer(datos[:completos], dtype=RECORD_DTYPE))
+
+
+def changed_cycles(column):
+    """
+    Índices de trama en los que una columna cambia respecto de la trama anterior.
+    Para columnas de forma (N, 32) devuelve los índices donde cambia alguna palabra.
+    """
+    diferencias = column[1:] != column[:-1]
+    if diferencias.ndim > 1:
+        diferencias = diferencias.any(axis=1)
+    return np.flatnonzero(diferencias) + 1
+
+
+def stalled_cycles(trace):
+    """
+    Índices de trama en los que IF_ID no avanzó (misma instrucción y mismo PC+4
+    que en la trama anterior): stalls del hazard_unit o el procesador detenido en HALT.
+    """
+    inst, pc = trace["if_id_inst"], trace["if_id_pc"]
+    return np.flatnonzero((inst[1:] == inst[:-1]) & (pc[1:] == pc[:-1])) + 1
+
@@ -0,0 +1,168 @@
+#===========================================
+# Script: trace_file.py
+# Description:
+#    Grabación de las tramas de STEP/RUN en un archivo binario compacto para
+#    revisar o comparar sesiones de depuración largas sin la placa.
+#    Formato (big-endian, como la trama):
+#      - cabecera de 16 bytes: "MIPSTRAZ", versión (2 bytes), bytes por
+#        registro (2 bytes) y 4 bytes reservados
+#      - registros de tamaño fijo (312 bytes): ciclo (8 bytes), comando que
+#        produjo la trama (1 byte: STEP o RUN) y la trama de 303 bytes tal como
+#        la envía la debug_unit (registros, memoria y campos de pipeline)
+#    El ciclo cuenta los STEP desde que empezó la grabación (una trama de RUN
+#    no lo avanza, porque el host no sabe cuántos ciclos duró). Con tamaño
+#    fijo, el registro i está en CABECERA + i * REGISTRO: TraceReader mapea el
+#    archivo en memoria (mmap) y accede a cualquier registro sin leer los
+#    anteriores. trace_decode.load_trace lee este formato con NumPy.
+# Uso:
+#    with TraceWriter("sesion.mtr") as traza:
+#        traza.append(lector.frame)                # STEP
+#    with TraceReader("sesion.mtr") as traza:
+#        frame = traza.decode(traza.index_of(5000))  # DebugFrame del ciclo 5000
+#===========================================
+import mmap
+import struct
+from collections import namedtuple
+
+from debug_link import CMD_STEP
+from frame_layout import FRAME_BYTES, decode_frame
+
+MAGIA = b"MIPSTRAZ"
+VERSION = 1
+
+HEADER_STRUCT = struct.Struct(">8sHHI")
+RECORD_HEADER_STRUCT = struct.Struct(">QB")   # ciclo, comando
+HEADER_BYTES = HEADER_STRUCT.size                                # 16
+RECORD_BYTES = RECORD_HEADER_STRUCT.size + FRAME_BYTES           # 312
+
+TraceRecord = namedtuple("TraceRecord", ["cycle", "command", "frame"])
+
+
+class TraceWriter:
+    """
+    Agrega tramas a un archivo de traza nuevo. cycle es el ciclo de la última
+    trama agregada; append lo avanza en 'avance' (1 por STEP, 0 para RUN).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.cycle = 0
+        self.records = 0
+        self._archivo = open(path, "wb")
+        self._archivo.write(HEADER_STRUCT.pack(MAGIA, VERSION, RECORD_BYTES, 0))
+        self._cabecera = bytearray(RECORD_HEADER_STRUCT.size)
+
+    def append(self, frame, command=CMD_STEP, avance=None):
+        """Agrega una trama de 303 bytes (bytes, bytearray o memoryview, sin copiarla)."""
+        if len(frame) != FRAME_BYTES:
+            raise ValueError("Trama de {} bytes (se esperaban {})".format(len(frame), FRAME_BYTES))
+        if avance is None:
+            avance = 1 if command == CMD_STEP else 0
+        self.cycle += avance
+        RECORD_HEADER_STRUCT.pack_into(self._cabecera, 0, self.cycle, command)
+        self._archivo.write(self._cabecera)
+        self._archivo.write(frame)
+        self.records += 1
+
+    def flush(self):
+        self._archivo.flush()
+
+    def close(self):
+        if not self._archivo.closed:
+            self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.close()
+
+
+class TraceReader:
+    """
+    Lectura con acceso aleatorio de un archivo de TraceWriter. El archivo se
+    mapea en memoria: record(i) y decode(i) calculan la posición del registro
+    y solo tocan esos 312 bytes. Un registro incompleto al final (grabación
+    cortada) se ignora.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mapa) < HEADER_BYTES:
+            self._mapa.close()
+            raise ValueError("{}: archivo demasiado corto para una traza".format(path))
+        magia, version, registro, _ = HEADER_STRUCT.unpack_from(self._mapa, 0)
+        if magia != MAGIA or version != VERSION or registro != RECORD_BYTES:
+            self._mapa.close()
+            raise ValueError("{}: no es una traza de trace_file (versión {})".format(path, VERSION))
+        self.view = memoryview(self._mapa)
+        self._registros = (len(self._mapa) - HEADER_BYTES) // RECORD_BYTES
+        self._indice = None  # ciclo -> registro, solo si la traza tiene huecos
+
+    def __len__(self):
+        return self._registros
+
+    def _offset(self, i):
+        if i < 0:
+            i += self._registros
+        if not 0 <= i < self._registros:
+            raise IndexError("Registro {} fuera de la traza ({} registros)".format(i, self._registros))
+        return HEADER_BYTES + i * RECORD_BYTES
+
+    def cycle(self, i):
+        return RECORD_HEADER_STRUCT.unpack_from(self._mapa, self._offset(i))[0]
+
+    def record(self, i):
+        """TraceRecord del registro i; frame es un memoryview sobre el archivo mapeado."""
+        offset = self._offset(i)
+        ciclo, comando = RECORD_HEADER_STRUCT.unpack_from(self._mapa, offset)
+        inicio = offset + RECORD_HEADER_STRUCT.size
+        return TraceRecord(ciclo, comando, self.view[inicio:inicio + FRAME_BYTES])
+
+    def decode(self, i):
+        """DebugFrame del registro i."""
+        return decode_frame(self._mapa, self._offset(i) + RECORD_HEADER_STRUCT.size)
+
+    def index_of(self, ciclo):
+        """
+        Registro con la trama del ciclo indicado (la última, si hay varias).
+        En una traza grabada STEP a STEP el ciclo determina la posición y se
+        verifica leyendo un solo registro; si no coincide (hubo RUN o pasos
+        sin grabar) se arma una vez un índice ciclo -> registro.
+        """
+        if self._registros:
+            i = ciclo - self.cycle(0)
+            if 0 <= i < self._registros and self.cycle(i) == ciclo and (
+                    i + 1 == self._registros or self.cycle(i + 1) != ciclo):
+                return i
+        if self._indice is None:
+            self._indice = {self.cycle(i): i for i in range(self._registros)}
+        try:
+            return self._indice[ciclo]
+        except KeyError:
+            raise KeyError("El ciclo {} no está en la traza".format(ciclo)) from None
+
+    def __iter__(self):
+        for i in range(self._registros):
+            yield self.record(i)
+
+    def close(self):
+        self.view.release()
+        try:
+            self._mapa.close()
+        except BufferError:
+            pass  # Quedan tramas de record() en uso: el mapa se libera junto con ellas
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.close()
+
+
+def is_trace_file(path):
+    """True si el archivo empieza con la cabecera de trace_file."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIA)) == MAGIA